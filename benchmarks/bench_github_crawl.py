@@ -0,0 +1,74 @@
+"""
+Benchmark crawl_github_files against a local mock GitHub server.
+
+Runs the crawl for each worker count on the tree fast path and on the
+per-directory fallback, and reports requests, wall time and throughput.
+
+Usage:
+    python -m benchmarks.bench_github_crawl --files 500 --latency 0.02 --workers 1 8
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+from utils.crawl_github_files import crawl_github_files
+from benchmarks.mock_github import MockGitHub
+from benchmarks.synthetic_repo import generate_repo
+
+
+def run(root, latency, workers, truncate_trees, include_patterns):
+    config.github_max_workers = workers
+    with MockGitHub(root, latency=latency, truncate_trees=truncate_trees) as mock:
+        config.github_api_url = mock.url
+        start = time.perf_counter()
+        result = crawl_github_files(
+            f"https://github.com/{mock.repository.owner}/{mock.repository.name}",
+            include_patterns=include_patterns,
+            progress="quiet",
+        )
+        elapsed = time.perf_counter() - start
+        downloaded = sum(len(content.encode("utf-8")) for content in result["files"].values())
+        return {
+            "path": "contents" if truncate_trees else "tree",
+            "workers": workers,
+            "files": result["stats"]["downloaded_count"],
+            "requests": mock.request_count,
+            "requests_by_kind": dict(sorted(mock.counts.items())),
+            "seconds": round(elapsed, 3),
+            "files_per_sec": round(result["stats"]["downloaded_count"] / elapsed, 1),
+            "mb_per_sec": round(downloaded / elapsed / 1e6, 2),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=500, help="Files in the synthetic repository (default: 500)")
+    parser.add_argument("--file-size", type=int, default=4000, help="Approximate bytes per file (default: 4000)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds added to every mock response (default: 0.02)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8], help="GitHub worker counts to compare (default: 1 8)")
+    parser.add_argument("--include", nargs="+", default=["*.py", "*.md"], help="Include patterns (default: *.py *.md)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as root:
+        generate_repo(root, num_files=args.files, file_size=args.file_size)
+        for truncate_trees in (False, True):
+            for workers in args.workers:
+                result = run(root, args.latency, workers, truncate_trees, set(args.include))
+                print(json.dumps(result))
+                results.append(result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "github_crawl", "args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
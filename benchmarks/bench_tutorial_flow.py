@@ -0,0 +1,253 @@
+"""
+Benchmark the whole tutorial flow on synthetic repositories with a fake LLM.
+
+For each repository size, a deterministic mixed-language tree is generated
+(and kept in --repo-dir between runs) and create_tutorial_flow runs on it
+end to end, with benchmarks.fake_llm answering every prompt after
+--latency seconds. Each run happens in a fresh process, so peak RSS is
+that run's own. The flow is traced (utils.tracing), and the report has:
+
+- crawl throughput (FetchRepo: files and MB per second)
+- context-build time (packing files into the abstraction identification prompts)
+- prompt sizes (per LLM call and per node)
+- peak RSS and total wall time, plus seconds per node
+
+Results are saved as JSON with the git commit they were measured on;
+--compare prints the change against an earlier results file.
+
+Usage:
+    python -m benchmarks.bench_tutorial_flow --files 100 1000 10000 --latency 0.5 --output results.json
+    python -m benchmarks.bench_tutorial_flow --files 100 1000 --compare results.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import subprocess
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_repo import generate_repo
+
+# Nodes whose prep builds the codebase context for the LLM
+CONTEXT_NODES = ("IdentifyAbstractions", "IdentifyShardAbstractions", "MergeAbstractions")
+
+# Metrics shown by --compare: (label, path in a result, lower is better)
+COMPARED = (
+    ("wall s", ("wall_seconds",), True),
+    ("crawl files/s", ("crawl", "files_per_sec"), False),
+    ("context s", ("context_build_seconds",), True),
+    ("prompt chars", ("prompts", "total_chars"), True),
+    ("peak RSS MB", ("peak_rss_mb",), True),
+)
+
+
+def repo_for(repo_dir, num_files, file_size, seed):
+    """Generate the synthetic repository once; later runs with the same arguments reuse it."""
+    root = os.path.join(repo_dir, f"repo-{num_files}-{file_size}-{seed}")
+    marker = os.path.join(root, ".complete")
+    if not os.path.exists(marker):
+        print(f"Generating {num_files} files in {root} ...")
+        generate_repo(root, num_files=num_files, file_size=file_size, seed=seed)
+        with open(marker, "w") as f:
+            f.write("")
+    return root
+
+
+def run(root, options):
+    """One end-to-end flow run; meant to run in its own process."""
+    from benchmarks import fake_llm
+    from flow import create_tutorial_flow
+    from main import DEFAULT_INCLUDE_PATTERNS, DEFAULT_EXCLUDE_PATTERNS
+    from utils.file_store import peak_rss_bytes
+    from utils.tracing import enable_tracing, instrument_flow
+
+    fake = fake_llm.install(latency=options["latency"], jitter=options["jitter"], chapter_chars=options["chapter_chars"])
+    tracer = enable_tracing()
+    output_dir = tempfile.mkdtemp(prefix="bench_tutorial_")
+    shared = {
+        "repo_url": None,
+        "local_dir": root,
+        "project_name": "synthetic",
+        "output_dir": output_dir,
+        "include_patterns": DEFAULT_INCLUDE_PATTERNS,
+        "exclude_patterns": DEFAULT_EXCLUDE_PATTERNS,
+        "max_file_size": 100000,
+        "use_scan_cache": False,
+        "progress": "quiet",
+        "language": "english",
+        "use_cache": False,  # Every prompt reaches the fake LLM
+        "max_abstraction_num": options["max_abstractions"],
+        "context_token_budget": options["context_tokens"],
+        "identify_mode": options["identify_mode"],
+        "order_strategy": "llm",
+        "previous_chapters_token_budget": 2000,
+        "files": [],
+        "abstractions": [],
+        "relationships": {},
+        "chapter_order": [],
+        "chapters": [],
+        "final_output_dir": None,
+    }
+
+    tutorial_flow = create_tutorial_flow()
+    instrument_flow(tutorial_flow)
+    start = time.perf_counter()
+    tutorial_flow.run(shared)
+    wall = time.perf_counter() - start
+
+    def seconds(span):
+        return (span["end"] - span["start"]) / 1e9
+
+    def elapsed(spans):
+        # Wall time covered by spans that may overlap (shards and chapters run concurrently)
+        total, covered_until = 0, 0
+        for span in sorted(spans, key=lambda s: s["start"]):
+            start = max(span["start"], covered_until)
+            if span["end"] > start:
+                total += span["end"] - start
+            covered_until = max(covered_until, span["end"])
+        return total / 1e9
+
+    names = {span["id"]: span["name"] for span in tracer.spans}
+    node_seconds = {}
+    for span in tracer.spans:
+        if span["cat"] == "node" and "." not in span["name"]:
+            node_seconds[span["name"]] = round(node_seconds.get(span["name"], 0) + seconds(span), 3)
+
+    crawl_seconds = sum(seconds(span) for span in tracer.spans if span["name"] == "FetchRepo.exec")
+    crawled_bytes = sum(len(content.encode("utf-8")) for _, content in shared["files"])
+    # Sharded runs build each shard's context in exec, through shard_prep_res
+    context_spans = {f"{node}.{method}" for node in CONTEXT_NODES for method in ("prep", "shard_prep_res")}
+    context_seconds = elapsed([span for span in tracer.spans if span["name"] in context_spans])
+
+    llm_spans = [span for span in tracer.spans if span["cat"] == "llm"]
+    prompt_chars = [span["attrs"]["prompt_chars"] for span in llm_spans]
+    by_node = {}
+    for span in llm_spans:
+        node = names.get(span["parent"], "?").split(".")[0]
+        row = by_node.setdefault(node, {"calls": 0, "total_chars": 0, "max_chars": 0})
+        row["calls"] += 1
+        row["total_chars"] += span["attrs"]["prompt_chars"]
+        row["max_chars"] = max(row["max_chars"], span["attrs"]["prompt_chars"])
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    peak_rss = peak_rss_bytes()
+    return {
+        "files_in_repo": options["files"],
+        "wall_seconds": round(wall, 3),
+        "crawl": {
+            "seconds": round(crawl_seconds, 3),
+            "files": len(shared["files"]),
+            "mb": round(crawled_bytes / 1e6, 2),
+            "files_per_sec": round(len(shared["files"]) / crawl_seconds, 1) if crawl_seconds else None,
+            "mb_per_sec": round(crawled_bytes / crawl_seconds / 1e6, 2) if crawl_seconds else None,
+        },
+        "context_build_seconds": round(context_seconds, 3),
+        "sharded": "IdentifyShardAbstractions" in node_seconds,
+        "prompts": {
+            "calls": len(prompt_chars),
+            "total_chars": sum(prompt_chars),
+            "max_chars": max(prompt_chars, default=0),
+            "mean_chars": round(sum(prompt_chars) / len(prompt_chars)) if prompt_chars else 0,
+            "by_node": by_node,
+        },
+        "llm_seconds": round(elapsed(llm_spans), 3),
+        "chapters": len(shared["chapters"]),
+        "node_seconds": node_seconds,
+        "peak_rss_mb": round(peak_rss / (1024 * 1024), 1) if peak_rss else None,
+        "fake_llm_calls": fake.calls,
+    }
+
+
+def git_commit():
+    """(commit, dirty) of the working tree, or (None, None) outside a git checkout."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                                capture_output=True, text=True, check=True).stdout
+        return commit, bool(status.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def compare(results, baseline_path):
+    """Print each COMPARED metric against the results of baseline_path with the same repository size."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    before = {result["files_in_repo"]: result for result in baseline["results"]}
+    print(f"\nCompared with {baseline_path} (commit {(baseline.get('commit') or '?')[:10]}):")
+    for result in results:
+        old = before.get(result["files_in_repo"])
+        if old is None:
+            print(f"  {result['files_in_repo']} files: no baseline")
+            continue
+        changes = []
+        for label, path, lower_is_better in COMPARED:
+            new_value, old_value = result, old
+            for key in path:
+                new_value = (new_value or {}).get(key)
+                old_value = (old_value or {}).get(key)
+            if not new_value or not old_value:
+                continue
+            change = (new_value - old_value) / old_value * 100
+            worse = change > 0 if lower_is_better else change < 0
+            flag = " (worse)" if worse and abs(change) >= 10 else ""
+            changes.append(f"{label} {old_value} -> {new_value} ({change:+.0f}%){flag}")
+        print(f"  {result['files_in_repo']} files: " + "; ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, nargs="+", default=[100, 1000], help="Repository sizes in files (default: 100 1000)")
+    parser.add_argument("--file-size", type=int, default=4000, help="Approximate bytes per file (default: 4000)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic repositories (default: 0)")
+    parser.add_argument("--repo-dir", help="Keep the generated repositories here and reuse them (default: a temporary directory)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds each fake LLM call takes (default: 0.2)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random seconds per LLM call, up to this much (default: 0)")
+    parser.add_argument("--chapter-chars", type=int, default=3000, help="Size of each generated chapter (default: 3000)")
+    parser.add_argument("--max-abstractions", type=int, default=5, help="Abstractions, and so chapters, per tutorial (default: 5)")
+    parser.add_argument("--context-tokens", type=int, default=600000, help="Context token budget (default: 600000)")
+    parser.add_argument("--identify-mode", choices=["single", "sharded", "auto"], default="auto", help="As in main.py (default: auto)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", metavar="RESULTS", help="Compare with an earlier --output file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # LLM logs of the runs go to the scratch directory, not the repository
+        os.environ.setdefault("LOG_DIR", os.path.join(scratch, "logs"))
+        repo_dir = args.repo_dir or scratch
+        results = []
+        context = multiprocessing.get_context("spawn")
+        for num_files in args.files:
+            root = repo_for(repo_dir, num_files, args.file_size, args.seed)
+            options = {**vars(args), "files": num_files}
+            with context.Pool(1) as pool:
+                result = pool.apply(run, (root, options))
+            print(json.dumps({key: value for key, value in result.items() if key not in ("node_seconds", "prompts")}))
+            results.append(result)
+
+    commit, dirty = git_commit()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "benchmark": "tutorial_flow",
+                "commit": commit,
+                "dirty": dirty,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "args": vars(args),
+                "results": results,
+            }, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+A deterministic local stand-in for the Gemini client used by call_llm.
+
+It recognises the prompt of each LLM node (identify, merge, relationships,
+order or hybrid tie-breaking, chapter), answers in the format that node parses, and derives the
+answer from the indices listed in the prompt, so the same prompt always
+gets the same answer. Every call sleeps for a configurable latency (plus
+optional seeded jitter) to model the round trip, blocking or with
+asyncio.sleep for the async client.
+
+Install it with install(), which replaces the shared client of
+utils.call_llm; call_llm and acall_llm, their cache and tracing are used
+unchanged.
+"""
+import re
+import time
+import random
+import asyncio
+import hashlib
+import threading
+
+_LISTED = re.compile(r"^-? ?(\d+) # (.*)$", re.MULTILINE)
+
+# Files named per abstraction, about what a real model picks
+FILES_PER_ABSTRACTION = 6
+
+
+def _section(prompt, start, end=None):
+    """Text between start and end (or the end of the prompt); empty if start is missing."""
+    begin = prompt.find(start)
+    if begin < 0:
+        return ""
+    begin += len(start)
+    stop = prompt.find(end, begin) if end else -1
+    return prompt[begin:stop if stop >= 0 else len(prompt)]
+
+
+def _listed_indices(text):
+    return [int(match.group(1)) for match in _LISTED.finditer(text)]
+
+
+def _block(text):
+    return "```yaml\n" + text + "```\n"
+
+
+def _abstractions(groups, key):
+    """YAML list of abstractions, one per group of indices (under key)."""
+    lines = []
+    for n, indices in enumerate(groups):
+        lines.append(f"- name: |\n    Component {n}\n  description: |\n    Component {n} groups {len(indices)} related items.\n"
+                     f"    It's like a department in a company.\n  {key}:")
+        lines.extend(f"    - {i} # item {i}" for i in indices)
+    return _block("\n".join(lines) + "\n")
+
+
+def _split(indices, count, size=None):
+    """Split indices into up to count non-empty groups of at most size, round robin."""
+    count = max(1, min(count, len(indices)))
+    return [indices[n::count][:size] for n in range(count)]
+
+
+def respond(prompt, chapter_chars=3000):
+    """The fake LLM's answer to one of the tutorial flow's prompts."""
+    limit = re.search(r"top 5-(\d+) core", prompt)
+    max_abstractions = int(limit.group(1)) if limit else 10
+
+    if "`candidate_indices`" in prompt:
+        candidates = _listed_indices(_section(prompt, "These candidate abstractions were found:", "Merge duplicates"))
+        return _abstractions(_split(candidates, max_abstractions), "candidate_indices")
+
+    if "`file_indices`" in prompt:
+        files = _listed_indices(_section(prompt, "List of file indices and paths present in the context:", "Format the output"))
+        return _abstractions(_split(files, max_abstractions, FILES_PER_ABSTRACTION), "file_indices")
+
+    if "`relationships`" in prompt:
+        indices = _listed_indices(_section(prompt, "List of Abstraction Indices and Names", "Context (Abstractions"))
+        lines = ["summary: |", "  A **synthetic** project used for *benchmarks*.", "relationships:"]
+        for n, i in enumerate(indices):
+            target = indices[(n + 1) % len(indices)]
+            lines.append(f"  - from_abstraction: {i} # Component {i}\n    to_abstraction: {target} # Component {target}\n    label: \"Uses\"")
+        return _block("\n".join(lines) + "\n")
+
+    if "best order to explain these abstractions?" in prompt and "Groups (Index # Name)" in prompt:
+        indices = _listed_indices(_section(prompt, "Groups (Index # Name)", "Relationships (Indices"))
+        return _block("".join(f"- {i} # Component {i}\n" for i in indices))
+
+    if "best order to explain" in prompt:
+        indices = _listed_indices(_section(prompt, "Abstractions (Index # Name)", "Context about relationships"))
+        return _block("".join(f"- {i} # Component {i}\n" for i in indices))
+
+    # Chapter: heading plus filler text of about chapter_chars characters
+    chapter = re.search(r"This is Chapter (\d+)\.", prompt)
+    name = re.search(r"about the concept: \"(.*?)\"\. This is Chapter", prompt, re.DOTALL)
+    heading = f"# Chapter {chapter.group(1) if chapter else 1}: {name.group(1).strip() if name else 'Component'}"
+    paragraph = "This chapter explains the component step by step with a small example.\n\n"
+    return f"{heading}\n\n" + paragraph * max(1, chapter_chars // len(paragraph))
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeLLM:
+    """
+    Client object with the models.generate_content / aio.models.generate_content
+    surface of genai.Client that call_llm uses.
+
+    Args:
+        latency (float): Seconds each call takes
+        jitter (float): Extra random seconds, up to this much, per call (seeded by the prompt)
+        chapter_chars (int): Approximate size of each generated chapter
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, chapter_chars=3000):
+        self.latency = latency
+        self.jitter = jitter
+        self.chapter_chars = chapter_chars
+        self.calls = 0
+        self.prompt_chars = []
+        self._lock = threading.Lock()
+        self.models = _Models(self)
+        self.aio = _AsyncClient(self)
+
+    def _answer(self, contents):
+        prompt = contents[0] if isinstance(contents, (list, tuple)) else contents
+        with self._lock:
+            self.calls += 1
+            self.prompt_chars.append(len(prompt))
+        return respond(prompt, self.chapter_chars)
+
+    def delay(self, contents):
+        if not self.jitter:
+            return self.latency
+        seed = hashlib.sha256(str(contents).encode("utf-8")).digest()
+        return self.latency + random.Random(seed).uniform(0, self.jitter)
+
+    def close(self):
+        pass
+
+
+class _Models:
+    def __init__(self, llm):
+        self.llm = llm
+
+    def generate_content(self, model=None, contents=None):
+        time.sleep(self.llm.delay(contents))
+        return _Response(self.llm._answer(contents))
+
+
+class _AsyncModels:
+    def __init__(self, llm):
+        self.llm = llm
+
+    async def generate_content(self, model=None, contents=None):
+        await asyncio.sleep(self.llm.delay(contents))
+        return _Response(self.llm._answer(contents))
+
+
+class _AsyncClient:
+    def __init__(self, llm):
+        self.models = _AsyncModels(llm)
+
+    async def aclose(self):
+        pass
+
+
+def install(latency=0.0, jitter=0.0, chapter_chars=3000):
+    """Make call_llm and acall_llm use a new FakeLLM; returns it."""
+    import utils.call_llm
+
+    fake = FakeLLM(latency=latency, jitter=jitter, chapter_chars=chapter_chars)
+    utils.call_llm._client = fake
+    return fake
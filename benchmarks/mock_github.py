@@ -0,0 +1,256 @@
+"""
+A local stand-in for the GitHub REST endpoints crawl_github_files uses,
+serving a directory as repository "owner/repo" on branch "main".
+
+Point the crawler at it with config.github_api_url (or GITHUB_API_URL).
+Responses carry an ETag and X-RateLimit-* headers counting down from
+rate_limit per rate_window seconds; a matching If-None-Match gets a 304 that,
+as on GitHub, doesn't count against the limit. Once the window is used up,
+requests get a 403 until it resets, and secondary_every makes every Nth
+request hit a secondary rate limit (403 with Retry-After). Every request can
+be delayed by a fixed latency to model network round trips.
+"""
+import io
+import os
+import math
+import json
+import time
+import socket
+import base64
+import hashlib
+import tarfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+def git_blob_sha(data: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class MockRepository:
+    """Files of a directory, addressed the way the GitHub API addresses them."""
+
+    def __init__(self, root, owner="owner", name="repo", branch="main"):
+        self.owner, self.name, self.branch = owner, name, branch
+        self.files = {}
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                with open(path, "rb") as f:
+                    self.files[os.path.relpath(path, root).replace(os.sep, "/")] = f.read()
+        self.blob_shas = {path: git_blob_sha(data) for path, data in self.files.items()}
+        self.blobs = {sha: path for path, sha in self.blob_shas.items()}
+        self.commit = hashlib.sha1("".join(sorted(self.blob_shas.values())).encode()).hexdigest()
+        self._tarball = None
+
+    def tarball(self) -> bytes:
+        if self._tarball is None:
+            buffer = io.BytesIO()
+            with tarfile.open(fileobj=buffer, mode="w:gz", compresslevel=1) as archive:
+                for path, data in sorted(self.files.items()):
+                    info = tarfile.TarInfo(f"{self.owner}-{self.name}-{self.commit[:7]}/{path}")
+                    info.size = len(data)
+                    archive.addfile(info, io.BytesIO(data))
+            self._tarball = buffer.getvalue()
+        return self._tarball
+
+    def listing(self, path, base_url):
+        """Contents API response for a file or directory, or None if it doesn't exist."""
+        def file_entry(file_path):
+            return {
+                "type": "file", "name": file_path.rsplit("/", 1)[-1], "path": file_path,
+                "size": len(self.files[file_path]), "sha": self.blob_shas[file_path],
+                "download_url": f"{base_url}/raw/{self.owner}/{self.name}/{self.commit}/{file_path}",
+                "url": f"{base_url}/repos/{self.owner}/{self.name}/contents/{file_path}",
+            }
+
+        if path in self.files:
+            return file_entry(path)
+        prefix = path + "/" if path else ""
+        entries = {}
+        for file_path in self.files:
+            if file_path.startswith(prefix):
+                head = file_path[len(prefix):].split("/", 1)[0]
+                full = prefix + head
+                entries[head] = file_entry(full) if full == file_path else {"type": "dir", "name": head, "path": full}
+        return [entries[name] for name in sorted(entries)] if entries else None
+
+
+class MockGitHub:
+    """
+    Threaded HTTP server around a MockRepository.
+
+    Args:
+        root (str): Directory to serve
+        latency (float): Seconds to sleep before answering each request
+        rate_limit (int): Value of X-RateLimit-Limit; remaining counts down per request
+        rate_window (float): Seconds until the rate limit resets (X-RateLimit-Reset)
+        secondary_every (int): Refuse every Nth request with a secondary rate limit (0 never)
+        retry_after (int): Retry-After seconds sent with secondary rate limit refusals
+        truncate_trees (bool): Report recursive tree listings as truncated (forces the per-directory crawl)
+        port (int): Port to listen on; 0 picks a free one, a fixed port keeps URLs (and cache keys) stable across servers
+    """
+
+    def __init__(self, root, latency=0.0, rate_limit=5000, truncate_trees=False, port=0,
+                 rate_window=3600.0, secondary_every=0, retry_after=1):
+        self.repository = MockRepository(root)
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.secondary_every = secondary_every
+        self.retry_after = retry_after
+        self.truncate_trees = truncate_trees
+        self.counts = {}
+        self.not_modified = 0
+        self.refused = 0
+        self._arrivals = 0
+        self._used = 0
+        self._window_reset = time.time() + rate_window
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    @property
+    def request_count(self) -> int:
+        return sum(self.counts.values())
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, kind):
+        with self._lock:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def _admit(self):
+        """Charge a request to the current rate window; returns a refusal (headers, message) or None."""
+        with self._lock:
+            now = time.time()
+            if now >= self._window_reset:
+                self._window_reset = now + self.rate_window
+                self._used = 0
+            self._arrivals += 1
+            if self.secondary_every and self._arrivals % self.secondary_every == 0:
+                self.refused += 1
+                return {"Retry-After": str(self.retry_after)}, "You have exceeded a secondary rate limit."
+            if self._used >= self.rate_limit:
+                self.refused += 1
+                return {}, "API rate limit exceeded."
+            self._used += 1
+            return None
+
+    def _rate_headers(self, not_modified=False):
+        with self._lock:
+            if not_modified:
+                # 304s are refunded
+                self.not_modified += 1
+                self._used -= 1
+            return {
+                "X-RateLimit-Limit": str(self.rate_limit),
+                "X-RateLimit-Remaining": str(max(self.rate_limit - self._used, 0)),
+                "X-RateLimit-Reset": str(math.ceil(self._window_reset)),
+            }
+
+    def _handler(self):
+        mock = self
+        repository = self.repository
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out in separate writes; don't let Nagle delay the second one
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body, content_type="application/json", headers=None):
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body).encode("utf-8")
+                elif isinstance(body, str):
+                    body = body.encode("utf-8")
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                if status == 200 and self.headers.get("If-None-Match") == etag:
+                    status, body = 304, b""
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if status in (200, 304):
+                    self.send_header("ETag", etag)
+                for name, value in {**mock._rate_headers(status == 304), **(headers or {})}.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if mock.latency:
+                    time.sleep(mock.latency)
+                refusal = mock._admit()
+                if refusal is not None:
+                    headers, message = refusal
+                    return self.reply(403, {"message": message}, headers=headers)
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query)
+                parts = parsed.path.strip("/").split("/")
+                base_url = f"http://{self.headers['Host']}"
+
+                if parts[0] == "raw":
+                    mock._count("raw")
+                    data = repository.files.get("/".join(parts[4:]))
+                    if data is None:
+                        return self.reply(404, "404: Not Found", "text/plain")
+                    return self.reply(200, data, "text/plain; charset=utf-8")
+
+                kind = parts[3] if len(parts) > 3 else "other"
+                if kind == "git" and len(parts) > 4:
+                    kind = parts[4]
+                mock._count(kind)
+                if parts[:3] != ["repos", repository.owner, repository.name]:
+                    return self.reply(404, {"message": "Not Found"})
+                rest = parts[3:]
+
+                if rest == ["branches"]:
+                    return self.reply(200, [{"name": repository.branch, "commit": {"sha": repository.commit}}])
+                if rest[:1] == ["commits"] and len(rest) == 2:  # A ref with "/" must arrive quoted
+                    return self.reply(200, repository.commit, "text/plain")
+                if rest[:2] == ["git", "trees"]:
+                    tree = [
+                        {"path": path, "mode": "100644", "type": "blob", "sha": repository.blob_shas[path], "size": len(data)}
+                        for path, data in sorted(repository.files.items())
+                    ] if "recursive" in query else []
+                    return self.reply(200, {"sha": repository.commit, "tree": tree, "truncated": mock.truncate_trees})
+                if rest[:2] == ["git", "blobs"] and len(rest) == 3 and rest[2] in repository.blobs:
+                    data = repository.files[repository.blobs[rest[2]]]
+                    if "raw" in self.headers.get("Accept", ""):
+                        return self.reply(200, data, "application/vnd.github.raw")
+                    return self.reply(200, {"sha": rest[2], "size": len(data), "encoding": "base64",
+                                            "content": base64.b64encode(data).decode("ascii")})
+                if rest[:1] == ["tarball"]:
+                    return self.reply(200, repository.tarball(), "application/x-gzip")
+                if rest[:1] == ["contents"]:
+                    listing = repository.listing("/".join(rest[1:]), base_url)
+                    if listing is None:
+                        return self.reply(404, {"message": "Not Found"})
+                    return self.reply(200, listing)
+                return self.reply(404, {"message": "Not Found"})
+
+        return Handler
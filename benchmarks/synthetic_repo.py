@@ -0,0 +1,46 @@
+"""Deterministic synthetic source trees for benchmarks."""
+import os
+import random
+
+# Extension -> function template; {name} and {i} are filled in per function
+TEMPLATES = {
+    ".py": "def {name}(value):\n    \"\"\"Step {i}.\"\"\"\n    return value * {i} + {i}\n\n",
+    ".js": "export function {name}(value) {{\n  // step {i}\n  return value * {i} + {i};\n}}\n\n",
+    ".ts": "export function {name}(value: number): number {{\n  return value * {i} + {i};\n}}\n\n",
+    ".go": "func {name}(value int) int {{\n\t// step {i}\n\treturn value*{i} + {i}\n}}\n\n",
+    ".java": "    public static int {name}(int value) {{\n        return value * {i} + {i};\n    }}\n\n",
+    ".md": "## {name}\n\nStep {i} multiplies the value by {i}.\n\n",
+}
+
+
+def generate_repo(root, num_files=100, file_size=4000, seed=0, files_per_dir=50):
+    """
+    Write num_files files of about file_size bytes under root, spread over
+    nested package directories and a mix of languages. The same arguments
+    always produce the same tree.
+
+    Returns:
+        int: Total bytes written
+    """
+    rng = random.Random(seed)
+    extensions = sorted(TEMPLATES)
+    total = 0
+    for n in range(num_files):
+        directory = os.path.join(root, f"pkg{n // (files_per_dir * 10)}", f"mod{(n // files_per_dir) % 10}")
+        os.makedirs(directory, exist_ok=True)
+        extension = extensions[rng.randrange(len(extensions))]
+        template = TEMPLATES[extension]
+        parts = []
+        size = 0
+        i = 0
+        while size < file_size:
+            chunk = template.format(name=f"f{n}_{i}", i=i)
+            parts.append(chunk)
+            size += len(chunk)
+            i += 1
+        with open(os.path.join(directory, f"file{n}{extension}"), "w", encoding="utf-8") as f:
+            f.write("".join(parts))
+        total += size
+    with open(os.path.join(root, "README.md"), "w", encoding="utf-8") as f:
+        f.write(f"# Synthetic repository\n\n{num_files} generated files.\n")
+    return total
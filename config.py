@@ -10,6 +10,12 @@ class Config:
         self.gemini_project_id: str = os.getenv("GEMINI_PROJECT_ID", "your-project-id")
         self.gemini_location: str = os.getenv("GEMINI_LOCATION", "us-central1")
         self.gemini_model: str = os.getenv("GEMINI_MODEL", "gemini-2.5-pro-exp-03-25")
+        # Connection pool size of the shared LLM client
+        self.llm_max_connections: int = int(os.getenv("LLM_MAX_CONNECTIONS", "16"))
+        # Maximum number of concurrent acall_llm requests
+        self.llm_concurrency: int = int(os.getenv("LLM_CONCURRENCY", "4"))
+        # Maximum number of shards identified at once (--identify-mode sharded/auto), in either flow
+        self.identify_concurrency: int = int(os.getenv("IDENTIFY_CONCURRENCY", "4"))
         
         # Anthropic Configuration
         self.anthropic_api_key: str = os.getenv("ANTHROPIC_API_KEY", "")
@@ -19,12 +25,44 @@ class Config:
         
         # GitHub Configuration
         self.github_token: str = os.getenv("GITHUB_TOKEN", "")
+        # GitHub REST API base URL (GitHub Enterprise, or a local fake server for testing)
+        self.github_api_url: str = os.getenv("GITHUB_API_URL", "https://api.github.com")
+        # Maximum concurrent GitHub downloads (reduced automatically as the rate limit runs low)
+        self.github_max_workers: int = int(os.getenv("GITHUB_MAX_WORKERS", "8"))
+        # GitHub responses with their ETags, revalidated (or reused outright when SHA-pinned) on later runs
+        self.github_cache_file: str = os.getenv("GITHUB_CACHE_FILE", "github_cache.db")
+        # Pruned after every crawl: stored body cap and days without use (0 disables a limit)
+        self.github_cache_max_bytes: int = int(os.getenv("GITHUB_CACHE_MAX_BYTES", str(1024 ** 3)))
+        self.github_cache_max_age_days: float = float(os.getenv("GITHUB_CACHE_MAX_AGE_DAYS", "30"))
         
+        # Bare mirrors of SSH repositories, updated incrementally; least recently used evicted above the cap (0 = unlimited)
+        self.mirror_cache_dir: str = os.getenv("MIRROR_CACHE_DIR", "repo_mirrors")
+        self.mirror_cache_max_bytes: int = int(os.getenv("MIRROR_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+        
+        # Local crawl: number of threads reading files concurrently
+        self.crawl_read_workers: int = int(os.getenv("CRAWL_READ_WORKERS", "8"))
         # Logging Configuration
         self.log_directory: str = os.getenv("LOG_DIR", "logs")
         
         # Cache Configuration
+        self.cache_db_file: str = os.getenv("CACHE_DB_FILE", "llm_cache.db")
+        # Legacy whole-file JSON cache, imported into cache_db_file once
         self.cache_file: str = os.getenv("CACHE_FILE", "llm_cache.json")
+        # Compression and eviction for the cache database (0 disables a limit)
+        self.cache_compression_level: int = int(os.getenv("CACHE_COMPRESSION_LEVEL", "6"))
+        self.cache_max_bytes: int = int(os.getenv("CACHE_MAX_BYTES", "0"))
+        self.cache_max_age_days: float = float(os.getenv("CACHE_MAX_AGE_DAYS", "0"))
+        # In-memory LRU tier in front of the cache database (0 bytes disables it)
+        self.memory_cache_bytes: int = int(os.getenv("MEMORY_CACHE_BYTES", str(64 * 1024 * 1024)))
+        self.memory_cache_ttl: float = float(os.getenv("MEMORY_CACHE_TTL", "0"))
+        # Local crawl (--scan-cache): index of previously read files, keyed by path and stat,
+        # kept next to the LLM cache database
+        self.scan_cache_file: str = os.getenv(
+            "SCAN_CACHE_FILE", os.path.join(os.path.dirname(self.cache_db_file), "scan_cache.db")
+        )
+        # Pruned after every crawl: stored text cap and days without use (0 disables a limit)
+        self.scan_cache_max_bytes: int = int(os.getenv("SCAN_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+        self.scan_cache_max_age_days: float = float(os.getenv("SCAN_CACHE_MAX_AGE_DAYS", "30"))
         
         # Default LLM Provider
         self.default_llm_provider: str = os.getenv("DEFAULT_LLM_PROVIDER", "gemini")
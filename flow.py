@@ -1,12 +1,21 @@
-from pocketflow import Flow
+from pocketflow import Flow, AsyncFlow
 # Import all node classes from nodes.py
 from nodes import (
     FetchRepo,
     IdentifyAbstractions,
+    IdentifyShardAbstractions,
+    MergeAbstractions,
     AnalyzeRelationships,
     OrderChapters,
     WriteChapters,
-    CombineTutorial
+    CombineTutorial,
+    AsyncIdentifyAbstractions,
+    AsyncIdentifyShardAbstractions,
+    AsyncMergeAbstractions,
+    AsyncAnalyzeRelationships,
+    AsyncOrderChapters,
+    AsyncWriteChapters,
+    ParallelWriteChapters,
 )
 
 def create_tutorial_flow():
@@ -15,6 +24,8 @@ def create_tutorial_flow():
     # Instantiate nodes
     fetch_repo = FetchRepo()
     identify_abstractions = IdentifyAbstractions(max_retries=5, wait=20)
+    identify_shard_abstractions = IdentifyShardAbstractions(max_retries=5, wait=20) # This is a BatchNode
+    merge_abstractions = MergeAbstractions(max_retries=5, wait=20)
     analyze_relationships = AnalyzeRelationships(max_retries=5, wait=20)
     order_chapters = OrderChapters(max_retries=5, wait=20)
     write_chapters = WriteChapters(max_retries=5, wait=20) # This is a BatchNode
@@ -27,7 +38,54 @@ def create_tutorial_flow():
     order_chapters >> write_chapters
     write_chapters >> combine_tutorial
 
+    # Repositories too large for one context: identify per shard, then merge
+    fetch_repo - "sharded" >> identify_shard_abstractions
+    identify_shard_abstractions >> merge_abstractions
+    merge_abstractions >> analyze_relationships
+
     # Create the flow starting with FetchRepo
     tutorial_flow = Flow(start=fetch_repo)
 
     return tutorial_flow
+
+
+def create_async_tutorial_flow(jobs=1):
+    """
+    Creates the tutorial flow with async LLM nodes.
+
+    Run it with `await flow.run_async(shared)`. Several flows (e.g. different
+    repos or languages) can be awaited together with asyncio.gather; their LLM
+    requests then share the acall_llm concurrency limit.
+
+    With jobs > 1, chapters are written in parallel (up to `jobs` at once).
+    """
+
+    # Instantiate nodes (crawling and writing files stay synchronous)
+    fetch_repo = FetchRepo()
+    identify_abstractions = AsyncIdentifyAbstractions(max_retries=5, wait=20)
+    identify_shard_abstractions = AsyncIdentifyShardAbstractions(max_retries=5, wait=20) # This is an AsyncParallelBatchNode
+    merge_abstractions = AsyncMergeAbstractions(max_retries=5, wait=20)
+    analyze_relationships = AsyncAnalyzeRelationships(max_retries=5, wait=20)
+    order_chapters = AsyncOrderChapters(max_retries=5, wait=20)
+    if jobs > 1:
+        write_chapters = ParallelWriteChapters(jobs=jobs, max_retries=5, wait=20) # This is an AsyncParallelBatchNode
+    else:
+        write_chapters = AsyncWriteChapters(max_retries=5, wait=20) # This is an AsyncBatchNode
+    combine_tutorial = CombineTutorial()
+
+    # Connect nodes in sequence based on the design
+    fetch_repo >> identify_abstractions
+    identify_abstractions >> analyze_relationships
+    analyze_relationships >> order_chapters
+    order_chapters >> write_chapters
+    write_chapters >> combine_tutorial
+
+    # Repositories too large for one context: identify per shard, then merge
+    fetch_repo - "sharded" >> identify_shard_abstractions
+    identify_shard_abstractions >> merge_abstractions
+    merge_abstractions >> analyze_relationships
+
+    # Create the flow starting with FetchRepo
+    tutorial_flow = AsyncFlow(start=fetch_repo)
+
+    return tutorial_flow
@@ -1,8 +1,13 @@
 import dotenv
 import os
+import asyncio
 import argparse
 # Import the function that creates the flow
-from flow import create_tutorial_flow
+from flow import create_tutorial_flow, create_async_tutorial_flow
+from utils.call_llm import get_cache_stats, set_llm_concurrency
+from utils.file_store import peak_rss_bytes
+from utils.tracing import TRACE_FORMATS, enable_tracing, instrument_flow
+from config import config
 
 dotenv.load_dotenv()
 
@@ -37,12 +42,13 @@ DEFAULT_EXCLUDE_PATTERNS = {
 
 # --- Main Function ---
 def main():
-    parser = argparse.ArgumentParser(description="Generate a tutorial for a GitHub codebase or local directory.")
+    parser = argparse.ArgumentParser(description="Generate a tutorial for a GitHub codebase, local directory or archive.")
 
     # Create mutually exclusive group for source
     source_group = parser.add_mutually_exclusive_group(required=True)
     source_group.add_argument("--repo", help="URL of the public GitHub repository.")
     source_group.add_argument("--dir", help="Path to local directory.")
+    source_group.add_argument("--archive", help="Path to a local .tar(.gz/.bz2/.xz) or .zip archive of the codebase, read without extracting it.")
 
     parser.add_argument("-n", "--name", help="Project name (optional, derived from repo/directory if omitted).")
     parser.add_argument("-t", "--token", help="GitHub personal access token (optional, reads from GITHUB_TOKEN env var if not provided).")
@@ -50,12 +56,39 @@ def main():
     parser.add_argument("-i", "--include", nargs="+", help="Include file patterns (e.g. '*.py' '*.js'). Defaults to common code files if not specified.")
     parser.add_argument("-e", "--exclude", nargs="+", help="Exclude file patterns (e.g. 'tests/*' 'docs/*'). Defaults to test/build directories if not specified.")
     parser.add_argument("-s", "--max-size", type=int, default=100000, help="Maximum file size in bytes (default: 100000, about 100KB).")
+    # List local files through git instead of walking the directory
+    parser.add_argument("--git-index", action="store_true", help="With --dir inside a git work tree, list files like 'git ls-files' (tracked plus untracked, not ignored by any .gitignore) instead of walking the directory")
+    parser.add_argument("--git-ref", help="With --dir inside a git work tree, read files from this commit, branch or tag in the git object database instead of the work tree. With --repo, crawl this commit, branch or tag when the URL doesn't name one (SSH URLs never do)")
+    parser.add_argument("--subdir", help="With --repo, crawl only this directory of the repository when the URL doesn't name one. SSH clones check out only this directory and the --include file patterns")
+    # Reuse unchanged files from the previous crawl of the same directory
+    parser.add_argument("--scan-cache", action="store_true", help="With --dir, keep the text of scanned files in SCAN_CACHE_FILE (next to the LLM cache database) and reuse files whose size, mtime and inode are unchanged since the last run (default: re-read every file)")
+    # Revalidate GitHub responses from the previous crawl instead of downloading them again
+    parser.add_argument("--no-http-cache", action="store_true", help="With --repo, download every GitHub response again instead of reusing SHA-pinned responses and revalidating the rest with their ETags (default: HTTP cache enabled)")
+    parser.add_argument("--strip-components", type=int, default=0, help="With --archive, drop this many leading directories from member paths, like tar (default: 0; use 1 for GitHub source archives)")
+    # Keep SSH repositories as bare mirrors that later runs update incrementally
+    parser.add_argument("--mirror-cache", action="store_true", help="With an SSH --repo URL, keep a bare mirror of the repository (MIRROR_CACHE_DIR) and update it with an incremental fetch instead of cloning on every run")
+    # Crawl progress output: throttled progress lines, summary only, or one JSON stats record
+    parser.add_argument("--progress", choices=["bar", "quiet", "json"], default="bar", help="Crawl progress output: 'bar' prints throttled progress lines, 'quiet' only a final summary, 'json' one final JSON stats record (default: bar)")
     # Add language parameter for multi-language support
     parser.add_argument("--language", default="english", help="Language for the generated tutorial (default: english)")
     # Add use_cache parameter to control LLM caching
     parser.add_argument("--no-cache", action="store_true", help="Disable LLM response caching (default: caching enabled)")
     # Add max_abstraction_num parameter to control the number of abstractions
     parser.add_argument("--max-abstractions", type=int, default=10, help="Maximum number of abstractions to identify (default: 10)")
+    # Bound the codebase context sent to IdentifyAbstractions
+    parser.add_argument("--context-tokens", type=int, default=600000, help="Token budget for the codebase context used to identify abstractions (default: 600000). Less important files are skeletonized, truncated or dropped to fit.")
+    # Identify abstractions in one prompt or per shard of the codebase
+    parser.add_argument("--identify-mode", choices=["single", "sharded", "auto"], default="single", help="Identify abstractions in one prompt, per directory shard with a merge step, or sharded only when the files exceed --context-tokens (default: single)")
+    # How to order chapters: locally from the relationship graph, by the LLM, or graph with LLM tie-breaking
+    parser.add_argument("--order-strategy", choices=["graph", "llm", "hybrid"], default="llm", help="Chapter ordering: 'graph' derives it locally from the relationships, 'llm' asks the LLM, 'hybrid' uses the graph and asks the LLM only to break ties (default: llm)")
+    # Bound the "previous chapters" context of each chapter prompt
+    parser.add_argument("--chapter-context-tokens", type=int, default=2000, help="Token budget for the summary of earlier chapters in each chapter prompt (default: 2000)")
+    # Tracing and profiling
+    parser.add_argument("--trace", metavar="FILE", help="Record spans for every node's prep/exec/post, LLM call and GitHub request and write them to FILE, with a summary of where the time went")
+    parser.add_argument("--trace-format", choices=TRACE_FORMATS, default="chrome", help="Format of the --trace file: 'chrome' trace events (chrome://tracing, Perfetto) or 'otlp' OpenTelemetry JSON (default: chrome)")
+    parser.add_argument("--profile", action="store_true", help="Record the peak of Python allocations (tracemalloc) per node and print it in the trace summary; slows the run down")
+    # Write chapters concurrently instead of one after another
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Number of chapters to write in parallel (default: 1, sequential). With more than 1, chapters see outlines of earlier chapters instead of their digests. Shard identification has its own limit (IDENTIFY_CONCURRENCY).")
 
     args = parser.parse_args()
 
@@ -70,6 +103,8 @@ def main():
     shared = {
         "repo_url": args.repo,
         "local_dir": args.dir,
+        "archive_path": args.archive,
+        "strip_components": args.strip_components,
         "project_name": args.name, # Can be None, FetchRepo will derive it
         "github_token": github_token,
         "output_dir": args.output, # Base directory for CombineTutorial output
@@ -79,6 +114,23 @@ def main():
         "exclude_patterns": set(args.exclude) if args.exclude else DEFAULT_EXCLUDE_PATTERNS,
         "max_file_size": args.max_size,
 
+        # Local crawl through the git index or from a ref; for --repo, the ref and directory to crawl
+        "use_git_index": args.git_index,
+        "git_ref": args.git_ref,
+        "subdir": args.subdir,
+
+        # Reuse unchanged files from the previous local crawl
+        "use_scan_cache": args.scan_cache,
+
+        # Reuse and revalidate GitHub responses from the previous crawl
+        "use_http_cache": not args.no_http_cache,
+
+        # Crawl SSH repositories from a persistent bare mirror
+        "use_mirror_cache": args.mirror_cache,
+
+        # Crawl progress output mode
+        "progress": args.progress,
+
         # Add language for multi-language support
         "language": args.language,
         
@@ -88,6 +140,18 @@ def main():
         # Add max_abstraction_num parameter
         "max_abstraction_num": args.max_abstractions,
 
+        # Token budget for the IdentifyAbstractions codebase context
+        "context_token_budget": args.context_tokens,
+
+        # single, sharded or auto (sharded when the files exceed the context budget)
+        "identify_mode": args.identify_mode,
+
+        # Chapter ordering strategy for OrderChapters
+        "order_strategy": args.order_strategy,
+
+        # Token budget for the previous-chapters digest in WriteChapters
+        "previous_chapters_token_budget": args.chapter_context_tokens,
+
         # Outputs will be populated by the nodes
         "files": [],
         "abstractions": [],
@@ -98,14 +162,47 @@ def main():
     }
 
     # Display starting message with repository/directory and language
-    print(f"Starting tutorial generation for: {args.repo or args.dir} in {args.language.capitalize()} language")
+    print(f"Starting tutorial generation for: {args.repo or args.dir or args.archive} in {args.language.capitalize()} language")
     print(f"LLM caching: {'Disabled' if args.no_cache else 'Enabled'}")
 
-    # Create the flow instance
-    tutorial_flow = create_tutorial_flow()
-
-    # Run the flow
-    tutorial_flow.run(shared)
+    # Spans for nodes, LLM calls and HTTP requests (and per-node peak allocations with --profile)
+    tracer = enable_tracing(profile_memory=args.profile) if args.trace or args.profile else None
+
+    try:
+        if args.jobs > 1:
+            # Run the async flow so chapter requests overlap
+            print(f"Writing up to {args.jobs} chapters in parallel")
+            # Chapters are limited to --jobs by the node and shards to IDENTIFY_CONCURRENCY;
+            # the overall limit only has to let all of those through
+            set_llm_concurrency(max(args.jobs, config.llm_concurrency, config.identify_concurrency))
+            tutorial_flow = create_async_tutorial_flow(jobs=args.jobs)
+            if tracer:
+                instrument_flow(tutorial_flow)
+            asyncio.run(tutorial_flow.run_async(shared))
+        else:
+            # Create the flow instance
+            tutorial_flow = create_tutorial_flow()
+            if tracer:
+                instrument_flow(tutorial_flow)
+
+            # Run the flow
+            tutorial_flow.run(shared)
+    finally:
+        # Also written when the run fails, to show where it stopped
+        if tracer:
+            tracer.print_summary()
+            if args.trace:
+                tracer.export(args.trace, args.trace_format)
+                print(f"Trace written to {args.trace} ({args.trace_format} format)")
+
+    cache_stats = get_cache_stats()
+    if cache_stats:
+        print(f"LLM memory cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+              f"{cache_stats['evictions']} evictions, {cache_stats['bytes']}/{cache_stats['max_bytes']} bytes")
+
+    peak_rss = peak_rss_bytes()
+    if peak_rss:
+        print(f"Peak memory (RSS): {peak_rss / (1024 * 1024):.1f} MB")
 
 if __name__ == "__main__":
     main()
@@ -1,10 +1,20 @@
 import os
 import re
+import copy
 import yaml
-from pocketflow import Node, BatchNode
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from pocketflow import Node, BatchNode, AsyncNode, AsyncBatchNode, AsyncParallelBatchNode
+from config import config
 from utils.crawl_github_files import crawl_github_files
-from utils.call_llm import call_llm
+from utils.archive_ingest import ingest_archive, archive_name
+from utils.call_llm import call_llm, acall_llm
 from utils.crawl_local_files import crawl_local_files
+from utils.token_budget import fit_recent, markdown_digest
+from utils.context_packer import pack_context, shard_files, estimate_files_tokens
+from utils.chapter_order import graph_chapter_order, break_ties
+from utils.file_store import FileStore, file_paths
 
 
 # Helper to get content for specific file indices
@@ -23,12 +33,15 @@ class FetchRepo(Node):
     def prep(self, shared):
         repo_url = shared.get("repo_url")
         local_dir = shared.get("local_dir")
+        archive_path = shared.get("archive_path")
         project_name = shared.get("project_name")
 
         if not project_name:
-            # Basic name derivation from URL or directory
+            # Basic name derivation from URL, archive or directory
             if repo_url:
                 project_name = repo_url.split("/")[-1].replace(".git", "")
+            elif archive_path:
+                project_name = archive_name(archive_path)
             else:
                 project_name = os.path.basename(os.path.abspath(local_dir))
             shared["project_name"] = project_name
@@ -41,11 +54,20 @@ class FetchRepo(Node):
         return {
             "repo_url": repo_url,
             "local_dir": local_dir,
+            "archive_path": archive_path,
+            "strip_components": shared.get("strip_components", 0),
             "token": shared.get("github_token"),
             "include_patterns": include_patterns,
             "exclude_patterns": exclude_patterns,
             "max_file_size": max_file_size,
             "use_relative_paths": True,
+            "progress": shared.get("progress", "bar"),
+            "use_git_index": shared.get("use_git_index", False),
+            "git_ref": shared.get("git_ref"),
+            "subdir": shared.get("subdir"),
+            "use_mirror_cache": shared.get("use_mirror_cache", False),
+            "use_scan_cache": shared.get("use_scan_cache", False),
+            "use_http_cache": shared.get("use_http_cache", False),
         }
 
     def exec(self, prep_res):
@@ -58,6 +80,22 @@ class FetchRepo(Node):
                 exclude_patterns=prep_res["exclude_patterns"],
                 max_file_size=prep_res["max_file_size"],
                 use_relative_paths=prep_res["use_relative_paths"],
+                progress=prep_res["progress"],
+                use_http_cache=prep_res["use_http_cache"],
+                ref=prep_res["git_ref"],
+                subdir=prep_res["subdir"],
+                use_mirror_cache=prep_res["use_mirror_cache"],
+            )
+        elif prep_res["archive_path"]:
+            print(f"Reading archive: {prep_res['archive_path']}...")
+            result = ingest_archive(
+                prep_res["archive_path"],
+                include_patterns=prep_res["include_patterns"],
+                exclude_patterns=prep_res["exclude_patterns"],
+                max_file_size=prep_res["max_file_size"],
+                progress=prep_res["progress"],
+                file_store=FileStore(),
+                strip_components=prep_res["strip_components"],
             )
         else:
             print(f"Crawling directory: {prep_res['local_dir']}...")
@@ -67,18 +105,32 @@ class FetchRepo(Node):
                 include_patterns=prep_res["include_patterns"],
                 exclude_patterns=prep_res["exclude_patterns"],
                 max_file_size=prep_res["max_file_size"],
-                use_relative_paths=prep_res["use_relative_paths"]
+                use_relative_paths=prep_res["use_relative_paths"],
+                progress=prep_res["progress"],
+                use_git_index=prep_res["use_git_index"],
+                git_ref=prep_res["git_ref"],
+                use_scan_cache=prep_res["use_scan_cache"],
+                file_store=FileStore(),
             )
 
-        # Convert dict to list of tuples: [(path, content), ...]
-        files_list = list(result.get("files", {}).items())
+        # Sequence of (path, content) tuples; contents stay on disk until accessed
+        files = result.get("files", {})
+        files_list = files if isinstance(files, FileStore) else FileStore(files.items())
         if len(files_list) == 0:
             raise (ValueError("Failed to fetch files"))
         print(f"Fetched {len(files_list)} files.")
         return files_list
 
     def post(self, shared, prep_res, exec_res):
-        shared["files"] = exec_res  # List of (path, content) tuples
+        shared["files"] = exec_res  # FileStore: sequence of (path, content) tuples
+
+        # Route to sharded abstraction identification when asked to, or when the files can't fit one context
+        identify_mode = shared.get("identify_mode", "single")
+        if identify_mode == "auto":
+            token_budget = shared.get("context_token_budget", 600000)
+            identify_mode = "sharded" if estimate_files_tokens(exec_res) > token_budget else "single"
+        if identify_mode == "sharded":
+            return "sharded"
 
 
 class IdentifyAbstractions(Node):
@@ -88,19 +140,21 @@ class IdentifyAbstractions(Node):
         language = shared.get("language", "english")  # Get language
         use_cache = shared.get("use_cache", True)  # Get use_cache flag, default to True
         max_abstraction_num = shared.get("max_abstraction_num", 10)  # Get max_abstraction_num, default to 10
+        token_budget = shared.get("context_token_budget", 600000)  # Get context token budget
+
+        # Pack the most important files into the token budget; the rest are skeletonized, truncated or dropped
+        context, file_info, context_report = pack_context(files_data, token_budget)  # file_info is list of (index, path)
+        print(
+            f"Context: {len(context_report['full'])} full, {len(context_report['skeleton'])} skeleton, "
+            f"{len(context_report['truncated'])} truncated, {len(context_report['dropped'])} dropped "
+            f"(~{context_report['tokens']} of {token_budget} tokens)"
+        )
+        paths = file_paths(files_data)
+        for i in context_report["dropped"][:20]:
+            print(f"  Dropped from context: {paths[i]}")
+        if len(context_report["dropped"]) > 20:
+            print(f"  ... and {len(context_report['dropped']) - 20} more")
 
-        # Helper to create context from files, respecting limits (basic example)
-        def create_llm_context(files_data):
-            context = ""
-            file_info = []  # Store tuples of (index, path)
-            for i, (path, content) in enumerate(files_data):
-                entry = f"--- File Index {i}: {path} ---\n{content}\n\n"
-                context += entry
-                file_info.append((i, path))
-
-            return context, file_info  # file_info is list of (index, path)
-
-        context, file_info = create_llm_context(files_data)
         # Format file info for the prompt (comment is just a hint for LLM)
         file_listing_for_prompt = "\n".join(
             [f"- {idx} # {path}" for idx, path in file_info]
@@ -113,9 +167,10 @@ class IdentifyAbstractions(Node):
             language,
             use_cache,
             max_abstraction_num,
+            context_report,
         )  # Return all parameters
 
-    def exec(self, prep_res):
+    def build_prompt(self, prep_res):
         (
             context,
             file_listing_for_prompt,
@@ -124,8 +179,8 @@ class IdentifyAbstractions(Node):
             language,
             use_cache,
             max_abstraction_num,
+            context_report,
         ) = prep_res  # Unpack all parameters
-        print(f"Identifying abstractions using LLM...")
 
         # Add language instruction and hints only if not English
         language_instruction = ""
@@ -173,7 +228,17 @@ Format the output as a YAML list of dictionaries:
     - 5 # path/to/another.js
 # ... up to {max_abstraction_num} abstractions
 ```"""
+        return prompt
+
+    def exec(self, prep_res):
+        use_cache = prep_res[5]
+        print(f"Identifying abstractions using LLM...")
+        prompt = self.build_prompt(prep_res)
         response = call_llm(prompt, use_cache=(use_cache and self.cur_retry == 0))  # Use cache only if enabled and not retrying
+        return self.parse_response(response, prep_res)
+
+    def parse_response(self, response, prep_res):
+        file_count = prep_res[2]
 
         # --- Validation ---
         yaml_str = response.strip().split("```yaml")[1].split("```")[0].strip()
@@ -235,6 +300,265 @@ Format the output as a YAML list of dictionaries:
         shared["abstractions"] = (
             exec_res  # List of {"name": str, "description": str, "files": [int]}
         )
+        shared["context_report"] = prep_res[7]  # Which files went into the context and how
+
+
+class IdentifyShardAbstractions(BatchNode, IdentifyAbstractions):
+    """
+    Map step of sharded abstraction identification for repositories that do
+    not fit one context window.
+
+    shared["files"] is split into context-sized shards by directory; each shard
+    gets the regular IdentifyAbstractions prompt with shard-local indices, and
+    the resulting candidates are remapped to global file indices. Shards are
+    independent, so up to config.identify_concurrency of them are identified
+    at once on worker threads.
+    """
+
+    def prep(self, shared):
+        files_data = shared["files"]
+        project_name = shared["project_name"]  # Get project name
+        language = shared.get("language", "english")  # Get language
+        use_cache = shared.get("use_cache", True)  # Get use_cache flag, default to True
+        max_abstraction_num = shared.get("max_abstraction_num", 10)  # Get max_abstraction_num, default to 10
+        token_budget = shared.get("context_token_budget", 600000)  # Get context token budget
+
+        shards = shard_files(files_data, token_budget)
+        print(f"Splitting {len(files_data)} files into {len(shards)} shards for abstraction identification...")
+
+        # Shard contexts are built in exec, one at a time, so they are never all in memory together
+        return [
+            {
+                "shard_num": shard_num,
+                "global_indices": shard,  # Shard-local index -> global file index
+                "files_data": files_data,
+                "project_name": project_name,
+                "language": language,
+                "use_cache": use_cache,
+                "max_abstraction_num": max_abstraction_num,
+                "token_budget": token_budget,
+            }
+            for shard_num, shard in enumerate(shards)
+        ]
+
+    def _exec(self, items):
+        workers = min(config.identify_concurrency, len(items or []))
+        if workers <= 1:
+            return super()._exec(items)
+
+        def identify(item):
+            # Each shard runs on its own copy of the node, so retries (self.cur_retry) don't interfere
+            return super(BatchNode, copy.copy(self))._exec(item)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Copy the context so tracing spans stay nested under this node
+            futures = [pool.submit(contextvars.copy_context().run, identify, item) for item in items]
+            return [future.result() for future in futures]
+
+    def shard_prep_res(self, item):
+        """Build the shard's context, in the same layout as IdentifyAbstractions.prep so build_prompt/parse_response apply unchanged."""
+        files_data = item["files_data"]
+        shard_files_data = [files_data[i] for i in item["global_indices"]]
+        context, file_info, context_report = pack_context(shard_files_data, item["token_budget"])
+        file_listing_for_prompt = "\n".join(
+            [f"- {idx} # {path}" for idx, path in file_info]
+        )
+        return (
+            context,
+            file_listing_for_prompt,
+            len(shard_files_data),
+            item["project_name"],
+            item["language"],
+            item["use_cache"],
+            item["max_abstraction_num"],
+            context_report,
+        )
+
+    def exec(self, item):
+        prep_res = self.shard_prep_res(item)
+        use_cache = item["use_cache"]
+        print(f"Identifying candidate abstractions in shard {item['shard_num'] + 1} using LLM...")
+        prompt = self.build_prompt(prep_res)
+        response = call_llm(prompt, use_cache=(use_cache and self.cur_retry == 0))  # Use cache only if enabled and not retrying
+        return self.remap_candidates(self.parse_response(response, prep_res), item)
+
+    def remap_candidates(self, abstractions, item):
+        global_indices = item["global_indices"]
+        for abstraction in abstractions:
+            abstraction["files"] = sorted(global_indices[i] for i in abstraction["files"])
+        return abstractions
+
+    def post(self, shared, prep_res, exec_res_list):
+        candidates = [abstraction for shard_result in exec_res_list for abstraction in shard_result]
+        shared["abstraction_candidates"] = candidates
+        print(f"Identified {len(candidates)} candidate abstractions across {len(exec_res_list)} shards.")
+
+
+class MergeAbstractions(Node):
+    """
+    Reduce step of sharded abstraction identification: dedupes the candidates
+    from all shards and, if more than max_abstraction_num remain, asks the LLM
+    to merge them. File indices of merged candidates are unioned.
+    """
+
+    def prep(self, shared):
+        candidates = shared["abstraction_candidates"]
+        files_data = shared["files"]
+        project_name = shared["project_name"]  # Get project name
+        language = shared.get("language", "english")  # Get language
+        use_cache = shared.get("use_cache", True)  # Get use_cache flag, default to True
+        max_abstraction_num = shared.get("max_abstraction_num", 10)  # Get max_abstraction_num, default to 10
+
+        # Candidates with the same name (from different shards) are the same abstraction
+        merged_by_name = {}
+        for candidate in candidates:
+            key = " ".join(candidate["name"].lower().split())
+            if key in merged_by_name:
+                existing = merged_by_name[key]
+                existing["files"] = sorted(set(existing["files"]) | set(candidate["files"]))
+            else:
+                merged_by_name[key] = dict(candidate)
+        candidates = list(merged_by_name.values())
+
+        candidate_listing = []
+        all_paths = file_paths(files_data)
+        for i, candidate in enumerate(candidates):
+            paths = [all_paths[f] for f in candidate["files"][:8]]
+            if len(candidate["files"]) > 8:
+                paths.append(f"... {len(candidate['files']) - 8} more")
+            description = " ".join(candidate["description"].split())
+            candidate_listing.append(
+                f"- {i} # {candidate['name'].strip()}\n  Description: {description}\n  Files: {', '.join(paths)}"
+            )
+
+        return (
+            candidates,
+            "\n".join(candidate_listing),
+            project_name,
+            language,
+            use_cache,
+            max_abstraction_num,
+        )
+
+    def build_prompt(self, prep_res):
+        (
+            candidates,
+            candidate_listing,
+            project_name,
+            language,
+            use_cache,
+            max_abstraction_num,
+        ) = prep_res
+
+        # Add language instruction and hints only if not English
+        language_instruction = ""
+        name_lang_hint = ""
+        desc_lang_hint = ""
+        if language.lower() != "english":
+            language_instruction = f"IMPORTANT: Generate the `name` and `description` for each abstraction in **{language.capitalize()}** language. Do NOT use English for these fields.\n\n"
+            name_lang_hint = f" (value in {language.capitalize()})"
+            desc_lang_hint = f" (value in {language.capitalize()})"
+
+        prompt = f"""
+For the project `{project_name}`:
+
+Different parts of the codebase were analyzed separately. These candidate abstractions were found:
+{candidate_listing}
+
+{language_instruction}Merge duplicates and closely related candidates, and select the top 5-{max_abstraction_num} core most important abstractions to help those new to the codebase.
+
+For each abstraction, provide:
+1. A concise `name`{name_lang_hint}.
+2. A beginner-friendly `description` explaining what it is with a simple analogy, in around 100 words{desc_lang_hint}.
+3. A list of `candidate_indices` (integers) of the candidates it combines, using the format `idx # CandidateName`.
+
+Format the output as a YAML list of dictionaries:
+
+```yaml
+- name: |
+    Query Processing{name_lang_hint}
+  description: |
+    Explains what the abstraction does.
+    It's like a central dispatcher routing requests.{desc_lang_hint}
+  candidate_indices:
+    - 0 # Query Parser
+    - 7 # Request Router
+- name: |
+    Query Optimization{name_lang_hint}
+  description: |
+    Another core concept, similar to a blueprint for objects.{desc_lang_hint}
+  candidate_indices:
+    - 3 # Query Optimizer
+# ... up to {max_abstraction_num} abstractions
+```"""
+        return prompt
+
+    def exec(self, prep_res):
+        candidates, _, _, _, use_cache, max_abstraction_num = prep_res
+        if len(candidates) <= max_abstraction_num:
+            print(f"Kept all {len(candidates)} candidate abstractions.")
+            return [
+                {"name": c["name"], "description": c["description"], "files": c["files"]}
+                for c in candidates
+            ]
+
+        print(f"Merging {len(candidates)} candidate abstractions using LLM...")
+        prompt = self.build_prompt(prep_res)
+        response = call_llm(prompt, use_cache=(use_cache and self.cur_retry == 0))  # Use cache only if enabled and not retrying
+        return self.parse_response(response, prep_res)
+
+    def parse_response(self, response, prep_res):
+        candidates = prep_res[0]
+
+        # --- Validation ---
+        yaml_str = response.strip().split("```yaml")[1].split("```")[0].strip()
+        abstractions = yaml.safe_load(yaml_str)
+
+        if not isinstance(abstractions, list):
+            raise ValueError("LLM Output is not a list")
+
+        merged_abstractions = []
+        for item in abstractions:
+            if not isinstance(item, dict) or not all(
+                k in item for k in ["name", "description", "candidate_indices"]
+            ):
+                raise ValueError(f"Missing keys in abstraction item: {item}")
+            if not isinstance(item["name"], str):
+                raise ValueError(f"Name is not a string in item: {item}")
+            if not isinstance(item["description"], str):
+                raise ValueError(f"Description is not a string in item: {item}")
+            if not isinstance(item["candidate_indices"], list) or not item["candidate_indices"]:
+                raise ValueError(f"candidate_indices is not a non-empty list in item: {item}")
+
+            files = set()
+            for idx_entry in item["candidate_indices"]:
+                try:
+                    idx = int(str(idx_entry).split("#")[0].strip())
+                except (ValueError, TypeError):
+                    raise ValueError(
+                        f"Could not parse index from entry: {idx_entry} in item {item['name']}"
+                    )
+                if not (0 <= idx < len(candidates)):
+                    raise ValueError(
+                        f"Invalid candidate index {idx} found in item {item['name']}. Max index is {len(candidates) - 1}."
+                    )
+                files.update(candidates[idx]["files"])
+
+            merged_abstractions.append(
+                {
+                    "name": item["name"],  # Potentially translated name
+                    "description": item["description"],  # Potentially translated description
+                    "files": sorted(files),
+                }
+            )
+
+        print(f"Merged into {len(merged_abstractions)} abstractions.")
+        return merged_abstractions
+
+    def post(self, shared, prep_res, exec_res):
+        shared["abstractions"] = (
+            exec_res  # List of {"name": str, "description": str, "files": [int]}
+        )
 
 
 class AnalyzeRelationships(Node):
@@ -286,7 +610,7 @@ class AnalyzeRelationships(Node):
             use_cache,
         )  # Return use_cache
 
-    def exec(self, prep_res):
+    def build_prompt(self, prep_res):
         (
             context,
             abstraction_listing,
@@ -295,7 +619,6 @@ class AnalyzeRelationships(Node):
             language,
             use_cache,
          ) = prep_res  # Unpack use_cache
-        print(f"Analyzing relationships using LLM...")
 
         # Add language instruction and hints only if not English
         language_instruction = ""
@@ -344,7 +667,17 @@ relationships:
 
 Now, provide the YAML output:
 """
+        return prompt
+
+    def exec(self, prep_res):
+        use_cache = prep_res[5]
+        print(f"Analyzing relationships using LLM...")
+        prompt = self.build_prompt(prep_res)
         response = call_llm(prompt, use_cache=(use_cache and self.cur_retry == 0)) # Use cache only if enabled and not retrying
+        return self.parse_response(response, prep_res)
+
+    def parse_response(self, response, prep_res):
+        num_abstractions = prep_res[2]
 
         # --- Validation ---
         yaml_str = response.strip().split("```yaml")[1].split("```")[0].strip()
@@ -414,6 +747,10 @@ class OrderChapters(Node):
         project_name = shared["project_name"]  # Get project name
         language = shared.get("language", "english")  # Get language
         use_cache = shared.get("use_cache", True)  # Get use_cache flag, default to True
+        order_strategy = shared.get("order_strategy", "llm")  # graph, llm or hybrid
+
+        # Ordering derived locally from the relationship graph (used by graph and hybrid strategies)
+        graph_order, tie_groups = graph_chapter_order(len(abstractions), relationships["details"])
 
         # Prepare context for the LLM
         abstraction_info_for_prompt = []
@@ -442,6 +779,11 @@ class OrderChapters(Node):
         if language.lower() != "english":
             list_lang_note = f" (Names might be in {language.capitalize()})"
 
+        # Hybrid asks the LLM about the tied groups only, not the whole order
+        tie_listing = ""
+        if order_strategy == "hybrid" and tie_groups:
+            tie_listing = self.tie_group_listing(abstractions, relationships, graph_order, tie_groups)
+
         return (
             abstraction_listing,
             context,
@@ -449,9 +791,37 @@ class OrderChapters(Node):
             project_name,
             list_lang_note,
             use_cache,
+            order_strategy,
+            (graph_order, tie_groups),
+            (relationships["summary"], tie_listing),
         )  # Return use_cache
 
-    def exec(self, prep_res):
+    def tie_group_listing(self, abstractions, relationships, graph_order, tie_groups):
+        """Each tie group with the chapters around it, then the relationships involving tied abstractions."""
+        def name(i):
+            return abstractions[i]["name"].strip()
+
+        sections = []
+        for n, group in enumerate(tie_groups, 1):
+            positions = sorted(graph_order.index(i) for i in group)
+            around = []
+            if positions[0] > 0:
+                around.append(f"after \"{name(graph_order[positions[0] - 1])}\"")
+            if positions[-1] + 1 < len(graph_order):
+                around.append(f"before \"{name(graph_order[positions[-1] + 1])}\"")
+            lines = [f"Group {n}" + (f" (comes {' and '.join(around)})" if around else "") + ":"]
+            lines += [f"- {i} # {name(i)}" for i in group]
+            sections.append("\n".join(lines))
+
+        tied = {i for group in tie_groups for i in group}
+        related = [rel for rel in relationships["details"] if rel["from"] in tied or rel["to"] in tied]
+        if related:
+            sections.append("Relationships (Indices refer to abstractions):\n" + "\n".join(
+                f"  From {rel['from']} to {rel['to']}: {rel['label']}" for rel in related
+            ))
+        return "\n\n".join(sections)
+
+    def build_prompt(self, prep_res):
         (
             abstraction_listing,
             context,
@@ -459,8 +829,12 @@ class OrderChapters(Node):
             project_name,
             list_lang_note,
             use_cache,
+            order_strategy,
+            graph_result,
+            (summary, tie_listing),
         ) = prep_res  # Unpack use_cache
-        print("Determining chapter order using LLM...")
+        if tie_listing:
+            return self.build_tie_prompt(project_name, list_lang_note, summary, tie_listing)
         # No language variation needed here in prompt instructions, just ordering based on structure
         # The input names might be translated, hence the note.
         prompt = f"""
@@ -486,7 +860,61 @@ Output the ordered list of abstraction indices, including the name in a comment
 
 Now, provide the YAML output:
 """
+        return prompt
+
+    def build_tie_prompt(self, project_name, list_lang_note, summary, tie_listing):
+        # Hybrid: the relationship graph fixed every position except the order inside each group
+        prompt = f"""
+A tutorial for the project ```` {project_name} ```` has a fixed chapter order, except inside the groups below.
+
+Project Summary:
+{summary}
+
+Groups (Index # Name){list_lang_note}:
+{tie_listing}
+
+Within each group, what is the best order to explain these abstractions? Foundational or user-facing concepts first, lower-level details later.
+
+Output the indices of all groups as one list, each group in its order, as `idx # AbstractionName`:
+
+```yaml
+- 4 # FoundationalConcept
+- 2 # CoreClassA
+- ...
+```
+
+Now, provide the YAML output:
+"""
+        return prompt
+
+    def graph_only_order(self, prep_res):
+        # Returns the graph-derived order when no LLM call is needed, else None
+        order_strategy = prep_res[6]
+        graph_order, tie_groups = prep_res[7]
+        if order_strategy == "graph" or (order_strategy == "hybrid" and not tie_groups):
+            print(f"Determined chapter order from the relationship graph (indices): {graph_order}")
+            return graph_order
+        return None
+
+    def exec(self, prep_res):
+        graph_order = self.graph_only_order(prep_res)
+        if graph_order is not None:
+            return graph_order
+
+        use_cache = prep_res[5]
+        print("Determining chapter order using LLM...")
+        prompt = self.build_prompt(prep_res)
         response = call_llm(prompt, use_cache=(use_cache and self.cur_retry == 0)) # Use cache only if enabled and not retrying
+        return self.parse_response(response, prep_res)
+
+    def parse_response(self, response, prep_res):
+        num_abstractions = prep_res[2]
+        order_strategy = prep_res[6]
+        graph_order, tie_groups = prep_res[7]
+        # Hybrid answers list the tied abstractions only
+        expected = (
+            {i for group in tie_groups for i in group} if order_strategy == "hybrid" else set(range(num_abstractions))
+        )
 
         # --- Validation ---
         yaml_str = response.strip().split("```yaml")[1].split("```")[0].strip()
@@ -506,9 +934,9 @@ Now, provide the YAML output:
                 else:
                     idx = int(str(entry).strip())
 
-                if not (0 <= idx < num_abstractions):
+                if idx not in expected:
                     raise ValueError(
-                        f"Invalid index {idx} in ordered list. Max index is {num_abstractions-1}."
+                        f"Invalid index {idx} in ordered list. Expected indices: {sorted(expected)}."
                     )
                 if idx in seen_indices:
                     raise ValueError(f"Duplicate index {idx} found in ordered list.")
@@ -521,11 +949,15 @@ Now, provide the YAML output:
                 )
 
         # Check if all abstractions are included
-        if len(ordered_indices) != num_abstractions:
+        if len(ordered_indices) != len(expected):
             raise ValueError(
-                f"Ordered list length ({len(ordered_indices)}) does not match number of abstractions ({num_abstractions}). Missing indices: {set(range(num_abstractions)) - seen_indices}"
+                f"Ordered list length ({len(ordered_indices)}) does not match number of abstractions ({len(expected)}). Missing indices: {expected - seen_indices}"
             )
 
+        # Hybrid: keep the graph order and only take the LLM's preference where the graph ties
+        if order_strategy == "hybrid":
+            ordered_indices = break_ties(graph_order, tie_groups, ordered_indices)
+
         print(f"Determined chapter order (indices): {ordered_indices}")
         return ordered_indices  # Return the list of indices
 
@@ -535,22 +967,26 @@ Now, provide the YAML output:
 
 
 class WriteChapters(BatchNode):
+    DIGEST_TOKENS = 300  # Upper bound for the digest of one chapter
+
     def prep(self, shared):
         chapter_order = shared["chapter_order"]  # List of indices
         abstractions = shared[
             "abstractions"
         ]  # List of {"name": str, "description": str, "files": [int]}
-        files_data = shared["files"]  # List of (path, content) tuples
+        files_data = shared["files"]  # Sequence of (path, content) tuples
         project_name = shared["project_name"]
         language = shared.get("language", "english")
         use_cache = shared.get("use_cache", True)  # Get use_cache flag, default to True
 
         # Get already written chapters to provide context
-        # We store them temporarily during the batch run, not in shared memory yet
+        # We store a compact digest of each one temporarily during the batch run, not in shared memory yet
         # The 'previous_chapters_summary' will be built progressively in the exec context
-        self.chapters_written_so_far = (
+        self.chapter_digests = (
             []
         )  # Use instance variable for temporary storage across exec calls
+        # Token budget for the whole "previous chapters" section, so prompt size stays flat as chapters accumulate
+        self.previous_chapters_token_budget = shared.get("previous_chapters_token_budget", 2000)
 
         # Create a complete list of all chapters
         all_chapters = []
@@ -579,17 +1015,14 @@ class WriteChapters(BatchNode):
         full_chapter_listing = "\n".join(all_chapters)
 
         items_to_process = []
+        outline_so_far = []  # Name + description of earlier chapters, used in parallel mode
         for i, abstraction_index in enumerate(chapter_order):
             if 0 <= abstraction_index < len(abstractions):
                 abstraction_details = abstractions[
                     abstraction_index
                 ]  # Contains potentially translated name/desc
-                # Use 'files' (list of indices) directly
+                # Use 'files' (list of indices) directly; contents are read when the prompt is built
                 related_file_indices = abstraction_details.get("files", [])
-                # Get content using helper, passing indices
-                related_files_content_map = get_content_for_indices(
-                    files_data, related_file_indices
-                )
 
                 # Get previous chapter info for transitions (uses potentially translated name)
                 prev_chapter = None
@@ -608,7 +1041,8 @@ class WriteChapters(BatchNode):
                         "chapter_num": i + 1,
                         "abstraction_index": abstraction_index,
                         "abstraction_details": abstraction_details,  # Has potentially translated name/desc
-                        "related_files_content_map": related_files_content_map,
+                        "related_file_indices": related_file_indices,
+                        "files_data": files_data,
                         "project_name": shared["project_name"],  # Add project name
                         "full_chapter_listing": full_chapter_listing,  # Add the full chapter listing (uses potentially translated names)
                         "chapter_filenames": chapter_filenames,  # Add chapter filenames mapping (uses potentially translated names)
@@ -616,9 +1050,13 @@ class WriteChapters(BatchNode):
                         "next_chapter": next_chapter,  # Add next chapter info (uses potentially translated name)
                         "language": language,  # Add language for multi-language support
                         "use_cache": use_cache, # Pass use_cache flag
+                        "previous_chapters_outline": list(outline_so_far),  # Stand-in for chapter text when chapters are written in parallel
                         # previous_chapters_summary will be added dynamically in exec
                     }
                 )
+                outline_so_far.append(
+                    f"Chapter {i + 1}: {abstraction_details['name']}\n{abstraction_details['description']}"
+                )
             else:
                 print(
                     f"Warning: Invalid abstraction index {abstraction_index} in chapter_order. Skipping."
@@ -627,8 +1065,7 @@ class WriteChapters(BatchNode):
         print(f"Preparing to write {len(items_to_process)} chapters...")
         return items_to_process  # Iterable for BatchNode
 
-    def exec(self, item):
-        # This runs for each item prepared above
+    def build_prompt(self, item):
         abstraction_name = item["abstraction_details"][
             "name"
         ]  # Potentially translated name
@@ -638,18 +1075,18 @@ class WriteChapters(BatchNode):
         chapter_num = item["chapter_num"]
         project_name = item.get("project_name")
         language = item.get("language", "english")
-        use_cache = item.get("use_cache", True) # Read use_cache from item
-        print(f"Writing chapter {chapter_num} for: {abstraction_name} using LLM...")
 
-        # Prepare file context string from the map
+        # Prepare file context string from the related files
+        related_files_content_map = get_content_for_indices(
+            item["files_data"], item["related_file_indices"]
+        )
         file_context_str = "\n\n".join(
             f"--- File: {idx_path.split('# ')[1] if '# ' in idx_path else idx_path} ---\n{content}"
-            for idx_path, content in item["related_files_content_map"].items()
+            for idx_path, content in related_files_content_map.items()
         )
 
         # Get summary of chapters written *before* this one
-        # Use the temporary instance variable
-        previous_chapters_summary = "\n---\n".join(self.chapters_written_so_far)
+        previous_chapters_summary = self.previous_chapters_context(item)
 
         # Add language instruction and context notes only if not English
         language_instruction = ""
@@ -723,7 +1160,34 @@ Instructions for the chapter (Generate content in {language.capitalize()} unless
 
 Now, directly provide a super beginner-friendly Markdown output (DON'T need ```markdown``` tags):
 """
+        return prompt
+
+    def previous_chapters_context(self, item):
+        # Use the temporary instance variable; recent digests are kept whole, older ones shrink to their heading
+        return fit_recent(self.chapter_digests, self.previous_chapters_token_budget)
+
+    def remember_chapter(self, chapter_content):
+        # Digest each chapter once; later prompts only ever see the digest
+        digest_tokens = min(self.DIGEST_TOKENS, self.previous_chapters_token_budget)
+        self.chapter_digests.append(markdown_digest(chapter_content, digest_tokens))
+
+    def exec(self, item):
+        # This runs for each item prepared above
+        use_cache = item.get("use_cache", True) # Read use_cache from item
+        print(f"Writing chapter {item['chapter_num']} for: {item['abstraction_details']['name']} using LLM...")
+        prompt = self.build_prompt(item)
         chapter_content = call_llm(prompt, use_cache=(use_cache and self.cur_retry == 0)) # Use cache only if enabled and not retrying
+        chapter_content = self.parse_response(chapter_content, item)
+
+        # Add a digest of the generated content to our temporary list for the next iteration's context
+        self.remember_chapter(chapter_content)
+
+        return chapter_content  # Return the Markdown string (potentially translated)
+
+    def parse_response(self, chapter_content, item):
+        chapter_num = item["chapter_num"]
+        abstraction_name = item["abstraction_details"]["name"]
+
         # Basic validation/cleanup
         actual_heading = f"# Chapter {chapter_num}: {abstraction_name}"  # Use potentially translated name
         if not chapter_content.strip().startswith(f"# Chapter {chapter_num}"):
@@ -736,17 +1200,13 @@ Now, directly provide a super beginner-friendly Markdown output (DON'T need ```m
                 chapter_content = "\n".join(lines)
             else:  # Otherwise, prepend it
                 chapter_content = f"{actual_heading}\n\n{chapter_content}"
-
-        # Add the generated content to our temporary list for the next iteration's context
-        self.chapters_written_so_far.append(chapter_content)
-
-        return chapter_content  # Return the Markdown string (potentially translated)
+        return chapter_content
 
     def post(self, shared, prep_res, exec_res_list):
         # exec_res_list contains the generated Markdown for each chapter, in order
         shared["chapters"] = exec_res_list
         # Clean up the temporary instance variable
-        del self.chapters_written_so_far
+        del self.chapter_digests
         print(f"Finished writing {len(exec_res_list)} chapters.")
 
 
@@ -878,3 +1338,137 @@ class CombineTutorial(Node):
     def post(self, shared, prep_res, exec_res):
         shared["final_output_dir"] = exec_res  # Store the output path
         print(f"\nTutorial generation complete! Files are in: {exec_res}")
+
+
+# --- Async variants of the LLM nodes ---
+# They reuse prep/post and the prompt/parse helpers of the synchronous nodes and
+# only replace the blocking call_llm with acall_llm, so many LLM requests can be
+# in flight in one process (see flow.create_async_tutorial_flow).
+
+
+class AsyncLLMNode(AsyncNode):
+    """
+    Mixin base for async LLM nodes.
+
+    pocketflow's AsyncNode does not expose the retry number, so _exec passes it
+    to exec_async explicitly. Keeping it out of self also keeps retries of
+    concurrently running batch items independent.
+    """
+
+    async def prep_async(self, shared):
+        return self.prep(shared)
+
+    async def post_async(self, shared, prep_res, exec_res):
+        return self.post(shared, prep_res, exec_res)
+
+    async def _exec(self, prep_res):
+        for retry in range(self.max_retries):
+            try:
+                return await self.exec_async(prep_res, retry)
+            except Exception as e:
+                if retry == self.max_retries - 1:
+                    return await self.exec_fallback_async(prep_res, e)
+                if self.wait > 0:
+                    await asyncio.sleep(self.wait)
+
+
+class AsyncIdentifyAbstractions(AsyncLLMNode, IdentifyAbstractions):
+    async def exec_async(self, prep_res, retry=0):
+        use_cache = prep_res[5]
+        print(f"Identifying abstractions using LLM...")
+        prompt = self.build_prompt(prep_res)
+        response = await acall_llm(prompt, use_cache=(use_cache and retry == 0))  # Use cache only if enabled and not retrying
+        return self.parse_response(response, prep_res)
+
+
+class AsyncAnalyzeRelationships(AsyncLLMNode, AnalyzeRelationships):
+    async def exec_async(self, prep_res, retry=0):
+        use_cache = prep_res[5]
+        print(f"Analyzing relationships using LLM...")
+        prompt = self.build_prompt(prep_res)
+        response = await acall_llm(prompt, use_cache=(use_cache and retry == 0))  # Use cache only if enabled and not retrying
+        return self.parse_response(response, prep_res)
+
+
+class AsyncOrderChapters(AsyncLLMNode, OrderChapters):
+    async def exec_async(self, prep_res, retry=0):
+        graph_order = self.graph_only_order(prep_res)
+        if graph_order is not None:
+            return graph_order
+
+        use_cache = prep_res[5]
+        print("Determining chapter order using LLM...")
+        prompt = self.build_prompt(prep_res)
+        response = await acall_llm(prompt, use_cache=(use_cache and retry == 0))  # Use cache only if enabled and not retrying
+        return self.parse_response(response, prep_res)
+
+
+class AsyncWriteChapters(AsyncBatchNode, AsyncLLMNode, WriteChapters):
+    # Chapters still run one after another: each prompt includes the chapters written before it
+    async def exec_async(self, item, retry=0):
+        use_cache = item.get("use_cache", True)
+        print(f"Writing chapter {item['chapter_num']} for: {item['abstraction_details']['name']} using LLM...")
+        prompt = self.build_prompt(item)
+        chapter_content = await acall_llm(prompt, use_cache=(use_cache and retry == 0))  # Use cache only if enabled and not retrying
+        chapter_content = self.parse_response(chapter_content, item)
+        self.remember_chapter(chapter_content)
+        return chapter_content
+
+
+class ParallelWriteChapters(AsyncParallelBatchNode, AsyncLLMNode, WriteChapters):
+    """
+    Writes all chapters concurrently, at most `jobs` at a time.
+
+    Instead of the full text of earlier chapters (which would force sequential
+    execution), each prompt gets the names and descriptions of the chapters
+    before it, computed up front in prep.
+    """
+
+    def __init__(self, jobs=4, **kwargs):
+        super().__init__(**kwargs)
+        self.jobs = max(1, jobs)
+
+    def previous_chapters_context(self, item):
+        return fit_recent(item["previous_chapters_outline"], self.previous_chapters_token_budget)
+
+    async def _exec(self, items):
+        # Created here, on the loop that runs the flow; gather keeps the results in chapter order
+        self._slots = asyncio.Semaphore(self.jobs)
+        return await super()._exec(items or [])
+
+    async def exec_async(self, item, retry=0):
+        use_cache = item.get("use_cache", True)
+        prompt = self.build_prompt(item)
+        # Only the LLM call holds a slot, so a failed chapter waiting to retry doesn't block the others
+        async with self._slots:
+            print(f"Writing chapter {item['chapter_num']} for: {item['abstraction_details']['name']} using LLM...")
+            chapter_content = await acall_llm(prompt, use_cache=(use_cache and retry == 0))  # Use cache only if enabled and not retrying
+        return self.parse_response(chapter_content, item)
+
+
+class AsyncIdentifyShardAbstractions(AsyncParallelBatchNode, AsyncLLMNode, IdentifyShardAbstractions):
+    # Shards are independent, so they are sent concurrently, up to config.identify_concurrency at a time
+    async def _exec(self, items):
+        self._slots = asyncio.Semaphore(max(1, config.identify_concurrency))
+        return await super()._exec(items or [])
+
+    async def exec_async(self, item, retry=0):
+        prep_res = self.shard_prep_res(item)
+        use_cache = item["use_cache"]
+        prompt = self.build_prompt(prep_res)
+        async with self._slots:
+            print(f"Identifying candidate abstractions in shard {item['shard_num'] + 1} using LLM...")
+            response = await acall_llm(prompt, use_cache=(use_cache and retry == 0))  # Use cache only if enabled and not retrying
+        return self.remap_candidates(self.parse_response(response, prep_res), item)
+
+
+class AsyncMergeAbstractions(AsyncLLMNode, MergeAbstractions):
+    async def exec_async(self, prep_res, retry=0):
+        candidates, _, _, _, use_cache, max_abstraction_num = prep_res
+        if len(candidates) <= max_abstraction_num:
+            return self.exec(prep_res)  # No LLM call needed
+
+        print(f"Merging {len(candidates)} candidate abstractions using LLM...")
+        prompt = self.build_prompt(prep_res)
+        response = await acall_llm(prompt, use_cache=(use_cache and retry == 0))  # Use cache only if enabled and not retrying
+        return self.parse_response(response, prep_res)
@@ -0,0 +1,193 @@
+import os
+import tarfile
+import zipfile
+from typing import BinaryIO, Callable, Iterator, Optional, Tuple, Union
+
+from utils.crawl_local_files import SNIFF_BYTES, decode_text
+from utils.file_patterns import PatternMatcher
+from utils.progress import ProgressReporter, PROCESSED
+
+ARCHIVE_SUFFIXES = (".tar.gz", ".tar.bz2", ".tar.xz", ".tgz", ".tbz2", ".txz", ".tar", ".zip")
+
+# (path, size) -> None to read the member, or the reason to skip it
+Selector = Callable[[str, int], Optional[str]]
+
+
+def archive_name(path: str) -> str:
+    """File name of an archive without its archive suffix (project name for a local archive)."""
+    name = os.path.basename(path)
+    for suffix in ARCHIVE_SUFFIXES:
+        if name.lower().endswith(suffix):
+            return name[: -len(suffix)]
+    return name
+
+
+def strip_path(name: str, strip_components: int = 0) -> Optional[str]:
+    """Member name with "./" and the first strip_components directories removed, or None if nothing is left."""
+    parts = [part for part in name.split("/") if part and part != "."]
+    if len(parts) <= strip_components:
+        return None
+    return "/".join(parts[strip_components:])
+
+
+def _read_member(stream: BinaryIO, sniff: bool) -> Tuple[Optional[bytes], Optional[str]]:
+    head = stream.read(SNIFF_BYTES)
+    if sniff and b"\0" in head:
+        # The rest of the member is never read
+        return None, "binary"
+    return head + stream.read(), None
+
+
+def iter_archive(
+    source: Union[str, BinaryIO],
+    select: Selector,
+    strip_components: int = 0,
+    sniff: bool = True,
+) -> Iterator[Tuple[str, int, Optional[bytes], Optional[str]]]:
+    """
+    Stream the regular files of a tar (any compression) or zip archive.
+
+    Each member is judged by select() from its header alone; only accepted
+    members are read, one at a time, so memory is bounded by the largest
+    accepted file whatever the archive size, and nothing is extracted to
+    disk. Tar archives are read as a forward-only stream and can come
+    straight from a socket; zip archives keep their index at the end and
+    need a seekable file. Anything that can't be read as either raises
+    ValueError.
+
+    Args:
+        source (str or file): Archive path, or a binary file object
+        select (callable): (path, size) -> None to read the member, or a skip reason
+        strip_components (int): Leading directories to drop from member names (1 for GitHub tarballs)
+        sniff (bool): Skip members whose first SNIFF_BYTES contain a NUL byte as "binary"
+
+    Yields:
+        tuple: (path, size, data, reason) with data None when reason says why the member was skipped
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            yield from iter_archive(f, select, strip_components, sniff)
+        return
+
+    try:
+        yield from _iter_members(source, select, strip_components, sniff)
+    except (tarfile.ReadError, tarfile.CompressionError, zipfile.BadZipFile) as e:
+        name = getattr(source, "name", None) or "stream"
+        raise ValueError(f"Unsupported archive format: {name} is not a readable tar or zip archive ({e})") from e
+
+
+def _iter_members(
+    source: BinaryIO,
+    select: Selector,
+    strip_components: int,
+    sniff: bool,
+) -> Iterator[Tuple[str, int, Optional[bytes], Optional[str]]]:
+    is_zip = False
+    if source.seekable():
+        is_zip = source.read(4) == b"PK\x03\x04"
+        source.seek(0)
+
+    if is_zip:
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                # Skip directories and symlinks (stored with a Unix file type in the high bits)
+                if info.is_dir() or (info.external_attr >> 16) & 0o170000 == 0o120000:
+                    continue
+                path = strip_path(info.filename, strip_components)
+                if path is None:
+                    continue
+                reason = select(path, info.file_size)
+                if reason is not None:
+                    yield path, info.file_size, None, reason
+                    continue
+                with archive.open(info) as stream:
+                    data, reason = _read_member(stream, sniff)
+                yield path, info.file_size, data, reason
+        return
+
+    with tarfile.open(fileobj=source, mode="r|*") as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            path = strip_path(member.name, strip_components)
+            if path is None:
+                continue
+            reason = select(path, member.size)
+            if reason is not None:
+                # Unread member data is skipped when the stream moves on
+                yield path, member.size, None, reason
+                continue
+            data, reason = _read_member(archive.extractfile(member), sniff)
+            yield path, member.size, data, reason
+
+
+def ingest_archive(
+    source: Union[str, BinaryIO],
+    include_patterns=None,
+    exclude_patterns=None,
+    max_file_size=None,
+    progress="bar",
+    file_store=None,
+    strip_components=0,
+):
+    """
+    Crawl the files of a tar or zip archive with the same interface and
+    filters as crawl_local_files, without extracting it.
+
+    Include/exclude patterns and max_file_size are applied to each member's
+    header; only accepted members are read, decoded and added to the store.
+
+    Args:
+        source (str or file): Archive path, or a binary file object (a stream for tar archives)
+        include_patterns (set): File patterns to include (e.g. {"*.py", "*.js"})
+        exclude_patterns (set): File patterns to exclude (e.g. {"tests/*"})
+        max_file_size (int): Maximum file size in bytes
+        progress (str): "bar", "quiet" or "json", as in crawl_local_files
+        file_store (FileStore): Add the files to this store instead of a dict; it is
+                                returned as "files"
+        strip_components (int): Leading directories to drop from member names
+
+    Returns:
+        dict: {"files": ..., "stats": {...}} with the same stats layout as crawl_local_files
+    """
+    files = file_store if file_store is not None else {}
+    add_file = file_store.add if file_store is not None else files.__setitem__
+    include_matcher = PatternMatcher(include_patterns)
+    exclude_matcher = PatternMatcher(exclude_patterns)
+
+    def select(path, size):
+        if exclude_matcher and exclude_matcher.match(path):
+            return "excluded"
+        if include_matcher and not include_matcher.match(path):
+            return "not included"
+        if max_file_size and size > max_file_size:
+            return "size limit"
+        return None
+
+    reporter = ProgressReporter("Reading archive", mode=progress)
+    skipped_files = []
+    for path, size, data, reason in iter_archive(source, select, strip_components):
+        if reason is None:
+            content, reason = decode_text(data)
+        if reason is not None:
+            if reason == "size limit":
+                skipped_files.append((path, size))
+            reporter.update(path, reason)
+            continue
+        add_file(path, content)
+        reporter.update(path, PROCESSED, size)
+
+    stats = {
+        "downloaded_count": len(files),
+        "skipped_count": len(skipped_files),
+        "skipped_files": skipped_files,
+        "base_path": None,
+        "include_patterns": include_patterns,
+        "exclude_patterns": exclude_patterns,
+        "source": "archive",
+    }
+    summary = reporter.summary()
+    stats["skip_reasons"] = summary["skip_reasons"]
+    stats["bytes_per_sec"] = summary["bytes_per_sec"]
+    reporter.finish(stats)
+    return {"files": files, "stats": stats}
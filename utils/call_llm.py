@@ -1,9 +1,16 @@
 from google import genai
+from google.genai import types
 import os
+import asyncio
+import atexit
+import weakref
 import logging
-import json
+import threading
+import httpx
 from datetime import datetime
 from config import config
+from utils.llm_cache import LLMCache, MemoryLRUCache, TieredLLMCache
+from utils.tracing import span, current_retry
 
 # Configure logging
 os.makedirs(config.log_directory, exist_ok=True)
@@ -21,66 +28,194 @@ file_handler.setFormatter(
 )
 logger.addHandler(file_handler)
 
+# Response cache (memory LRU in front of SQLite), opened lazily on first use
+_cache = None
+_cache_lock = threading.Lock()
 
-# By default, we Google Gemini 2.5 pro, as it shows great performance for code understanding
-def call_llm(prompt: str, use_cache: bool = True) -> str:
-    # Log the prompt
-    logger.info(f"PROMPT: {prompt}")
-
-    # Check cache if enabled
-    if use_cache:
-        # Load cache from disk
-        cache = {}
-        if os.path.exists(config.cache_file):
-            try:
-                with open(config.cache_file, "r", encoding="utf-8") as f:
-                    cache = json.load(f)
-            except:
-                logger.warning(f"Failed to load cache, starting with empty cache")
-
-        # Return from cache if exists
-        if prompt in cache:
-            logger.info(f"RESPONSE: {cache[prompt]}")
-            return cache[prompt]
-
-    # # Call the LLM if not in cache or cache disabled
-    # client = genai.Client(
-    #     vertexai=True,
-    #     project=config.gemini_project_id,
-    #     location=config.gemini_location
-    # )
-
-    # You can comment the previous line and use the AI Studio key instead:
-    client = genai.Client(
-        api_key=config.gemini_api_key,
-    )
-    
-    response = client.models.generate_content(model=config.gemini_model, contents=[prompt])
-    response_text = response.text
-
-    # Log the response
-    logger.info(f"RESPONSE: {response_text}")
-
-    # Update cache if enabled
-    if use_cache:
-        # Load cache again to avoid overwrites
-        cache = {}
-        if os.path.exists(config.cache_file):
+
+def get_cache() -> TieredLLMCache:
+    """Return the process-wide LLM response cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                memory = None
+                if config.memory_cache_bytes > 0:
+                    memory = MemoryLRUCache(
+                        config.memory_cache_bytes, ttl=config.memory_cache_ttl
+                    )
+                disk = LLMCache(
+                    config.cache_db_file,
+                    legacy_json_path=config.cache_file,
+                    compression_level=config.cache_compression_level,
+                )
+                if config.cache_max_bytes or config.cache_max_age_days:
+                    disk.prune(
+                        max_bytes=config.cache_max_bytes or None,
+                        max_age=config.cache_max_age_days * 86400 or None,
+                    )
+                _cache = TieredLLMCache(disk, memory)
+    return _cache
+
+
+def get_cache_stats() -> dict:
+    """Hit/miss/eviction counters of the in-memory cache tier."""
+    return _cache.stats() if _cache is not None else {}
+
+
+# Process-wide Gemini client, created lazily and shared across nodes and threads
+# so HTTP keep-alive connections and TLS sessions are reused between calls
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> genai.Client:
+    """Return the shared Gemini client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                limits = httpx.Limits(
+                    max_connections=config.llm_max_connections,
+                    max_keepalive_connections=config.llm_max_connections,
+                )
+                http_options = types.HttpOptions(
+                    client_args={"limits": limits},
+                    async_client_args={"limits": limits},
+                )
+
+                # _client = genai.Client(
+                #     vertexai=True,
+                #     project=config.gemini_project_id,
+                #     location=config.gemini_location,
+                #     http_options=http_options,
+                # )
+
+                # You can comment the previous line and use the AI Studio key instead:
+                _client = genai.Client(
+                    api_key=config.gemini_api_key,
+                    http_options=http_options,
+                )
+    return _client
+
+
+def close_client() -> None:
+    """Close the shared client and its connection pool (safe to call repeatedly)."""
+    global _client
+    with _client_lock:
+        if _client is not None:
             try:
-                with open(config.cache_file, "r", encoding="utf-8") as f:
-                    cache = json.load(f)
-            except:
-                pass
+                _client.close()
+            except Exception as e:
+                logger.warning(f"Failed to close LLM client: {e}")
+            _client = None
+
+
+atexit.register(close_client)
 
-        # Add to cache and save
-        cache[prompt] = response_text
+
+async def aclose_client() -> None:
+    """Close the async side of the shared client, then the client itself."""
+    client = _client
+    if client is not None:
         try:
-            with open(config.cache_file, "w", encoding="utf-8") as f:
-                json.dump(cache, f)
+            await client.aio.aclose()
         except Exception as e:
-            logger.error(f"Failed to save cache: {e}")
+            logger.warning(f"Failed to close async LLM client: {e}")
+    close_client()
+
+
+# Caps the number of acall_llm requests in flight. asyncio primitives belong to
+# one event loop, so keep one semaphore per running loop.
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def set_llm_concurrency(limit: int) -> None:
+    """Change the acall_llm concurrency limit (applies to loops started afterwards)."""
+    config.llm_concurrency = max(1, limit)
+    _semaphores.clear()
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(config.llm_concurrency)
+    return semaphore
+
+
+# By default, we Google Gemini 2.5 pro, as it shows great performance for code understanding
+def call_llm(prompt: str, use_cache: bool = True) -> str:
+    # Traced as an "llm" span (a no-op unless tracing is enabled)
+    with span("call_llm", "llm", prompt_chars=len(prompt), retry=current_retry()) as trace:
+        # Log the prompt
+        logger.info(f"PROMPT: {prompt}")
+
+        # Check cache if enabled
+        if use_cache:
+            cached = get_cache().get(prompt)
+            if cached is not None:
+                logger.info(f"RESPONSE: {cached}")
+                trace.update(cache_hit=True, response_chars=len(cached))
+                return cached
+
+        # Call the LLM if not in cache or cache disabled
+        response = get_client().models.generate_content(model=config.gemini_model, contents=[prompt])
+        response_text = response.text
+        trace.update(cache_hit=False, response_chars=len(response_text or ""))
+
+        # Log the response
+        logger.info(f"RESPONSE: {response_text}")
+
+        # Update cache if enabled
+        if use_cache:
+            try:
+                get_cache().set(prompt, response_text)
+            except Exception as e:
+                logger.error(f"Failed to save cache: {e}")
+
+        return response_text
+
+
+async def acall_llm(prompt: str, use_cache: bool = True) -> str:
+    """
+    Async counterpart of call_llm sharing the same cache and client.
+
+    At most config.llm_concurrency requests are in flight per event loop;
+    cache reads and writes, including opening the cache on first use, run in a
+    worker thread so SQLite never blocks the loop.
+    """
+    with span("acall_llm", "llm", prompt_chars=len(prompt), retry=current_retry()) as trace:
+        # Log the prompt
+        logger.info(f"PROMPT: {prompt}")
+
+        # Check cache if enabled
+        if use_cache:
+            cached = await asyncio.to_thread(lambda: get_cache().get(prompt))
+            if cached is not None:
+                logger.info(f"RESPONSE: {cached}")
+                trace.update(cache_hit=True, response_chars=len(cached))
+                return cached
+
+        # Call the LLM if not in cache or cache disabled
+        async with _get_semaphore():
+            response = await get_client().aio.models.generate_content(
+                model=config.gemini_model, contents=[prompt]
+            )
+        response_text = response.text
+        trace.update(cache_hit=False, response_chars=len(response_text or ""))
+
+        # Log the response
+        logger.info(f"RESPONSE: {response_text}")
+
+        # Update cache if enabled
+        if use_cache:
+            try:
+                await asyncio.to_thread(lambda: get_cache().set(prompt, response_text))
+            except Exception as e:
+                logger.error(f"Failed to save cache: {e}")
 
-    return response_text
+        return response_text
 
 
 # # Use Anthropic Claude 3.7 Sonnet Extended Thinking
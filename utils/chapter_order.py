@@ -0,0 +1,78 @@
+from typing import List, Dict, Tuple
+
+
+def graph_chapter_order(num_abstractions: int, relationships: List[Dict]) -> Tuple[List[int], List[List[int]]]:
+    """
+    Derive a chapter order from the abstraction relationship graph.
+
+    An edge from -> to ("A manages B", "A uses B") means A is closer to the
+    entry point, so A is explained first. Abstractions are placed in
+    topological levels (sources first); when a cycle leaves no source, the
+    remaining abstraction with the largest out-degree minus in-degree is
+    released next. Within a level, more connected abstractions come first.
+
+    Args:
+        num_abstractions (int): Number of abstractions
+        relationships (list): shared["relationships"]["details"], i.e. dicts with "from" and "to"
+
+    Returns:
+        tuple: (order, tie_groups) where order is a permutation of the indices
+               and tie_groups lists the groups of indices the graph could not
+               order relative to each other (same level, same degree)
+    """
+    outgoing = {i: set() for i in range(num_abstractions)}
+    incoming = {i: set() for i in range(num_abstractions)}
+    for rel in relationships:
+        src, dst = rel["from"], rel["to"]
+        if src != dst and 0 <= src < num_abstractions and 0 <= dst < num_abstractions:
+            outgoing[src].add(dst)
+            incoming[dst].add(src)
+    degree = {i: len(outgoing[i]) + len(incoming[i]) for i in range(num_abstractions)}
+
+    order = []
+    tie_groups = []
+    remaining = set(range(num_abstractions))
+    while remaining:
+        ready = [i for i in remaining if not (incoming[i] & remaining)]
+        if not ready:
+            # Break the cycle at the abstraction that most looks like a source
+            ready = [
+                max(
+                    remaining,
+                    key=lambda i: (
+                        len(outgoing[i] & remaining) - len(incoming[i] & remaining),
+                        degree[i],
+                        -i,
+                    ),
+                )
+            ]
+
+        ready.sort(key=lambda i: (-degree[i], i))
+        order.extend(ready)
+        remaining.difference_update(ready)
+
+        # Same level and same degree: the graph has no opinion on their order
+        start = 0
+        while start < len(ready):
+            end = start + 1
+            while end < len(ready) and degree[ready[end]] == degree[ready[start]]:
+                end += 1
+            if end - start > 1:
+                tie_groups.append(ready[start:end])
+            start = end
+
+    return order, tie_groups
+
+
+def break_ties(order: List[int], tie_groups: List[List[int]], preferred: List[int]) -> List[int]:
+    """
+    Reorder only the members of each tie group, following their relative
+    order in preferred (e.g. an LLM's ordering). All other positions stay fixed.
+    """
+    rank = {idx: pos for pos, idx in enumerate(preferred)}
+    result = list(order)
+    for group in tie_groups:
+        positions = sorted(result.index(idx) for idx in group)
+        for pos, idx in zip(positions, sorted(group, key=lambda i: rank.get(i, len(rank)))):
+            result[pos] = idx
+    return result
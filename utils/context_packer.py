@@ -0,0 +1,196 @@
+import os
+import re
+import math
+from collections import Counter
+from typing import List, Tuple, Dict, Any, Sequence
+
+from utils.file_store import file_head, file_paths, file_size
+from utils.token_budget import estimate_tokens, tokens_for_length, truncate_to_tokens
+
+# File names that usually hold entry points or central definitions
+_KEY_STEMS = {
+    "main", "app", "index", "__init__", "core", "base", "api", "cli", "server",
+    "client", "config", "settings", "models", "model", "types", "schema",
+    "flow", "node", "nodes", "engine", "router", "routes", "handler", "manager",
+}
+
+# References to other modules/files: Python, JS/TS, Go, Java, C/C++, Rust
+_REFERENCE_PATTERNS = re.compile(
+    r"""(?:^\s*from\s+([\w.]+)\s+import"""
+    r"""|^\s*import\s+([\w.]+)"""
+    r"""|require\(\s*['"]([^'"]+)['"]\s*\)"""
+    r"""|from\s+['"]([^'"]+)['"]"""
+    r"""|^\s*#include\s+["<]([^">]+)[">]"""
+    r"""|^\s*use\s+([\w:]+))""",
+    re.MULTILINE,
+)
+
+# Declarations kept when a file is reduced to its skeleton
+_DECLARATION = re.compile(
+    r"^\s*(?:export\s+|pub(?:\(\w+\))?\s+|public\s+|private\s+|protected\s+|static\s+"
+    r"|async\s+|abstract\s+|final\s+|default\s+)*"
+    r"(?:def|class|function|func|fn|interface|struct|enum|trait|impl|type|module|namespace)\b"
+)
+_MARKDOWN_HEADING = re.compile(r"^#{1,6}\s")
+
+# Don't bother including a truncated file with less room than this
+MIN_TRUNCATED_TOKENS = 200
+
+# Imports sit at the top of a file; only this much of each file is scanned for references
+REFERENCE_SCAN_BYTES = 16 * 1024
+
+
+def _stem(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0].lower()
+
+
+def rank_files(files_data: Sequence[Tuple[str, str]]) -> List[int]:
+    """
+    Order file indices from most to least important for understanding the codebase.
+
+    The score favours files that other files import, READMEs, conventional
+    entry-point names and shallow paths, and mildly penalises very large files.
+    Only the first REFERENCE_SCAN_BYTES of each file are read; sizes come from
+    the store's index.
+    """
+    paths = file_paths(files_data)
+
+    # Count how often each module/file stem is referenced from other files
+    references = Counter()
+    for i in range(len(paths)):
+        for match in _REFERENCE_PATTERNS.finditer(file_head(files_data, i, REFERENCE_SCAN_BYTES)):
+            target = next(g for g in match.groups() if g)
+            parts = re.split(r"[./:\\]+", target)
+            references.update(part.lower() for part in parts[-2:] if part)
+
+    scores = []
+    for i, path in enumerate(paths):
+        stem = _stem(path)
+        depth = path.replace("\\", "/").count("/")
+        score = 2.0 * math.log1p(references.get(stem, 0))
+        if stem == "readme":
+            score += 4.0 if depth == 0 else 1.0
+        if stem in _KEY_STEMS:
+            score += 1.5
+        score -= 0.5 * depth
+        score -= 0.3 * math.log1p(file_size(files_data, i) / 20000)
+        scores.append((-score, i))
+    return [i for _, i in sorted(scores)]
+
+
+def skeletonize(path: str, content: str) -> str:
+    """Reduce a file to its declarations (or headings for Markdown) so it costs few tokens."""
+    is_markdown = path.lower().endswith((".md", ".rst"))
+    pattern = _MARKDOWN_HEADING if is_markdown else _DECLARATION
+    return "\n".join(line.rstrip() for line in content.splitlines() if pattern.match(line))
+
+
+def pack_context(
+    files_data: Sequence[Tuple[str, str]], token_budget: int
+) -> Tuple[str, List[Tuple[int, str]], Dict[str, Any]]:
+    """
+    Build the IdentifyAbstractions context within token_budget.
+
+    Files are visited in rank_files order. Each one goes in whole if it fits,
+    otherwise as a skeleton of its declarations, otherwise truncated, otherwise
+    it is dropped. No single file may take more than a quarter of the budget.
+    The context keeps the original file order and indices. Once less than
+    MIN_TRUNCATED_TOKENS are left, only files that fit whole by their size
+    are added, so the files dropped at the end are never read.
+
+    Returns:
+        tuple: (context, file_info, report) where file_info is a list of
+               (index, path) for included files and report lists the indices
+               per mode ("full", "skeleton", "truncated", "dropped") plus the
+               estimated token total
+    """
+    per_file_cap = max(MIN_TRUNCATED_TOKENS, token_budget // 4)
+    remaining = token_budget
+    entries = {}
+    report = {"full": [], "skeleton": [], "truncated": [], "dropped": []}
+
+    paths = file_paths(files_data)
+    for i in rank_files(files_data):
+        path = paths[i]
+        header = f"--- File Index {i}: {path} ---\n"
+        limit = min(remaining, per_file_cap)
+
+        # Nearly out of room: only files that fit whole (judged by their size) still go in, as
+        # trying a skeleton would mean reading every remaining file to drop almost all of them
+        if limit < MIN_TRUNCATED_TOKENS and tokens_for_length(len(header) + file_size(files_data, i) + 2) > limit:
+            report["dropped"].append(i)
+            continue
+
+        content = files_data[i][1]
+        entry = f"{header}{content}\n\n"
+        mode = "full"
+        if estimate_tokens(entry) > limit:
+            skeleton = skeletonize(path, content)
+            entry = f"--- File Index {i}: {path} (skeleton: declarations only) ---\n{skeleton}\n\n"
+            mode = "skeleton"
+            if not skeleton or estimate_tokens(entry) > limit:
+                if limit < MIN_TRUNCATED_TOKENS:
+                    report["dropped"].append(i)
+                    continue
+                header = f"--- File Index {i}: {path} (truncated) ---\n"
+                entry = header + truncate_to_tokens(content, limit - estimate_tokens(header) - 1) + "\n\n"
+                mode = "truncated"
+
+        entries[i] = entry
+        report[mode].append(i)
+        remaining -= estimate_tokens(entry)
+
+    included = sorted(entries)
+    context = "".join(entries[i] for i in included)
+    file_info = [(i, paths[i]) for i in included]
+    report["tokens"] = token_budget - remaining
+    return context, file_info, report
+
+
+def shard_files(files_data: Sequence[Tuple[str, str]], token_budget: int) -> List[List[int]]:
+    """
+    Split file indices into shards whose estimated size fits token_budget.
+
+    Files are grouped by directory and directories are packed in path order,
+    so a package and its subpackages tend to land in the same shard. A
+    directory that alone exceeds the budget is split across several shards.
+
+    Returns:
+        list: Shards as lists of global file indices
+    """
+    by_directory = {}
+    for i, path in enumerate(file_paths(files_data)):
+        directory = os.path.dirname(path.replace("\\", "/"))
+        cost = tokens_for_length(file_size(files_data, i)) + estimate_tokens(f"--- File Index {i}: {path} ---\n\n\n")
+        by_directory.setdefault(directory, []).append((i, cost))
+
+    shards, current, used = [], [], 0
+    for directory in sorted(by_directory):
+        members = by_directory[directory]
+        cost = sum(c for _, c in members)
+        if used + cost <= token_budget:
+            current.extend(i for i, _ in members)
+            used += cost
+            continue
+
+        if current:
+            shards.append(current)
+        current, used = [], 0
+        for i, file_cost in members:
+            if current and used + file_cost > token_budget:
+                shards.append(current)
+                current, used = [], 0
+            current.append(i)
+            used += file_cost
+
+    if current:
+        shards.append(current)
+    return shards
+
+
+def estimate_files_tokens(files_data: Sequence[Tuple[str, str]]) -> int:
+    """Estimated tokens needed to put every file in one prompt, from the sizes alone."""
+    return sum(
+        tokens_for_length(file_size(files_data, i)) + estimate_tokens(path) + 8
+        for i, path in enumerate(file_paths(files_data))
+    )
@@ -1,12 +1,72 @@
-import requests
 import base64
 import os
+import tarfile
 import tempfile
 import git
-import time
-import fnmatch
+import requests
+import urllib3
+from contextlib import ExitStack
 from typing import Union, Set, List, Dict, Tuple, Any
-from urllib.parse import urlparse
+from urllib.parse import quote, urlparse
+from utils.file_patterns import PatternMatcher
+from utils.progress import ProgressReporter, PROCESSED
+from utils.github_client import GitHubClient
+from utils.http_cache import HttpCache
+from utils.mirror_cache import MirrorCache
+from utils.crawl_local_files import read_text_blob
+from utils.archive_ingest import iter_archive
+from utils.tracing import span
+from config import config
+
+# Above this many selected files, one tarball download beats a request per blob
+MAX_BLOB_REQUESTS = 50
+
+# Blobs are requested as raw bytes, so cached blobs and tarball members are stored alike
+BLOB_ACCEPT = "application/vnd.github.raw+json"
+
+
+def sparse_patterns(path: str = "", include_patterns: Set[str] = None) -> List[str]:
+    """
+    Non-cone sparse-checkout patterns covering path and, when every include
+    pattern is a plain file-name pattern, only the files they match.
+    Exclude patterns are left to the crawl: they match full paths with
+    fnmatch semantics, which gitignore-style patterns can't express exactly.
+    """
+    base = "/" + path.strip("/") if path.strip("/") else ""
+    if not include_patterns or any("/" in pattern for pattern in include_patterns):
+        return [f"{base}/"] if base else ["/*"]
+    return [f"{base}/**/{pattern}" for pattern in sorted(include_patterns)]
+
+
+def sparse_clone(repo_url: str, directory: str, ref: str = None, path: str = "", include_patterns: Set[str] = None):
+    """
+    Clone only what the crawl reads: the single commit at ref (default
+    branch when None) without history, with blobs left on the server
+    (--filter=blob:none) until a sparse checkout of path and the include
+    patterns fetches just those files in one batch.
+
+    Git clients that reject --filter fall back to a full depth-1 fetch;
+    servers that don't support filters already send every blob (git only
+    warns).
+
+    Returns:
+        git.Repo: The repository, checked out (detached) at the fetched commit
+    """
+    repo = git.Repo.init(directory)
+    repo.git.remote("add", "origin", repo_url)
+    with span("git fetch", "git", url=repo_url, ref=ref):
+        try:
+            repo.git.fetch("--depth=1", "--filter=blob:none", "--no-tags", "origin", ref or "HEAD")
+        except git.GitCommandError as e:
+            # Older git clients reject --filter outright
+            if "filter" not in str(e.stderr):
+                raise
+            print("Partial clone not supported by this git, fetching all blobs of the commit")
+            repo.git.fetch("--depth=1", "--no-tags", "origin", ref or "HEAD")
+    repo.git.sparse_checkout("set", "--no-cone", *sparse_patterns(path, include_patterns))
+    with span("git checkout", "git", url=repo_url):
+        repo.git.checkout("--detach", "FETCH_HEAD")
+    return repo
 
 def crawl_github_files(
     repo_url, 
@@ -14,7 +74,12 @@ def crawl_github_files(
     max_file_size: int = 1 * 1024 * 1024,  # 1 MB
     use_relative_paths: bool = False,
     include_patterns: Union[str, Set[str]] = None,
-    exclude_patterns: Union[str, Set[str]] = None
+    exclude_patterns: Union[str, Set[str]] = None,
+    progress: str = "bar",
+    use_http_cache: bool = False,
+    ref: str = None,
+    subdir: str = None,
+    use_mirror_cache: bool = False,
 ):
     """
     Crawl files from a specific path in a GitHub repository at a specific commit.
@@ -32,6 +97,17 @@ def crawl_github_files(
                                                        If None, all files are included.
         exclude_patterns (str or set of str, optional): Pattern or set of patterns specifying which files to exclude.
                                                        If None, no files are excluded.
+        progress (str, optional): "bar" for throttled progress lines, "quiet" for a final summary only,
+                                  "json" for one final JSON record of the returned stats
+        use_http_cache (bool, optional): Keep responses in an on-disk cache (config.github_cache_file):
+                                         SHA-pinned trees and blobs are reused without a request,
+                                         everything else is revalidated with its ETag
+        ref (str, optional): Branch, tag or commit SHA to crawl when the URL doesn't name one
+                             (SSH URLs never do); default branch if None
+        subdir (str, optional): Directory of the repository to crawl when the URL doesn't name one
+        use_mirror_cache (bool, optional): For SSH URLs, keep a bare mirror of the repository in
+                                           config.mirror_cache_dir, update it with an incremental fetch
+                                           and read the files from its object database
 
     Returns:
         dict: Dictionary with files and statistics
@@ -42,49 +118,109 @@ def crawl_github_files(
     if exclude_patterns and isinstance(exclude_patterns, str):
         exclude_patterns = {exclude_patterns}
 
+    # Compile the patterns once instead of running fnmatch per pattern per file
+    include_matcher = PatternMatcher(include_patterns)
+    exclude_matcher = PatternMatcher(exclude_patterns)
+
     def should_include_file(file_path: str, file_name: str) -> bool:
         """Determine if a file should be included based on patterns"""
         # If no include patterns are specified, include all files
-        if not include_patterns:
+        if not include_matcher:
             include_file = True
         else:
             # Check if file matches any include pattern
-            include_file = any(fnmatch.fnmatch(file_name, pattern) for pattern in include_patterns)
+            include_file = include_matcher.match(file_name)
 
         # If exclude patterns are specified, check if file should be excluded
-        if exclude_patterns and include_file:
+        if exclude_matcher and include_file:
             # Exclude if file matches any exclude pattern
-            exclude_file = any(fnmatch.fnmatch(file_path, pattern) for pattern in exclude_patterns)
-            return not exclude_file
+            return not exclude_matcher.match(file_path)
 
         return include_file
 
+    reporter = ProgressReporter("Crawling", mode=progress)
+
     # Detect SSH URL (git@ or .git suffix)
     is_ssh_url = repo_url.startswith("git@") or repo_url.endswith(".git")
 
+    if is_ssh_url and use_mirror_cache:
+        # Persistent bare mirror: later runs only fetch new objects, files are read without a checkout
+        specific_path = (subdir or "").strip("/")
+        mirror_cache = MirrorCache(config.mirror_cache_dir, config.mirror_cache_max_bytes)
+        with ExitStack() as stack:
+            try:
+                # The mirror stays locked against eviction until every blob has been read
+                mirror, commit, fetched = stack.enter_context(mirror_cache.use(repo_url, ref))
+                tree = commit.tree / specific_path if specific_path else commit.tree
+            except Exception as e:
+                print(f"Error updating mirror of {repo_url}: {e}")
+                return {"files": {}, "stats": {"error": str(e)}}
+            print(f"Reading {repo_url} at {commit.hexsha[:12]} from mirror {mirror.git_dir}"
+                  + ("" if fetched else " (no fetch needed)"))
+
+            files = {}
+            skipped_files = []
+            for blob in tree.traverse():
+                # Regular files only: skip trees, submodules and symlinks
+                if blob.type != "blob" or blob.mode & 0o170000 != 0o100000:
+                    continue
+                rel_path = blob.path[len(specific_path):].lstrip("/") if use_relative_paths and specific_path else blob.path
+
+                # The size comes from the object header; nothing is read yet
+                if blob.size > max_file_size:
+                    skipped_files.append((rel_path, blob.size))
+                    reporter.update(rel_path, "size limit")
+                    continue
+
+                if not should_include_file(rel_path, blob.name):
+                    reporter.update(rel_path, "excluded")
+                    continue
+
+                content, size, reason = read_text_blob(blob)
+                if content is None:
+                    reporter.update(rel_path, reason)
+                    continue
+                files[rel_path] = content
+                reporter.update(rel_path, PROCESSED, size)
+
+            stats = {
+                "downloaded_count": len(files),
+                "skipped_count": len(skipped_files),
+                "skipped_files": skipped_files,
+                "base_path": specific_path if use_relative_paths and specific_path else None,
+                "include_patterns": include_patterns,
+                "exclude_patterns": exclude_patterns,
+                "source": "mirror",
+                "commit": commit.hexsha,
+                "fetched": fetched,
+                "skip_reasons": reporter.summary()["skip_reasons"],
+            }
+            reporter.finish(stats)
+            return {"files": files, "stats": stats}
+
     if is_ssh_url:
-        # Clone repo via SSH to temp dir
+        # Shallow, blob-less clone of ref with a sparse checkout of subdir and the include patterns
+        specific_path = (subdir or "").strip("/")
         with tempfile.TemporaryDirectory() as tmpdirname:
-            print(f"Cloning SSH repo {repo_url} to temp dir {tmpdirname} ...")
+            print(f"Cloning SSH repo {repo_url} ({ref or 'default branch'}) to temp dir {tmpdirname} ...")
             try:
-                repo = git.Repo.clone_from(repo_url, tmpdirname)
+                repo = sparse_clone(repo_url, tmpdirname, ref, specific_path, include_patterns)
+                commit_sha = repo.head.commit.hexsha
             except Exception as e:
                 print(f"Error cloning repo: {e}")
                 return {"files": {}, "stats": {"error": str(e)}}
 
-            # Attempt to checkout specific commit/branch if in URL
-            # Parse ref and subdir from SSH URL? SSH URLs don't have branch info embedded
-            # So rely on default branch, or user can checkout manually later
-            # Optionally, user can pass ref explicitly in future API
-
-            # Walk directory
+            # Walk the checked-out part only
             files = {}
             skipped_files = []
+            walk_root = os.path.join(tmpdirname, specific_path) if specific_path else tmpdirname
 
-            for root, dirs, filenames in os.walk(tmpdirname):
+            for root, dirs, filenames in os.walk(walk_root):
+                if root == tmpdirname:
+                    dirs[:] = [d for d in dirs if d != ".git"]
                 for filename in filenames:
                     abs_path = os.path.join(root, filename)
-                    rel_path = os.path.relpath(abs_path, tmpdirname)
+                    rel_path = os.path.relpath(abs_path, walk_root if use_relative_paths else tmpdirname).replace(os.sep, "/")
 
                     # Check file size
                     try:
@@ -94,12 +230,12 @@ def crawl_github_files(
 
                     if file_size > max_file_size:
                         skipped_files.append((rel_path, file_size))
-                        print(f"Skipping {rel_path}: size {file_size} exceeds limit {max_file_size}")
+                        reporter.update(rel_path, "size limit")
                         continue
 
                     # Check include/exclude patterns
                     if not should_include_file(rel_path, filename):
-                        print(f"Skipping {rel_path}: does not match include/exclude patterns")
+                        reporter.update(rel_path, "excluded")
                         continue
 
                     # Read content
@@ -107,22 +243,24 @@ def crawl_github_files(
                         with open(abs_path, "r", encoding="utf-8-sig") as f:
                             content = f.read()
                         files[rel_path] = content
-                        print(f"Added {rel_path} ({file_size} bytes)")
+                        reporter.update(rel_path, PROCESSED, file_size)
                     except Exception as e:
                         print(f"Failed to read {rel_path}: {e}")
-
-            return {
-                "files": files,
-                "stats": {
-                    "downloaded_count": len(files),
-                    "skipped_count": len(skipped_files),
-                    "skipped_files": skipped_files,
-                    "base_path": None,
-                    "include_patterns": include_patterns,
-                    "exclude_patterns": exclude_patterns,
-                    "source": "ssh_clone"
-                }
+                        reporter.update(rel_path, "read error")
+
+            stats = {
+                "downloaded_count": len(files),
+                "skipped_count": len(skipped_files),
+                "skipped_files": skipped_files,
+                "base_path": specific_path if use_relative_paths and specific_path else None,
+                "include_patterns": include_patterns,
+                "exclude_patterns": exclude_patterns,
+                "source": "ssh_clone",
+                "commit": commit_sha,
+                "skip_reasons": reporter.summary()["skip_reasons"],
             }
+            reporter.finish(stats)
+            return {"files": files, "stats": stats}
 
     # Parse GitHub URL to extract owner, repo, commit/branch, and path
     parsed_url = urlparse(repo_url)
@@ -135,16 +273,15 @@ def crawl_github_files(
     owner = path_parts[0]
     repo = path_parts[1]
     
-    # Setup for GitHub API
-    headers = {"Accept": "application/vnd.github.v3+json"}
-    if token:
-        headers["Authorization"] = f"token {token}"
+    # Setup for GitHub API: one pooled session shared by every request of this crawl
+    client = GitHubClient(token, cache=HttpCache(config.github_cache_file) if use_http_cache else None)
+    api_url = client.api_url
 
     def fetch_branches(owner: str, repo: str):
         """Get brancshes of the repository"""
 
-        url = f"https://api.github.com/repos/{owner}/{repo}/branches"
-        response = requests.get(url, headers=headers)
+        url = f"{api_url}/repos/{owner}/{repo}/branches"
+        response = client.get(url)
 
         if response.status_code == 404:
             if not token:
@@ -164,8 +301,8 @@ def crawl_github_files(
     def check_tree(owner: str, repo: str, tree: str):
         """Check the repository has the given tree"""
 
-        url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{tree}"
-        response = requests.get(url, headers=headers)
+        url = f"{api_url}/repos/{owner}/{repo}/git/trees/{tree}"
+        response = client.get(url)
 
         return True if response.status_code == 200 else False 
 
@@ -202,28 +339,33 @@ def crawl_github_files(
         part_index = 5 if '/' in ref else 4
         specific_path = join_parts(part_index) if part_index < len(path_parts) else ""
     else:
-        # Dont put the ref param to quiery
+        # Without an explicit ref, dont put the ref param to quiery
         # and let Github decide default branch
-        ref = None
-        specific_path = ""
+        specific_path = (subdir or "").strip("/")
     
     # Dictionary to store path -> content mapping
     files = {}
     skipped_files = []
     
-    def fetch_contents(path):
-        """Fetch contents of the repository at a specific path and commit"""
-        url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}"
+    def fetch_contents(start_path):
+        """Fetch contents of the repository below a specific path and commit, one directory at a time"""
+        # Directories still to list; a stack keeps the depth-first order of the former recursion
+        pending = [start_path]
+        while pending:
+            pending.extend(reversed(fetch_directory(pending.pop())))
+
+    def fetch_directory(path):
+        """
+        List one directory (or file) and download its files.
+        Rate-limit refusals are waited out and retried by the client's scheduler.
+
+        Returns:
+            list: Subdirectories to list next
+        """
+        url = f"{api_url}/repos/{owner}/{repo}/contents/{path}"
         params = {"ref": ref} if ref != None else {}
         
-        response = requests.get(url, headers=headers, params=params)
-        
-        if response.status_code == 403 and 'rate limit exceeded' in response.text.lower():
-            reset_time = int(response.headers.get('X-RateLimit-Reset', 0))
-            wait_time = max(reset_time - time.time(), 0) + 1
-            print(f"Rate limit exceeded. Waiting for {wait_time:.0f} seconds...")
-            time.sleep(wait_time)
-            return fetch_contents(path)
+        response = client.get(url, params=params)
             
         if response.status_code == 404:
             if not token:
@@ -235,18 +377,20 @@ def crawl_github_files(
             else:
                 print(f"Error 404: Path '{path}' not found in repository or insufficient permissions with the provided token.\n"
                       f"Please verify the token has access to this repository and the path exists.")
-            return
+            return []
             
         if response.status_code != 200:
             print(f"Error fetching {path}: {response.status_code} - {response.text}")
-            return
+            return []
         
         contents = response.json()
         
         # Handle both single file and directory responses
         if not isinstance(contents, list):
             contents = [contents]
-        
+
+        file_items = []
+        subdirs = []
         for item in contents:
             item_path = item["path"]
             
@@ -263,72 +407,234 @@ def crawl_github_files(
             if item["type"] == "file":
                 # Check if file should be included based on patterns
                 if not should_include_file(rel_path, item["name"]):
-                    print(f"Skipping {rel_path}: Does not match include/exclude patterns")
+                    reporter.update(rel_path, "excluded")
                     continue
                 
                 # Check file size if available
                 file_size = item.get("size", 0)
                 if file_size > max_file_size:
                     skipped_files.append((item_path, file_size))
-                    print(f"Skipping {rel_path}: File size ({file_size} bytes) exceeds limit ({max_file_size} bytes)")
+                    reporter.update(rel_path, "size limit")
                     continue
-                
-                # For files, get raw content
-                if "download_url" in item and item["download_url"]:
-                    file_url = item["download_url"]
-                    file_response = requests.get(file_url, headers=headers)
-                    
-                    # Final size check in case content-length header is available but differs from metadata
-                    content_length = int(file_response.headers.get('content-length', 0))
-                    if content_length > max_file_size:
-                        skipped_files.append((item_path, content_length))
-                        print(f"Skipping {rel_path}: Content length ({content_length} bytes) exceeds limit ({max_file_size} bytes)")
-                        continue
-                        
-                    if file_response.status_code == 200:
-                        files[rel_path] = file_response.text
-                        print(f"Downloaded: {rel_path} ({file_size} bytes) ")
-                    else:
-                        print(f"Failed to download {rel_path}: {file_response.status_code}")
-                else:
-                    # Alternative method if download_url is not available
-                    content_response = requests.get(item["url"], headers=headers)
-                    if content_response.status_code == 200:
-                        content_data = content_response.json()
-                        if content_data.get("encoding") == "base64" and "content" in content_data:
-                            # Check size of base64 content before decoding
-                            if len(content_data["content"]) * 0.75 > max_file_size:  # Approximate size calculation
-                                estimated_size = int(len(content_data["content"]) * 0.75)
-                                skipped_files.append((item_path, estimated_size))
-                                print(f"Skipping {rel_path}: Encoded content exceeds size limit")
-                                continue
-                                
-                            file_content = base64.b64decode(content_data["content"]).decode('utf-8')
-                            files[rel_path] = file_content
-                            print(f"Downloaded: {rel_path} ({file_size} bytes)")
-                        else:
-                            print(f"Unexpected content format for {rel_path}")
-                    else:
-                        print(f"Failed to get content for {rel_path}: {content_response.status_code}")
+
+                file_items.append((item, rel_path))
             
             elif item["type"] == "dir":
-                # Recursively process subdirectories
-                fetch_contents(item_path)
-    
-    # Start crawling from the specified path
-    fetch_contents(specific_path)
-    
-    return {
-        "files": files,
-        "stats": {
-            "downloaded_count": len(files),
-            "skipped_count": len(skipped_files),
-            "skipped_files": skipped_files,
-            "base_path": specific_path if use_relative_paths else None,
-            "include_patterns": include_patterns,
-            "exclude_patterns": exclude_patterns
-        }
+                subdirs.append(item_path)
+
+        # Download this directory's files concurrently; the caller lists the subdirectories next
+        for outcome in client.map(download_file, file_items):
+            record_download(*outcome)
+        return subdirs
+
+    def download_file(item_and_path):
+        """
+        Download one file listed by the contents API (runs on a worker thread).
+
+        Returns:
+            tuple: (rel_path, item_path, content, size, reason) for record_download
+        """
+        item, rel_path = item_and_path
+        item_path = item["path"]
+        file_size = item.get("size", 0)
+
+        # For files, get raw content
+        if "download_url" in item and item["download_url"]:
+            file_response = client.get(item["download_url"])
+
+            # Final size check in case content-length header is available but differs from metadata
+            content_length = int(file_response.headers.get('content-length', 0))
+            if content_length > max_file_size:
+                return rel_path, item_path, None, content_length, "size limit"
+
+            if file_response.status_code == 200:
+                return rel_path, item_path, file_response.text, file_size, None
+            print(f"Failed to download {rel_path}: {file_response.status_code}")
+            return rel_path, item_path, None, file_size, "download error"
+
+        # Alternative method if download_url is not available
+        content_response = client.get(item["url"])
+        if content_response.status_code != 200:
+            print(f"Failed to get content for {rel_path}: {content_response.status_code}")
+            return rel_path, item_path, None, file_size, "download error"
+        content_data = content_response.json()
+        if content_data.get("encoding") == "base64" and "content" in content_data:
+            # Check size of base64 content before decoding
+            if len(content_data["content"]) * 0.75 > max_file_size:  # Approximate size calculation
+                estimated_size = int(len(content_data["content"]) * 0.75)
+                return rel_path, item_path, None, estimated_size, "size limit"
+
+            file_content = base64.b64decode(content_data["content"]).decode('utf-8')
+            return rel_path, item_path, file_content, file_size, None
+        print(f"Unexpected content format for {rel_path}")
+        return rel_path, item_path, None, file_size, "download error"
+
+    def record_download(rel_path, item_path, content, size, reason):
+        """Add a download_file result to files, skipped_files and the progress report (main thread only)"""
+        if reason is None:
+            files[rel_path] = content
+            reporter.update(rel_path, PROCESSED, size)
+            return
+        if reason == "size limit":
+            skipped_files.append((item_path, size))
+        reporter.update(rel_path, reason)
+
+    def to_rel_path(item_path):
+        """Path of a repository file as reported in the result"""
+        if use_relative_paths and specific_path and item_path.startswith(specific_path):
+            return item_path[len(specific_path):].lstrip('/')
+        return item_path
+
+    def resolve_commit():
+        """Commit SHA for ref (the default branch when ref is None), so every later request sees the same tree"""
+        # Branch names may contain "/" (release/1.x), which must stay inside the one path segment
+        url = f"{api_url}/repos/{owner}/{repo}/commits/{quote(ref or 'HEAD', safe='')}"
+        response = client.get(url, headers={"Accept": "application/vnd.github.sha"})
+        if response.status_code != 200:
+            return None
+        return response.text.strip()
+
+    def fetch_tree(commit_sha):
+        """All blobs of the commit from one recursive trees call, or None if unavailable or truncated"""
+        url = f"{api_url}/repos/{owner}/{repo}/git/trees/{commit_sha}"
+        response = client.get(url, params={"recursive": "1"})
+        if response.status_code != 200:
+            return None
+        tree = response.json()
+        if tree.get("truncated"):
+            print("Recursive tree listing is truncated, falling back to per-directory listing")
+            return None
+        return [entry for entry in tree.get("tree", []) if entry.get("type") == "blob"]
+
+    def blob_url(sha):
+        return f"{api_url}/repos/{owner}/{repo}/git/blobs/{sha}"
+
+    def is_cached_blob(entry):
+        return client.cache is not None and client.cache.has(
+            client.cache_key(blob_url(entry["sha"]), headers={"Accept": BLOB_ACCEPT})
+        )
+
+    def fetch_blob(entry):
+        """Download one blob as raw bytes (runs on a worker thread); returns a record_download tuple"""
+        rel_path = to_rel_path(entry["path"])
+        response = client.get(blob_url(entry["sha"]), headers={"Accept": BLOB_ACCEPT})
+        if response.status_code != 200:
+            print(f"Failed to download {rel_path}: {response.status_code}")
+            return rel_path, entry["path"], None, 0, "download error"
+        try:
+            content = response.content.decode("utf-8")
+        except UnicodeDecodeError:
+            return rel_path, entry["path"], None, 0, "not utf-8"
+        return rel_path, entry["path"], content, entry.get("size", 0), None
+
+    def fetch_blobs(selected):
+        """Download the selected blobs concurrently, one request each (few files)"""
+        for outcome in client.map(fetch_blob, selected):
+            record_download(*outcome)
+
+    def fetch_tarball(commit_sha, selected):
+        """
+        Stream the commit's tarball once and read only the selected members, without writing to disk.
+        Files the tarball didn't deliver (the download broke off, or they are missing from it) are
+        then fetched as blobs. Returns False, having read nothing, if the tarball isn't available.
+        """
+        wanted = {entry["path"]: entry for entry in selected}
+        url = f"{api_url}/repos/{owner}/{repo}/tarball/{commit_sha}"
+        try:
+            with client.get(url, stream=True) as response:
+                if response.status_code != 200:
+                    print(f"Failed to download tarball of {owner}/{repo}@{commit_sha}: {response.status_code}")
+                    return False
+                response.raw.decode_content = True
+                # Members are prefixed with a "<owner>-<repo>-<sha>/" directory
+                members = iter_archive(
+                    response.raw,
+                    lambda path, size: None if path in wanted else "not selected",
+                    strip_components=1,
+                    sniff=False,
+                )
+                for path, size, data, reason in members:
+                    if reason is not None:
+                        continue
+                    entry = wanted.pop(path)
+                    rel_path = to_rel_path(path)
+                    if client.cache is not None:
+                        # Later runs then find these files as cached blobs and skip the tarball
+                        blob_key = client.cache_key(blob_url(entry["sha"]), headers={"Accept": BLOB_ACCEPT})
+                        client.cache.put(blob_key, blob_url(entry["sha"]), 200,
+                                         {"Content-Type": "application/octet-stream"}, data, pinned=True)
+                    try:
+                        files[rel_path] = data.decode("utf-8")
+                        reporter.update(rel_path, PROCESSED, size)
+                    except UnicodeDecodeError:
+                        reporter.update(rel_path, "not utf-8")
+        except (requests.RequestException, urllib3.exceptions.HTTPError, OSError, tarfile.TarError, ValueError) as e:
+            # ValueError: iter_archive found corrupt data
+            print(f"Error reading tarball of {owner}/{repo}@{commit_sha}: {e}")
+        if wanted:
+            print(f"Fetching {len(wanted)} files the tarball didn't deliver as blobs")
+            fetch_blobs(list(wanted.values()))
+        return True
+
+    def crawl_tree():
+        """
+        Fast path: list the whole tree with one call, filter on its metadata,
+        then download the selected files as blobs or as one tarball.
+        Returns False when the caller should fall back to fetch_contents.
+        """
+        commit_sha = resolve_commit()
+        blobs = fetch_tree(commit_sha) if commit_sha else None
+        if blobs is None:
+            return False
+
+        prefix = specific_path.strip("/")
+        selected = []
+        for entry in blobs:
+            item_path = entry["path"]
+            if prefix and item_path != prefix and not item_path.startswith(prefix + "/"):
+                continue
+            rel_path = to_rel_path(item_path)
+            if not should_include_file(rel_path, item_path.rsplit("/", 1)[-1]):
+                reporter.update(rel_path, "excluded")
+                continue
+            file_size = entry.get("size", 0)
+            if file_size > max_file_size:
+                skipped_files.append((item_path, file_size))
+                reporter.update(rel_path, "size limit")
+                continue
+            selected.append(entry)
+
+        print(f"Selected {len(selected)} of {len(blobs)} files from the tree of {commit_sha[:12]}")
+        uncached = sum(1 for entry in selected if not is_cached_blob(entry))
+        if uncached > MAX_BLOB_REQUESTS and fetch_tarball(commit_sha, selected):
+            return True
+        fetch_blobs(selected)
+        return True
+
+    # Start crawling from the specified path: recursive tree first, per-directory listing as a fallback
+    with client:
+        if not crawl_tree():
+            fetch_contents(specific_path)
+        if client.cache is not None:
+            client.cache.prune(
+                max_bytes=config.github_cache_max_bytes or None,
+                max_age=config.github_cache_max_age_days * 86400 or None,
+            )
+
+    stats = {
+        "downloaded_count": len(files),
+        "skipped_count": len(skipped_files),
+        "skipped_files": skipped_files,
+        "base_path": specific_path if use_relative_paths else None,
+        "include_patterns": include_patterns,
+        "exclude_patterns": exclude_patterns,
+        "http_cache_hits": client.cache_hits,
+        "not_modified": client.not_modified,
+        "rate_limit_retries": client.rate_limit_retries,
+        "skip_reasons": reporter.summary()["skip_reasons"],
     }
+    reporter.finish(stats)
+    return {"files": files, "stats": stats}
 
 # Example usage
 if __name__ == "__main__":
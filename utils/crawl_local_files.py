@@ -1,6 +1,142 @@
 import os
-import fnmatch
-import pathspec
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from config import config
+from utils.file_patterns import GitignoreRules, PatternMatcher
+from utils.progress import ProgressReporter, PROCESSED
+from utils.scan_cache import ScanCache, stat_key
+
+# Bytes read up front to reject binary files before reading them whole
+SNIFF_BYTES = 8192
+
+# New scan cache entries written per transaction
+SCAN_CACHE_BATCH = 256
+
+
+def decode_text(data):
+    """
+    Decode file bytes like a UTF-8 text-mode read (BOM dropped, newlines translated).
+
+    Returns:
+        tuple: (content, reason) with content None and reason "not utf-8" if the bytes don't decode
+    """
+    try:
+        content = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return None, "not utf-8"
+    if "\r" in content:
+        content = content.replace("\r\n", "\n").replace("\r", "\n")
+    return content, None
+
+
+def read_text_file(filepath):
+    """
+    Read a file as UTF-8 text, rejecting binary files early.
+
+    The first SNIFF_BYTES are checked for NUL bytes, which text files don't
+    contain, so binaries are rejected without reading or decoding all of them.
+
+    Returns:
+        tuple: (content, size, reason) where content is None and reason is
+               "binary", "not utf-8" or "read error" when the file was rejected
+    """
+    try:
+        with open(filepath, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+            if b"\0" in head:
+                return None, len(head), "binary"
+            data = head + f.read()
+    except OSError as e:
+        print(f"Warning: Could not read file {filepath}: {e}")
+        return None, 0, "read error"
+    content, reason = decode_text(data)
+    return content, len(data), reason
+
+
+def ordered_map(pool, fn, items, window):
+    """
+    pool.map(fn, items) with at most `window` calls submitted ahead of the
+    consumer, so finished results can't pile up in memory. Results are
+    yielded in input order.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def read_text_blob(blob):
+    """Like read_text_file, for a GitPython blob read from the object database."""
+    try:
+        stream = blob.data_stream
+        head = stream.read(SNIFF_BYTES)
+        if b"\0" in head:
+            return None, len(head), "binary"
+        data = head + stream.read()
+    except Exception as e:
+        print(f"Warning: Could not read blob {blob.path}: {e}")
+        return None, 0, "read error"
+    content, reason = decode_text(data)
+    return content, len(data), reason
+
+
+def list_git_files(directory, ref=None):
+    """
+    List the files of the git work tree containing directory, below directory.
+
+    Without ref this is `git ls-files --cached --others --exclude-standard`:
+    tracked files plus untracked files that git does not ignore, so every
+    .gitignore, .git/info/exclude and core.excludesFile applies exactly as
+    in git, and ignored trees are never visited. With ref, the files of that
+    commit's tree are listed and returned as blobs to read from the object
+    database, whatever is checked out.
+
+    Returns:
+        list: (source, relpath, size) with relpath relative to directory and
+              source a filesystem path (size None) or a git blob (without/with ref)
+    """
+    import git
+
+    try:
+        repo = git.Repo(directory, search_parent_directories=True)
+    except (git.InvalidGitRepositoryError, git.NoSuchPathError):
+        raise ValueError(f"Not inside a git work tree: {directory}")
+
+    root = os.path.realpath(repo.working_tree_dir)
+    prefix = os.path.relpath(os.path.realpath(directory), root).replace(os.sep, "/")
+    prefix = "" if prefix == "." else prefix + "/"
+
+    if ref:
+        try:
+            tree = repo.commit(ref).tree
+        except (git.BadName, ValueError):
+            raise ValueError(f"Unknown git ref: {ref}")
+        if prefix:
+            try:
+                tree = tree / prefix.rstrip("/")
+            except KeyError:
+                tree = None
+            if tree is None or tree.type != "tree":
+                raise ValueError(f"Directory {prefix.rstrip('/')} does not exist at git ref {ref}")
+        return sorted(
+            (
+                (blob, blob.path[len(prefix):].replace("/", os.sep), blob.size)
+                for blob in tree.traverse()
+                # Regular files only: skip trees, submodules and symlinks
+                if blob.type == "blob" and blob.mode & 0o170000 == 0o100000
+            ),
+            key=lambda item: item[1],
+        )
+
+    output = repo.git.ls_files("-z", "--cached", "--others", "--exclude-standard", "--", prefix or ".")
+    files = []
+    for path in sorted(set(filter(None, output.split("\0")))):
+        rel = path[len(prefix):].replace("/", os.sep)
+        files.append((os.path.join(directory, rel), rel, None))
+    return files
 
 
 def crawl_local_files(
@@ -9,6 +145,12 @@ def crawl_local_files(
     exclude_patterns=None,
     max_file_size=None,
     use_relative_paths=True,
+    progress="bar",
+    read_workers=None,
+    use_git_index=False,
+    git_ref=None,
+    use_scan_cache=False,
+    file_store=None,
 ):
     """
     Crawl files in a local directory with similar interface as crawl_github_files.
@@ -18,115 +160,198 @@ def crawl_local_files(
         exclude_patterns (set): File patterns to exclude (e.g. {"tests/*"})
         max_file_size (int): Maximum file size in bytes
         use_relative_paths (bool): Whether to use paths relative to directory
+        progress (str): "bar" for throttled progress lines, "quiet" for a final
+                        summary only, "json" for one final JSON stats record
+        read_workers (int): Threads reading files concurrently (default: config.crawl_read_workers)
+        use_git_index (bool): List files through git (see list_git_files) instead of
+                              walking the directory; it must be inside a git work tree
+        git_ref (str): Read files from this commit/branch/tag in the object database
+                       instead of the work tree (implies use_git_index)
+        use_scan_cache (bool): Reuse the content of files whose size, mtime and inode
+                               are unchanged since the last crawl (config.scan_cache_file)
+        file_store (FileStore): Add the files to this store instead of a dict; it is
+                                returned as "files"
 
     Returns:
-        dict: {"files": {filepath: content}}
+        dict: {"files": {filepath: content}, "stats": {...}} with the same stats
+              layout as crawl_github_files, plus skip counts by reason
     """
     if not os.path.isdir(directory):
         raise ValueError(f"Directory does not exist: {directory}")
 
-    files_dict = {}
+    files_dict = file_store if file_store is not None else {}
+    add_file = file_store.add if file_store is not None else files_dict.__setitem__
+
+    include_matcher = PatternMatcher(include_patterns)
+    exclude_matcher = PatternMatcher(exclude_patterns)
 
-    # --- Load .gitignore ---
-    gitignore_path = os.path.join(directory, ".gitignore")
-    gitignore_spec = None
-    if os.path.exists(gitignore_path):
+    # The root and nested .gitignore files, added as the walk finds them
+    gitignore = GitignoreRules()
+
+    def load_gitignore(dirpath, dirpath_rel):
+        gitignore_path = os.path.join(dirpath, ".gitignore")
         try:
             with open(gitignore_path, "r", encoding="utf-8-sig") as f:
-                gitignore_patterns = f.readlines()
-            gitignore_spec = pathspec.PathSpec.from_lines("gitwildmatch", gitignore_patterns)
-            print(f"Loaded .gitignore patterns from {gitignore_path}")
+                gitignore.add(dirpath_rel.replace(os.sep, "/"), f.read().splitlines())
         except Exception as e:
             print(f"Warning: Could not read or parse .gitignore file {gitignore_path}: {e}")
 
-    all_files = []
-    for root, dirs, files in os.walk(directory):
-        # Filter directories using .gitignore and exclude_patterns early
-        excluded_dirs = set()
-        for d in dirs:
-            dirpath_rel = os.path.relpath(os.path.join(root, d), directory)
+    def is_excluded_dir(dirpath_rel, name):
+        """Check a directory before descending, so excluded subtrees are never listed"""
+        # Trailing slash lets directory-only patterns ("build/", "*node_modules/*") match
+        if gitignore and gitignore.match(dirpath_rel.replace(os.sep, "/") + "/"):
+            return True
+        if exclude_matcher and (
+            exclude_matcher.match(dirpath_rel)
+            or exclude_matcher.match(dirpath_rel + "/")
+            or exclude_matcher.match(name)
+        ):
+            return True
+        return False
 
-            if gitignore_spec and gitignore_spec.match_file(dirpath_rel):
-                excluded_dirs.add(d)
+    if use_git_index or git_ref:
+        # git has already applied its ignore rules
+        all_files = list_git_files(directory, git_ref)
+        if progress != "json":
+            print(f"Listed {len(all_files)} files from git {'ref ' + git_ref if git_ref else 'index'}")
+    else:
+        all_files = []
+        # Iterative pre-order walk (same order as os.walk, but sorted for deterministic output)
+        stack = [(directory, "")]
+        while stack:
+            root, root_rel = stack.pop()
+            try:
+                with os.scandir(root) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError as e:
+                print(f"Warning: Could not list directory {root}: {e}")
                 continue
 
-            if exclude_patterns:
-                for pattern in exclude_patterns:
-                    if fnmatch.fnmatch(dirpath_rel, pattern) or fnmatch.fnmatch(d, pattern):
-                        excluded_dirs.add(d)
-                        break
+            # A directory's own .gitignore applies to everything below it
+            if any(entry.name == ".gitignore" and entry.is_file() for entry in entries):
+                load_gitignore(root, root_rel)
 
-        for d in dirs.copy():
-            if d in excluded_dirs:
-                dirs.remove(d)
+            subdirs = []
+            for entry in entries:
+                entry_rel = os.path.join(root_rel, entry.name) if root_rel else entry.name
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+                if is_dir:
+                    # Like os.walk, don't follow symlinked directories
+                    if not entry.is_symlink() and not is_excluded_dir(entry_rel, entry.name):
+                        subdirs.append((entry.path, entry_rel))
+                else:
+                    all_files.append((entry.path, entry_rel, None))
+            stack.extend(reversed(subdirs))
+        if gitignore and progress != "json":
+            print(f"Loaded {len(gitignore.specs)} .gitignore files")
 
-        for filename in files:
-            filepath = os.path.join(root, filename)
-            all_files.append(filepath)
+    reporter = ProgressReporter("Crawling", total=len(all_files), mode=progress)
+    skipped_files = []
+    candidates = []
 
-    total_files = len(all_files)
-    processed_files = 0
+    scan_cache = ScanCache(config.scan_cache_file) if use_scan_cache else None
+    # Blobs are shared by every checkout; work tree files are keyed by directory
+    cache_root = "git-blob" if git_ref else os.path.realpath(directory)
+    known_keys = scan_cache.keys(cache_root) if scan_cache else {}
+    scan_cache_hits = 0
+    served = []
 
-    for filepath in all_files:
-        relpath = os.path.relpath(filepath, directory) if use_relative_paths else filepath
+    for source, file_rel, file_size in all_files:
+        relpath = file_rel if use_relative_paths else os.path.join(directory, file_rel)
 
         # --- Exclusion check ---
-        excluded = False
-        if gitignore_spec and gitignore_spec.match_file(relpath):
-            excluded = True
-
-        if not excluded and exclude_patterns:
-            for pattern in exclude_patterns:
-                if fnmatch.fnmatch(relpath, pattern):
-                    excluded = True
-                    break
-
-        included = False
-        if include_patterns:
-            for pattern in include_patterns:
-                if fnmatch.fnmatch(relpath, pattern):
-                    included = True
-                    break
+        if gitignore and gitignore.match(file_rel.replace(os.sep, "/")):
+            reporter.update(relpath, "gitignored")
+            continue
+
+        if exclude_matcher and exclude_matcher.match(relpath):
+            reporter.update(relpath, "excluded")
+            continue
+
+        if include_matcher and not include_matcher.match(relpath):
+            reporter.update(relpath, "not included")
+            continue
+
+        # Stat once: the size limit and the scan cache key both need it
+        if file_size is None:
+            try:
+                key = stat_key(os.stat(source))
+            except OSError as e:
+                print(f"Warning: Could not stat file {source}: {e}")
+                reporter.update(relpath, "read error")
+                continue
+            file_size = key[0]
+            cache_path = file_rel
         else:
-            included = True
-
-        processed_files += 1 # Increment processed count regardless of inclusion/exclusion
-
-        status = "processed"
-        if not included or excluded:
-            status = "skipped (excluded)"
-            # Print progress for skipped files due to exclusion
-            if total_files > 0:
-                percentage = (processed_files / total_files) * 100
-                rounded_percentage = int(percentage)
-                print(f"\033[92mProgress: {processed_files}/{total_files} ({rounded_percentage}%) {relpath} [{status}]\033[0m")
-            continue # Skip to next file if not included or excluded
-
-        if max_file_size and os.path.getsize(filepath) > max_file_size:
-            status = "skipped (size limit)"
-            # Print progress for skipped files due to size limit
-            if total_files > 0:
-                percentage = (processed_files / total_files) * 100
-                rounded_percentage = int(percentage)
-                print(f"\033[92mProgress: {processed_files}/{total_files} ({rounded_percentage}%) {relpath} [{status}]\033[0m")
-            continue # Skip large files
-
-        # --- File is being processed ---        
-        try:
-            with open(filepath, "r", encoding="utf-8-sig") as f:
-                content = f.read()
-            files_dict[relpath] = content
-        except Exception as e:
-            print(f"Warning: Could not read file {filepath}: {e}")
-            status = "skipped (read error)"
+            # Blobs are content-addressed, so their SHA is a stable key
+            key = (file_size, 0, 0)
+            cache_path = source.hexsha
+
+        if max_file_size and file_size > max_file_size:
+            skipped_files.append((relpath, file_size))
+            reporter.update(relpath, "size limit")
+            continue
+
+        cached = known_keys.get(cache_path) == key
+        candidates.append((source, relpath, cache_path, key, cached))
+
+    # --- Read the new or changed files concurrently, in walk order ---
+    if git_ref:
+        # Blobs are read through one git process, which is not thread-safe
+        reader, workers = read_text_blob, 1
+    else:
+        reader, workers = read_text_file, max(1, read_workers or config.crawl_read_workers)
+    fresh = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = ordered_map(pool, reader, (c[0] for c in candidates if not c[4]), workers * 4)
+        for source, relpath, cache_path, key, cached in candidates:
+            if not cached:
+                content, size, reason = next(results)
+                if scan_cache and reason != "read error":
+                    fresh.append((cache_path, key, content, reason))
+                    # Write in batches so new files don't all stay in memory until the end
+                    if len(fresh) >= SCAN_CACHE_BATCH:
+                        scan_cache.put_many(cache_root, fresh)
+                        fresh = []
+            else:
+                (content, reason), size = scan_cache.load(cache_root, cache_path), key[0]
+                scan_cache_hits += 1
+                served.append(cache_path)
+            if content is None:
+                reporter.update(relpath, reason)
+                continue
+            add_file(relpath, content)
+            reporter.update(relpath, PROCESSED, size)
 
-        # --- Print progress for processed or error files ---
-        if total_files > 0:
-            percentage = (processed_files / total_files) * 100
-            rounded_percentage = int(percentage)
-            print(f"\033[92mProgress: {processed_files}/{total_files} ({rounded_percentage}%) {relpath} [{status}]\033[0m")
+    if scan_cache:
+        scan_cache.put_many(cache_root, fresh)
+        scan_cache.touch(cache_root, served)
+        if not git_ref:
+            scan_cache.forget_missing(cache_root, (file_rel for _, file_rel, _ in all_files))
+        scan_cache.prune(
+            max_bytes=config.scan_cache_max_bytes or None,
+            max_age=config.scan_cache_max_age_days * 86400 or None,
+        )
+        scan_cache.close()
 
-    return {"files": files_dict}
+    stats = {
+        "downloaded_count": len(files_dict),
+        "skipped_count": len(skipped_files),
+        "skipped_files": skipped_files,
+        "base_path": directory if use_relative_paths else None,
+        "include_patterns": include_patterns,
+        "exclude_patterns": exclude_patterns,
+        "source": "local",
+        "scan_cache_hits": scan_cache_hits,
+    }
+    summary = reporter.summary()
+    stats["skip_reasons"] = summary["skip_reasons"]
+    stats["bytes_per_sec"] = summary["bytes_per_sec"]
+    reporter.finish(stats)
+    return {"files": files_dict, "stats": stats}
 
 
 if __name__ == "__main__":
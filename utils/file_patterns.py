@@ -0,0 +1,87 @@
+import os
+import re
+import fnmatch
+from typing import Iterable, Optional, Union
+
+import pathspec
+
+_WILDCARDS = set("*?[")
+
+
+class PatternMatcher:
+    """
+    A set of fnmatch-style patterns compiled once into a single matcher.
+
+    match(path) returns the same result as
+    any(fnmatch.fnmatch(path, p) for p in patterns), but costs one regex
+    search per path instead of one fnmatch call per pattern. When every
+    pattern is a plain suffix such as "*.py" or "*Dockerfile", matching is a
+    single str.endswith call.
+
+    Args:
+        patterns (str or iterable of str, optional): Patterns to compile
+    """
+
+    def __init__(self, patterns: Optional[Union[str, Iterable[str]]] = None):
+        if isinstance(patterns, str):
+            patterns = {patterns}
+        self.patterns = set(patterns or ())
+
+        normalized = [os.path.normcase(p) for p in sorted(self.patterns)]
+        self._suffixes = None
+        self._regex = None
+        if normalized and all(
+            p.startswith("*") and not (_WILDCARDS & set(p[1:])) for p in normalized
+        ):
+            self._suffixes = tuple(p[1:] for p in normalized)
+        elif normalized:
+            self._regex = re.compile("|".join(fnmatch.translate(p) for p in normalized))
+
+    def __bool__(self) -> bool:
+        return bool(self.patterns)
+
+    def match(self, path: str) -> bool:
+        path = os.path.normcase(path)
+        if self._suffixes is not None:
+            return path.endswith(self._suffixes)
+        if self._regex is not None:
+            return self._regex.match(path) is not None
+        return False
+
+
+class GitignoreRules:
+    """
+    The .gitignore files of a tree, each compiled once into a gitwildmatch
+    spec for its own directory.
+
+    match(path) checks the path against the .gitignore of each ancestor
+    directory, deepest first, relative to that directory; the last pattern
+    that matches in the deepest file with a match decides, so nested files
+    (and their negations) override shallower ones as in git. Adding a file
+    costs only its own lines, and a match looks up at most one spec per
+    path component.
+    """
+
+    def __init__(self):
+        self.specs = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.specs)
+
+    def add(self, base: str, lines: Iterable[str]) -> None:
+        """Compile the lines of the .gitignore in directory base (relative to the root, "/"-separated)."""
+        self.specs[base.strip("/")] = pathspec.PathSpec.from_lines("gitwildmatch", lines)
+
+    def match(self, path: str) -> bool:
+        """Whether path ("/"-separated, trailing "/" for a directory) is ignored."""
+        is_dir = path.endswith("/")
+        parts = path.strip("/").split("/")
+        for depth in range(len(parts) - 1, -1, -1):
+            spec = self.specs.get("/".join(parts[:depth]))
+            if spec is None:
+                continue
+            rel = "/".join(parts[depth:]) + ("/" if is_dir else "")
+            for pattern in reversed(spec.patterns):
+                if pattern.include is not None and pattern.match_file(rel) is not None:
+                    return pattern.include
+        return False
@@ -0,0 +1,139 @@
+import os
+import tempfile
+import threading
+from array import array
+from collections.abc import Sequence
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+
+class FileStore(Sequence):
+    """
+    Crawled files kept on disk instead of as Python strings.
+
+    Contents are appended as UTF-8 to an anonymous spool file and read back
+    with positional reads, so only the path index (a list of paths plus an
+    array of offsets) lives in memory. store[i] returns (path, content) like
+    the list of tuples it replaces, decoding the content on each access;
+    callers that need a file repeatedly should keep the string themselves.
+
+    The spool is deliberately not mmap'ed: pages of a mapping that has been
+    read count towards the process RSS, which made peak memory worse than
+    holding the strings.
+
+    Args:
+        items (iterable, optional): (path, content) pairs to add
+        spool_dir (str, optional): Directory for the spool file (default: the system temp dir)
+    """
+
+    def __init__(self, items: Optional[Iterable[Tuple[str, str]]] = None, spool_dir: Optional[str] = None):
+        self._paths: List[str] = []
+        self._offsets = array("Q", [0])
+        self._spool = tempfile.TemporaryFile(dir=spool_dir)
+        self._dirty = False
+        self._lock = threading.Lock()
+        if items is not None:
+            for path, content in items:
+                self.add(path, content)
+
+    def add(self, path: str, content: str) -> int:
+        """Append a file and return its index."""
+        data = content.encode("utf-8", "surrogatepass")
+        with self._lock:
+            self._spool.write(data)
+            self._paths.append(path)
+            self._offsets.append(self._offsets[-1] + len(data))
+            self._dirty = True
+            return len(self._paths) - 1
+
+    def _read(self, start: int, length: int) -> bytes:
+        with self._lock:
+            if self._dirty:
+                self._spool.flush()
+                self._dirty = False
+            if hasattr(os, "pread"):
+                return os.pread(self._spool.fileno(), length, start)
+            # No pread on Windows: seek and read under the lock, then go back to appending
+            self._spool.seek(start)
+            data = self._spool.read(length)
+            self._spool.seek(0, os.SEEK_END)
+            return data
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        path = self._paths[index]
+        if index < 0:
+            index += len(self._paths)
+        start, end = self._offsets[index], self._offsets[index + 1]
+        if start == end:
+            return path, ""
+        return path, self._read(start, end - start).decode("utf-8", "surrogatepass")
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        for i in range(len(self._paths)):
+            yield self[i]
+
+    @property
+    def paths(self) -> List[str]:
+        return self._paths
+
+    def size(self, index: int) -> int:
+        """Size in bytes of a file's UTF-8 content, without reading it."""
+        return self._offsets[index + 1] - self._offsets[index]
+
+    def head(self, index: int, nbytes: int) -> str:
+        """At most the first nbytes of a file's content (a character cut in half is dropped)."""
+        start = self._offsets[index]
+        length = min(nbytes, self._offsets[index + 1] - start)
+        if not length:
+            return ""
+        return self._read(start, length).decode("utf-8", "ignore")
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the stored contents."""
+        return self._offsets[-1]
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        """Same as iterating; lets a store stand in for a {path: content} dict."""
+        return iter(self)
+
+    def close(self) -> None:
+        self._spool.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def file_paths(files: Sequence) -> List[str]:
+    """Paths of a FileStore (without reading contents) or of a list of (path, content) tuples."""
+    return files.paths if isinstance(files, FileStore) else [path for path, _ in files]
+
+
+def file_size(files: Sequence, index: int) -> int:
+    """Content size of files[index]: UTF-8 bytes for a FileStore (not read), characters for a list."""
+    return files.size(index) if isinstance(files, FileStore) else len(files[index][1])
+
+
+def file_head(files: Sequence, index: int, nbytes: int) -> str:
+    """About the first nbytes of files[index]'s content, reading no more of a FileStore."""
+    return files.head(index, nbytes) if isinstance(files, FileStore) else files[index][1][:nbytes]
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process, or None where it can't be measured."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    import sys
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
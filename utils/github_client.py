@@ -0,0 +1,296 @@
+import time
+import hashlib
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import config
+from utils.http_cache import HttpCache, credential_id, request_key, is_pinned
+from utils.tracing import span
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Below this share of the rate limit left, concurrency shrinks proportionally
+# and requests are paced to spread what is left over the time to the reset
+RATE_LIMIT_HEADROOM = 0.2
+
+# Attempts per request when the answer is a rate-limit refusal
+MAX_RATE_LIMIT_RETRIES = 5
+
+# Secondary rate limit without Retry-After: GitHub asks for at least a minute, doubled per retry
+SECONDARY_BACKOFF = 60.0
+
+
+class RateLimitScheduler:
+    """
+    Rate-limit state of one token, shared by every client using it.
+
+    observe() records X-RateLimit-Remaining/Limit/Reset from each response
+    and turns refusals into a time before which nobody may send: the reset
+    for an exhausted primary limit, Retry-After (or an exponential backoff)
+    for a secondary limit. wait() blocks the calling thread until that time
+    has passed and, once less than RATE_LIMIT_HEADROOM of the limit is
+    left, hands out evenly spaced send slots so the remaining requests last
+    until the reset instead of running out ahead of it.
+
+    Each slot handed out is charged against remaining right away; within a
+    window, headers only ever lower it. Otherwise responses of earlier
+    requests, still showing a higher count, would let the concurrent
+    workers overspend.
+    """
+
+    def __init__(self):
+        self.remaining = None
+        self.limit = None
+        self.reset = None
+        self.blocked_until = 0.0
+        self.waited = 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def headroom(self) -> float:
+        """Share of the rate limit left (1.0 while unknown)."""
+        if self.remaining is None or not self.limit:
+            return 1.0
+        return self.remaining / self.limit
+
+    def wait(self) -> float:
+        """Sleep until this thread may send a request; returns the seconds slept."""
+        with self._lock:
+            now = time.time()
+            start = max(now, self.blocked_until)
+            if self.headroom() < RATE_LIMIT_HEADROOM and self.reset and self.reset > start:
+                start = max(start, self._next_slot)
+                self._next_slot = start + max(self.reset - start, 0) / max(self.remaining, 1)
+            if self.remaining:
+                self.remaining -= 1
+            delay = start - now
+            self.waited += delay
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def observe(self, response: requests.Response, attempt: int = 0) -> bool:
+        """
+        Record the rate-limit headers of a response.
+
+        Returns:
+            bool: Whether the response is a rate-limit refusal worth retrying
+        """
+        headers = response.headers
+        with self._lock:
+            try:
+                new_window = False
+                if "X-RateLimit-Reset" in headers:
+                    reset = float(headers["X-RateLimit-Reset"])
+                    new_window = self.reset is None or reset > self.reset
+                    if new_window:
+                        # Slots paced for the old window no longer apply
+                        self._next_slot = 0.0
+                        self.reset = reset
+                if "X-RateLimit-Remaining" in headers:
+                    remaining = int(headers["X-RateLimit-Remaining"])
+                    if new_window or self.remaining is None:
+                        self.remaining = remaining
+                    else:
+                        self.remaining = min(self.remaining, remaining)
+                if "X-RateLimit-Limit" in headers:
+                    self.limit = int(headers["X-RateLimit-Limit"])
+            except ValueError:
+                pass
+
+            if response.status_code not in (403, 429):
+                return False
+            now = time.time()
+            if "Retry-After" in headers:
+                try:
+                    until = now + float(headers["Retry-After"])
+                except ValueError:
+                    until = now + SECONDARY_BACKOFF * 2 ** attempt
+            elif self.remaining == 0 and self.reset:
+                until = self.reset + 1
+            elif "rate limit" in response.text.lower():
+                until = now + SECONDARY_BACKOFF * 2 ** attempt
+            else:
+                # An ordinary 403 (no access): not a rate limit
+                return False
+            if until > self.blocked_until:
+                print(f"Rate limit exceeded. Pausing GitHub requests for {until - now:.0f} seconds...")
+                self.blocked_until = until
+            return True
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def scheduler_for(token: Optional[str]) -> RateLimitScheduler:
+    """The process-wide scheduler of a token (or of anonymous access), so concurrent crawls share one budget."""
+    key = hashlib.sha256((token or "").encode("utf-8")).hexdigest()
+    with _schedulers_lock:
+        if key not in _schedulers:
+            _schedulers[key] = RateLimitScheduler()
+        return _schedulers[key]
+
+
+class GitHubClient:
+    """
+    Shared HTTP client for the GitHub crawler.
+
+    All requests go through one requests.Session whose connection pool is
+    sized for the worker pool, so keep-alive connections and TLS sessions are
+    reused. map() runs requests concurrently on up to max_workers threads;
+    the number actually in flight follows the X-RateLimit-Remaining/Limit
+    headers of the latest responses, dropping to one request at a time as the
+    rate limit runs out. Every request first waits for the token's
+    RateLimitScheduler, and rate-limit refusals are retried in a loop after
+    the wait it prescribes.
+
+    With an HttpCache, non-streamed GETs are answered from the cache when
+    they name a full SHA and revalidated with the stored ETag/Last-Modified
+    otherwise; cache_hits and not_modified count the requests saved.
+
+    Args:
+        token (str, optional): GitHub token sent with every request
+        api_url (str, optional): REST API base URL (default: config.github_api_url)
+        max_workers (int, optional): Maximum concurrent requests (default: config.github_max_workers)
+        cache (HttpCache, optional): Conditional-request cache for responses (closed with the client)
+        scheduler (RateLimitScheduler, optional): Rate-limit state to share (default: the token's)
+    """
+
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        api_url: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        cache: Optional[HttpCache] = None,
+        scheduler: Optional[RateLimitScheduler] = None,
+    ):
+        self.api_url = (api_url or config.github_api_url).rstrip("/")
+        self.max_workers = max(1, max_workers or config.github_max_workers)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Accept"] = "application/vnd.github.v3+json"
+        if token:
+            self.session.headers["Authorization"] = f"token {token}"
+
+        self.scheduler = scheduler or scheduler_for(token)
+        self.credentials = credential_id(token)
+        self.concurrency = self.max_workers
+        self.requests = 0
+        self.rate_limit_retries = 0
+        self.cache = cache
+        self.cache_hits = 0
+        self.not_modified = 0
+        self._in_flight = 0
+        self._gate = threading.Condition()
+
+    def get(self, url: str, params=None, headers=None, stream: bool = False, **kwargs) -> requests.Response:
+        """GET through the pooled session and the response cache, if any."""
+        if self.cache is None or stream:
+            return self._send(url, params=params, headers=headers, stream=stream, **kwargs)
+
+        key = self.cache_key(url, params, headers)
+        pinned = is_pinned(url, params)
+        entry = self.cache.get(key)
+        if entry is not None and entry.pinned:
+            with self._gate:
+                self.cache_hits += 1
+            with span("GET (cached)", "http", url=url, bytes=len(entry.body)):
+                return entry.to_response()
+
+        if entry is not None:
+            headers = dict(headers or {})
+            if "ETag" in entry.headers:
+                headers["If-None-Match"] = entry.headers["ETag"]
+            if "Last-Modified" in entry.headers:
+                headers["If-Modified-Since"] = entry.headers["Last-Modified"]
+        response = self._send(url, params=params, headers=headers, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            with self._gate:
+                self.not_modified += 1
+            return entry.to_response()
+        self.cache.store(key, response, pinned)
+        return response
+
+    def cache_key(self, url: str, params=None, headers=None) -> str:
+        """Key under which the cache stores a GET made with these arguments and this client's token."""
+        accept = (headers or {}).get("Accept") or self.session.headers["Accept"]
+        return request_key(url, params, accept, self.credentials)
+
+    def _send(self, url: str, **kwargs) -> requests.Response:
+        """
+        GET on the pooled session once the scheduler and a free concurrency
+        slot allow it, retrying rate-limit refusals up to MAX_RATE_LIMIT_RETRIES times.
+        """
+        for attempt in range(MAX_RATE_LIMIT_RETRIES):
+            with span("GET", "http", url=url, attempt=attempt) as trace:
+                trace["rate_limit_wait"] = round(self.scheduler.wait(), 3)
+                with self._gate:
+                    while self._in_flight >= self.concurrency:
+                        self._gate.wait()
+                    self._in_flight += 1
+                try:
+                    response = self.session.get(url, **kwargs)
+                finally:
+                    with self._gate:
+                        self._in_flight -= 1
+                        self._gate.notify()
+                trace.update(status=response.status_code, bytes=int(response.headers.get("Content-Length", 0) or 0))
+            refused = self.scheduler.observe(response, attempt)
+            self._adapt_concurrency()
+            if not refused or attempt == MAX_RATE_LIMIT_RETRIES - 1:
+                return response
+            response.close()
+            with self._gate:
+                self.rate_limit_retries += 1
+
+    def _adapt_concurrency(self) -> None:
+        """Count the request and shrink concurrency as the rate limit runs low."""
+        headroom = self.scheduler.headroom()
+        with self._gate:
+            self.requests += 1
+            if headroom >= RATE_LIMIT_HEADROOM:
+                concurrency = self.max_workers
+            else:
+                concurrency = max(1, int(self.max_workers * headroom / RATE_LIMIT_HEADROOM))
+            if concurrency != self.concurrency:
+                self.concurrency = concurrency
+                self._gate.notify_all()
+
+    def map(self, fn: Callable[[T], R], items: Iterable[T]) -> Iterator[R]:
+        """
+        Apply fn (which makes its requests through get()) to items concurrently.
+        Results are yielded in input order; at most a few batches are queued ahead.
+        """
+        if self.max_workers == 1:
+            yield from map(fn, items)
+            return
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = deque()
+            for item in items:
+                # Run in a copy of the caller's context, so request spans nest under the caller's span
+                pending.append(pool.submit(contextvars.copy_context().run, fn, item))
+                if len(pending) >= self.max_workers * 4:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def close(self) -> None:
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
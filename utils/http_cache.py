@@ -0,0 +1,206 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Optional, Dict, Any, NamedTuple
+from urllib.parse import urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# A full commit or blob SHA in a URL path or query pins the response: it can never change
+_SHA = re.compile(r"(?<![0-9a-fA-F])[0-9a-fA-F]{40}(?![0-9a-fA-F])")
+
+# Response headers worth keeping; the rest (rate limit, dates, cookies) are per-request.
+# Content-Encoding is dropped too: the stored body is already decoded.
+_KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Link")
+
+
+def credential_id(token: Optional[str]) -> str:
+    """Identity of the credentials a response was fetched with: a hash of the token, or "anonymous"."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest() if token else "anonymous"
+
+
+def request_key(
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    accept: Optional[str] = None,
+    credentials: str = "anonymous",
+) -> str:
+    """
+    Cache key of a GET: the URL with its sorted query (which carries the ref),
+    the Accept header and credential_id() of the token. Responses are never
+    shared between tokens, so a private repository read with one token is
+    not served to a run with another token, or none.
+    """
+    query = urlencode(sorted((params or {}).items()))
+    return hashlib.sha256(f"{credentials}\n{url}?{query}\n{accept or ''}".encode("utf-8")).hexdigest()
+
+
+def is_pinned(url: str, params: Optional[Dict[str, Any]] = None) -> bool:
+    """Whether the request names a full SHA (git/blobs/<sha>, trees/<sha>, contents?ref=<sha>, raw/<sha>/...)."""
+    return bool(_SHA.search(url)) or any(_SHA.fullmatch(str(value)) for value in (params or {}).values())
+
+
+class CachedEntry(NamedTuple):
+    url: str
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    pinned: bool
+
+    def to_response(self) -> requests.Response:
+        """Rebuild the stored response as a requests.Response, as if it had just been received."""
+        response = requests.Response()
+        response.status_code = self.status
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.body
+        response.url = self.url
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+
+class HttpCache:
+    """
+    On-disk cache of GitHub API and raw download responses, stored in SQLite.
+
+    Entries are keyed by request_key(), separately per token, and keep the
+    body with its ETag and Last-Modified validators. Requests that name a full SHA are immutable and
+    served without touching the network; everything else (branch listings,
+    commits/<branch>, contents at a branch) is revalidated with
+    If-None-Match/If-Modified-Since, and a 304 answer, which does not count
+    against GitHub's rate limit, is served from the stored body.
+
+    Entries served by get() are remembered and stamped with used_at by the
+    next prune(), which then drops entries unused for longer than max_age
+    and least recently used entries beyond max_bytes; pinned blobs and
+    tarball members would otherwise pile up with every commit crawled.
+
+    The connection is shared by the client's worker threads behind a lock.
+
+    Args:
+        path (str): Path to the SQLite database file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " url TEXT NOT NULL,"
+            " status INTEGER NOT NULL,"
+            " headers TEXT NOT NULL,"
+            " body BLOB NOT NULL,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " pinned INTEGER NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " used_at REAL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(responses)")}
+        if "used_at" not in columns:
+            # Caches written before pruning existed
+            self._conn.execute("ALTER TABLE responses ADD COLUMN used_at REAL")
+            self._conn.execute("UPDATE responses SET used_at = stored_at")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)")
+        # Keys served since the last prune(), stamped in one transaction there
+        self._used = set()
+
+    def get(self, key: str) -> Optional[CachedEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, status, headers, body, pinned FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self._used.add(key)
+        if row is None:
+            return None
+        url, status, headers, body, pinned = row
+        # Entries stored before Content-Encoding was dropped may still carry it
+        headers = {name: value for name, value in json.loads(headers).items() if name in _KEPT_HEADERS}
+        return CachedEntry(url, status, headers, bytes(body), bool(pinned))
+
+    def has(self, key: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is not None
+
+    def put(self, key: str, url: str, status: int, headers, body: bytes, pinned: bool) -> None:
+        """Store a response; headers are reduced to the content and validator headers."""
+        kept = {name: headers[name] for name in _KEPT_HEADERS if name in headers}
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (key, url, status, headers, body, etag, last_modified, pinned, stored_at, used_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, status, json.dumps(kept), body, kept.get("ETag"), kept.get("Last-Modified"),
+                 int(pinned), now, now),
+            )
+
+    def store(self, key: str, response: requests.Response, pinned: bool) -> bool:
+        """
+        Store a 200 response if it can be reused: pinned, or carrying a validator.
+
+        Returns:
+            bool: Whether the response was stored
+        """
+        if response.status_code != 200:
+            return False
+        if not pinned and "ETag" not in response.headers and "Last-Modified" not in response.headers:
+            return False
+        self.put(key, response.url, response.status_code, response.headers, response.content, pinned)
+        return True
+
+    def prune(self, max_bytes: Optional[int] = None, max_age: Optional[float] = None) -> int:
+        """
+        Stamp the entries served since the last prune as used now, then delete
+        entries unused for more than max_age seconds and least recently used
+        entries until the stored bodies are at most max_bytes.
+
+        Returns:
+            int: Number of entries removed
+        """
+        removed = 0
+        with self._lock:
+            used, self._used = self._used, set()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                self._conn.executemany("UPDATE responses SET used_at = ? WHERE key = ?", [(now, key) for key in used])
+                if max_age:
+                    removed += self._conn.execute(
+                        "DELETE FROM responses WHERE used_at < ?", (now - max_age,)
+                    ).rowcount
+
+                if max_bytes is not None:
+                    total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(body)), 0) FROM responses").fetchone()[0]
+                    if total > max_bytes:
+                        victims = []
+                        for key, size in self._conn.execute(
+                            "SELECT key, LENGTH(body) FROM responses ORDER BY used_at ASC"
+                        ):
+                            if total <= max_bytes:
+                                break
+                            victims.append((key,))
+                            total -= size
+                        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+                        removed += len(victims)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,581 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import zlib
+from collections import OrderedDict, Counter
+from typing import Optional, Dict, Iterable, Tuple, List, Any
+
+logger = logging.getLogger("llm_logger")
+
+
+def prompt_key(prompt: str) -> str:
+    """Stable cache key for a prompt (hex SHA-256 of its UTF-8 bytes)."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+# Storage codecs for the prompt/response columns
+CODEC_PLAIN = 0  # uncompressed text (entries written before compression)
+CODEC_ZLIB = 1  # zlib stream
+CODEC_ZLIB_DICT = 2  # zlib stream primed with a shared dictionary
+
+# zlib only looks back 32 KB, so a larger preset dictionary is wasted
+MAX_DICTIONARY_SIZE = 32 * 1024
+
+
+def build_dictionary(samples: Iterable[str], max_size: int = MAX_DICTIONARY_SIZE) -> bytes:
+    """
+    Build a zlib preset dictionary from sample cache texts.
+
+    Prompts share long runs of identical lines (instruction boilerplate, the
+    same source files embedded by several nodes). Lines that occur in more than
+    one sample are kept, most frequent last because zlib finds matches near the
+    end of the dictionary most cheaply.
+    """
+    counts = Counter()
+    for sample in samples:
+        counts.update(set(line for line in sample.splitlines() if len(line) > 8))
+
+    shared_lines = [line for line, n in counts.most_common() if n > 1]
+    parts, size = [], 0
+    for line in shared_lines:
+        encoded = (line + "\n").encode("utf-8")
+        if size + len(encoded) > max_size:
+            break
+        parts.append(encoded)
+        size += len(encoded)
+    return b"".join(reversed(parts))
+
+
+class LLMCache:
+    """
+    Persistent LLM response cache stored in SQLite.
+
+    Entries are keyed by the SHA-256 of the prompt, so a lookup is a single
+    primary-key read instead of parsing the whole cache. SQLite's file locking
+    (WAL journal, busy timeout) makes it safe to share the file between threads
+    and between concurrently running processes.
+
+    Prompts and responses are stored zlib-compressed, optionally primed with a
+    shared dictionary built by compact(). prune() enforces a size cap (least
+    recently used entries go first) and a maximum age.
+
+    Args:
+        path (str): Path to the SQLite database file
+        legacy_json_path (str, optional): Old whole-file JSON cache to import once
+        compression_level (int): zlib level for new entries (0 stores plain text)
+    """
+
+    SCHEMA_VERSION = 2
+
+    # Only refresh last_access when it is older than this, to keep reads cheap
+    ACCESS_RESOLUTION = 3600
+
+    def __init__(
+        self,
+        path: str,
+        legacy_json_path: Optional[str] = None,
+        compression_level: int = 6,
+    ):
+        self.path = path
+        self.compression_level = compression_level
+        self._local = threading.local()
+        self._dictionaries = {}  # dict_id -> bytes
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " prompt BLOB NOT NULL,"
+                " response BLOB NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS dictionaries ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " data BLOB NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            # Columns added in schema version 2
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(entries)")}
+            for name, decl in (
+                ("codec", "INTEGER NOT NULL DEFAULT 0"),
+                ("dict_id", "INTEGER"),
+                ("last_access", "REAL"),
+                ("stored_size", "INTEGER"),
+            ):
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE entries ADD COLUMN {name} {decl}")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)"
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('schema_version', ?)",
+                (str(self.SCHEMA_VERSION),),
+            )
+
+        if legacy_json_path:
+            self.migrate_json(legacy_json_path)
+
+    def _conn(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- Encoding ---
+
+    def _dictionary(self, dict_id: int) -> bytes:
+        data = self._dictionaries.get(dict_id)
+        if data is None:
+            row = self._conn().execute(
+                "SELECT data FROM dictionaries WHERE id = ?", (dict_id,)
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Missing compression dictionary {dict_id}")
+            data = self._dictionaries[dict_id] = row[0]
+        return data
+
+    def _active_dictionary_id(self) -> Optional[int]:
+        row = self._conn().execute("SELECT MAX(id) FROM dictionaries").fetchone()
+        return row[0] if row else None
+
+    def _encode(self, text: str, dict_id: Optional[int]) -> Tuple[bytes, int]:
+        raw = text.encode("utf-8")
+        if self.compression_level <= 0:
+            return raw, CODEC_PLAIN
+        if dict_id is None:
+            return zlib.compress(raw, self.compression_level), CODEC_ZLIB
+        compressor = zlib.compressobj(self.compression_level, zdict=self._dictionary(dict_id))
+        return compressor.compress(raw) + compressor.flush(), CODEC_ZLIB_DICT
+
+    def _decode(self, data, codec: int, dict_id: Optional[int]) -> str:
+        if codec == CODEC_PLAIN:
+            return data if isinstance(data, str) else bytes(data).decode("utf-8")
+        if codec == CODEC_ZLIB:
+            return zlib.decompress(data).decode("utf-8")
+        if codec == CODEC_ZLIB_DICT:
+            decompressor = zlib.decompressobj(zdict=self._dictionary(dict_id))
+            return (decompressor.decompress(data) + decompressor.flush()).decode("utf-8")
+        raise ValueError(f"Unknown cache codec {codec}")
+
+    def _row(self, key: str, prompt: str, response: str, created_at: float) -> tuple:
+        dict_id = self._active_dictionary_id() if self.compression_level > 0 else None
+        prompt_data, codec = self._encode(prompt, dict_id)
+        response_data, _ = self._encode(response, dict_id)
+        stored_size = len(prompt_data) + len(response_data)
+        return (
+            key, prompt_data, response_data, created_at,
+            codec, dict_id if codec == CODEC_ZLIB_DICT else None, created_at, stored_size,
+        )
+
+    # --- Lookup ---
+
+    def get(self, prompt: str, key: Optional[str] = None) -> Optional[str]:
+        key = key or prompt_key(prompt)
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT response, codec, dict_id, last_access FROM entries WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        response, codec, dict_id, last_access = row
+        now = time.time()
+        if last_access is None or now - last_access > self.ACCESS_RESOLUTION:
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+        return self._decode(response, codec, dict_id)
+
+    def set(self, prompt: str, response: str, key: Optional[str] = None) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO entries"
+            " (key, prompt, response, created_at, codec, dict_id, last_access, stored_size)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            self._row(key or prompt_key(prompt), prompt, response, time.time()),
+        )
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def migrate_json(self, json_path: str) -> int:
+        """
+        Import a legacy {prompt: response} JSON cache once.
+
+        The import runs inside an immediate transaction and is recorded in the
+        meta table, so concurrent processes import the file exactly once.
+        The JSON file itself is left untouched.
+
+        Returns:
+            int: Number of entries imported (0 if already migrated or missing)
+        """
+        if not os.path.exists(json_path):
+            return 0
+
+        marker = f"migrated:{os.path.abspath(json_path)}"
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM meta WHERE name = ?", (marker,)).fetchone():
+            return 0
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM meta WHERE name = ?", (marker,)).fetchone():
+                conn.execute("COMMIT")
+                return 0
+
+            try:
+                with open(json_path, "r", encoding="utf-8") as f:
+                    legacy = json.load(f)
+            except Exception as e:
+                logger.warning(f"Failed to load legacy cache {json_path}: {e}")
+                legacy = {}
+
+            now = time.time()
+            rows = [
+                self._row(prompt_key(prompt), prompt, response, now)
+                for prompt, response in legacy.items()
+                if isinstance(prompt, str) and isinstance(response, str)
+            ]
+            # Existing entries win over the legacy file
+            conn.executemany(
+                "INSERT OR IGNORE INTO entries"
+                " (key, prompt, response, created_at, codec, dict_id, last_access, stored_size)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute(
+                "INSERT INTO meta (name, value) VALUES (?, ?)", (marker, str(len(rows)))
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        logger.info(f"Migrated {len(rows)} cache entries from {json_path} to {self.path}")
+        return len(rows)
+
+    # --- Maintenance ---
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        entries, stored, oldest, newest = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(COALESCE(stored_size, LENGTH(prompt) + LENGTH(response))), 0),"
+            " MIN(created_at), MAX(created_at) FROM entries"
+        ).fetchone()
+        by_codec = dict(conn.execute("SELECT codec, COUNT(*) FROM entries GROUP BY codec"))
+        file_size = 0
+        for suffix in ("", "-wal"):
+            if os.path.exists(self.path + suffix):
+                file_size += os.path.getsize(self.path + suffix)
+        return {
+            "path": self.path,
+            "entries": entries,
+            "stored_bytes": stored,
+            "file_bytes": file_size,
+            "plain_entries": by_codec.get(CODEC_PLAIN, 0),
+            "compressed_entries": by_codec.get(CODEC_ZLIB, 0) + by_codec.get(CODEC_ZLIB_DICT, 0),
+            "dictionaries": conn.execute("SELECT COUNT(*) FROM dictionaries").fetchone()[0],
+            "oldest": oldest,
+            "newest": newest,
+        }
+
+    def prune(self, max_bytes: Optional[int] = None, max_age: Optional[float] = None) -> int:
+        """
+        Evict entries older than max_age seconds, then least recently used
+        entries until the stored size is at most max_bytes.
+
+        Returns:
+            int: Number of entries removed
+        """
+        conn = self._conn()
+        removed = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if max_age:
+                removed += conn.execute(
+                    "DELETE FROM entries WHERE created_at < ?", (time.time() - max_age,)
+                ).rowcount
+
+            if max_bytes is not None:
+                total = conn.execute(
+                    "SELECT COALESCE(SUM(COALESCE(stored_size, LENGTH(prompt) + LENGTH(response))), 0)"
+                    " FROM entries"
+                ).fetchone()[0]
+                if total > max_bytes:
+                    victims = []
+                    for key, size in conn.execute(
+                        "SELECT key, COALESCE(stored_size, LENGTH(prompt) + LENGTH(response))"
+                        " FROM entries ORDER BY COALESCE(last_access, created_at) ASC"
+                    ):
+                        if total <= max_bytes:
+                            break
+                        victims.append((key,))
+                        total -= size
+                    conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+                    removed += len(victims)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if removed:
+            logger.info(f"Pruned {removed} entries from {self.path}")
+        return removed
+
+    def verify(self, delete: bool = False) -> List[str]:
+        """
+        Check that every entry decodes and its prompt still hashes to its key.
+
+        Args:
+            delete (bool): Remove the entries that fail
+
+        Returns:
+            list: Keys of the broken entries
+        """
+        conn = self._conn()
+        broken = []
+        for key, prompt, response, codec, dict_id in conn.execute(
+            "SELECT key, prompt, response, codec, dict_id FROM entries"
+        ).fetchall():
+            try:
+                if prompt_key(self._decode(prompt, codec, dict_id)) != key:
+                    raise ValueError("prompt hash mismatch")
+                self._decode(response, codec, dict_id)
+            except Exception as e:
+                logger.warning(f"Cache entry {key} is broken: {e}")
+                broken.append(key)
+
+        integrity = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        if integrity != "ok":
+            logger.warning(f"SQLite integrity check of {self.path} failed: {integrity}")
+
+        if delete and broken:
+            conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in broken])
+        return broken
+
+    def compact(self, train_dictionary: bool = True, sample_size: int = 64) -> Dict[str, int]:
+        """
+        Rewrite every entry with the current codec and reclaim free pages.
+
+        With train_dictionary, a new shared dictionary is built from a sample of
+        entries first and all entries are re-encoded against it. Dictionaries
+        that are no longer referenced are dropped.
+
+        Returns:
+            dict: Stored bytes before and after
+        """
+        conn = self._conn()
+        before = self.stats()["stored_bytes"]
+
+        if train_dictionary and self.compression_level > 0:
+            samples = []
+            for prompt, response, codec, dict_id in conn.execute(
+                "SELECT prompt, response, codec, dict_id FROM entries"
+                " ORDER BY COALESCE(last_access, created_at) DESC LIMIT ?",
+                (sample_size,),
+            ).fetchall():
+                samples.append(self._decode(prompt, codec, dict_id))
+                samples.append(self._decode(response, codec, dict_id))
+            dictionary = build_dictionary(samples)
+            if dictionary:
+                conn.execute(
+                    "INSERT INTO dictionaries (data, created_at) VALUES (?, ?)",
+                    (dictionary, time.time()),
+                )
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for key, prompt, response, created_at, codec, dict_id, last_access in conn.execute(
+                "SELECT key, prompt, response, created_at, codec, dict_id, last_access FROM entries"
+            ).fetchall():
+                row = self._row(
+                    key,
+                    self._decode(prompt, codec, dict_id),
+                    self._decode(response, codec, dict_id),
+                    created_at,
+                )
+                conn.execute(
+                    "UPDATE entries SET prompt = ?, response = ?, codec = ?, dict_id = ?,"
+                    " last_access = ?, stored_size = ? WHERE key = ?",
+                    (row[1], row[2], row[4], row[5], last_access or created_at, row[7], key),
+                )
+            conn.execute(
+                "DELETE FROM dictionaries WHERE id NOT IN"
+                " (SELECT DISTINCT dict_id FROM entries WHERE dict_id IS NOT NULL)"
+                " AND id != (SELECT MAX(id) FROM dictionaries)"
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._dictionaries.clear()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+        return {"stored_bytes_before": before, "stored_bytes_after": self.stats()["stored_bytes"]}
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class MemoryLRUCache:
+    """
+    Bounded in-process LRU cache for LLM responses.
+
+    Entries are evicted least-recently-used first once the total size of the
+    stored responses exceeds max_bytes. With a ttl, entries older than ttl
+    seconds are treated as misses and dropped.
+
+    Args:
+        max_bytes (int): Upper bound on the summed UTF-8 size of cached values
+        ttl (float, optional): Entry lifetime in seconds (None or 0 disables expiry)
+    """
+
+    def __init__(self, max_bytes: int, ttl: Optional[float] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl or None
+        self._entries = OrderedDict()  # key -> (value, size, stored_at)
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, size, stored_at = entry
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self._size -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+
+            # Values larger than the whole budget are not worth caching
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, size, time.monotonic())
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class TieredLLMCache:
+    """
+    Memory LRU tier in front of the persistent LLMCache.
+
+    Disk hits are promoted into memory, writes go to both tiers.
+    The memory tier may be None to disable it.
+    """
+
+    def __init__(self, disk: LLMCache, memory: Optional[MemoryLRUCache] = None):
+        self.disk = disk
+        self.memory = memory
+
+    def get(self, prompt: str) -> Optional[str]:
+        key = prompt_key(prompt)
+        if self.memory is not None:
+            value = self.memory.get(key)
+            if value is not None:
+                return value
+
+        value = self.disk.get(prompt, key=key)
+        if value is not None and self.memory is not None:
+            self.memory.set(key, value)
+        return value
+
+    def set(self, prompt: str, response: str) -> None:
+        key = prompt_key(prompt)
+        if self.memory is not None:
+            self.memory.set(key, response)
+        self.disk.set(prompt, response, key=key)
+
+    def stats(self) -> Dict[str, int]:
+        return self.memory.stats() if self.memory is not None else {}
+
+
+if __name__ == "__main__":
+    import argparse
+    from config import config
+
+    parser = argparse.ArgumentParser(description="Inspect and maintain the LLM response cache.")
+    parser.add_argument("--db", default=config.cache_db_file, help=f"Cache database (default: {config.cache_db_file})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Show entry counts and sizes.")
+    prune_parser = subparsers.add_parser("prune", help="Evict old or least recently used entries.")
+    prune_parser.add_argument("--max-bytes", type=int, default=config.cache_max_bytes or None, help="Maximum stored size in bytes.")
+    prune_parser.add_argument("--max-age-days", type=float, default=config.cache_max_age_days or None, help="Maximum entry age in days.")
+    verify_parser = subparsers.add_parser("verify", help="Check that every entry decodes and matches its key.")
+    verify_parser.add_argument("--delete", action="store_true", help="Delete broken entries.")
+    compact_parser = subparsers.add_parser("compact", help="Recompress all entries and reclaim space.")
+    compact_parser.add_argument("--no-dictionary", action="store_true", help="Do not train a shared compression dictionary.")
+    args = parser.parse_args()
+
+    cache = LLMCache(args.db, compression_level=config.cache_compression_level)
+    if args.command == "stats":
+        for name, value in cache.stats().items():
+            print(f"{name}: {value}")
+    elif args.command == "prune":
+        max_age = args.max_age_days * 86400 if args.max_age_days else None
+        print(f"Removed {cache.prune(max_bytes=args.max_bytes, max_age=max_age)} entries.")
+    elif args.command == "verify":
+        broken = cache.verify(delete=args.delete)
+        print(f"{len(broken)} broken entries{' deleted' if args.delete and broken else ''}.")
+    elif args.command == "compact":
+        result = cache.compact(train_dictionary=not args.no_dictionary)
+        print(f"Stored size: {result['stored_bytes_before']} -> {result['stored_bytes_after']} bytes")
@@ -0,0 +1,191 @@
+import os
+import re
+import time
+import shutil
+import hashlib
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+import git
+
+from utils.tracing import span
+
+# Touched on every use; its mtime orders mirrors for LRU eviction
+LAST_USED_FILE = "last-used"
+
+_FULL_SHA = re.compile(r"[0-9a-fA-F]{40}")
+
+
+def directory_size(path: str) -> int:
+    """Bytes used by the files below path."""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+    return total
+
+
+@contextmanager
+def _locked(lock_path: str, shared: bool = False, blocking: bool = True) -> Iterator[bool]:
+    """
+    Hold a flock on lock_path for the duration of the block; yields whether it
+    was acquired (False only when not blocking and someone else holds it).
+    A no-op that yields True where fcntl is missing.
+    """
+    try:
+        import fcntl
+    except ImportError:  # Windows
+        yield True
+        return
+    with open(lock_path, "a") as lock_file:
+        flags = (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB)
+        try:
+            fcntl.flock(lock_file, flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class MirrorCache:
+    """
+    Persistent bare mirrors of remote repositories, one per remote URL.
+
+    The first open() of a URL clones it bare (branches and tags, without
+    GitHub's pull request refs); later ones run an incremental fetch, which
+    only transfers objects the mirror doesn't have yet. A ref that is a full
+    commit SHA already in the mirror needs no fetch at all. Files are then
+    read straight from the object database, with no checkout.
+
+    use() holds a shared lock on the mirror's .lock file for as long as the
+    caller reads from it, and serializes clones and fetches with a separate
+    .update.lock. Eviction needs the .lock exclusively and skips mirrors
+    that are in use, so a mirror is never deleted under a reader. Lock files
+    are left in place: deleting one would let a process that still has it
+    open and one that creates a new one both think they hold the lock.
+
+    After each update, least recently used mirrors are deleted until the
+    cache fits in max_bytes (0 means unlimited).
+
+    Args:
+        root (str): Directory holding the mirrors
+        max_bytes (int): Size cap for all mirrors together
+    """
+
+    def __init__(self, root: str, max_bytes: int = 0):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, url: str) -> str:
+        """Mirror directory of a remote URL: readable repo name plus a hash of the full URL."""
+        name = re.sub(r"[^A-Za-z0-9._-]", "_", url.rstrip("/").rsplit("/", 1)[-1].rsplit(":", 1)[-1])
+        if name.endswith(".git"):
+            name = name[:-4]
+        return os.path.join(self.root, f"{name}-{hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]}.git")
+
+    @contextmanager
+    def use(self, url: str, ref: Optional[str] = None) -> Iterator[Tuple[git.Repo, git.Commit, bool]]:
+        """
+        Create or update the mirror of url, resolve ref in it, and keep the
+        mirror from being evicted until the block ends.
+
+        Args:
+            url (str): Remote URL
+            ref (str, optional): Branch, tag or commit SHA (default: the remote's default branch)
+
+        Yields:
+            tuple: (repo, commit, fetched) where fetched tells whether the remote was contacted
+        """
+        path = self.path_for(url)
+        with _locked(path + ".lock", shared=True):
+            repo, commit, fetched = self._update(path, url, ref)
+            self.evict(keep=path)
+            yield repo, commit, fetched
+
+    def _update(self, path: str, url: str, ref: Optional[str]) -> Tuple[git.Repo, git.Commit, bool]:
+        with _locked(path + ".update.lock"), span("mirror update", "git", url=url, ref=ref) as trace:
+            if os.path.isdir(path):
+                repo = git.Repo(path)
+                commit = self._resolve(repo, ref) if ref and _FULL_SHA.fullmatch(ref) else None
+                fetched = commit is None
+                if fetched:
+                    # Incremental: only objects the mirror lacks are transferred
+                    repo.git.fetch("--prune", "--prune-tags", "origin")
+            else:
+                print(f"Creating mirror of {url} in {path} ...")
+                repo = git.Repo.clone_from(url, path, bare=True)
+                repo.git.config("remote.origin.fetch", "+refs/heads/*:refs/heads/*")
+                repo.git.config("--add", "remote.origin.fetch", "+refs/tags/*:refs/tags/*")
+                commit, fetched = None, True
+
+            if commit is None:
+                commit = self._resolve(repo, ref)
+            if commit is None:
+                # A commit no branch or tag points to (yet): ask for it by name
+                repo.git.fetch("origin", ref)
+                commit = repo.commit("FETCH_HEAD")
+            self._touch(path)
+            trace["fetched"] = fetched
+        return repo, commit, fetched
+
+    @staticmethod
+    def _resolve(repo: git.Repo, ref: Optional[str]) -> Optional[git.Commit]:
+        try:
+            return repo.commit(ref or "HEAD")
+        except (git.BadName, ValueError):
+            return None
+
+    @staticmethod
+    def _touch(path: str) -> None:
+        with open(os.path.join(path, LAST_USED_FILE), "w") as f:
+            f.write(str(time.time()))
+
+    def mirrors(self) -> List[Tuple[float, str]]:
+        """(last used, path) of every mirror, least recently used first."""
+        found = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not name.endswith(".git") or not os.path.isdir(path):
+                continue
+            try:
+                last_used = os.path.getmtime(os.path.join(path, LAST_USED_FILE))
+            except OSError:
+                last_used = 0.0
+            found.append((last_used, path))
+        return sorted(found)
+
+    def evict(self, keep: Optional[str] = None) -> List[str]:
+        """
+        Delete least recently used mirrors until the cache fits in max_bytes.
+        Mirrors in use (whose .lock can't be taken exclusively right away) are skipped.
+
+        Returns:
+            list: Paths of the deleted mirrors
+        """
+        if not self.max_bytes:
+            return []
+
+        mirrors = self.mirrors()
+        sizes = {path: directory_size(path) for _, path in mirrors}
+        total = sum(sizes.values())
+        evicted = []
+        for _, path in mirrors:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            with _locked(path + ".lock", blocking=False) as acquired:
+                if not acquired:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+            total -= sizes[path]
+            evicted.append(path)
+            print(f"Evicted mirror {path} ({sizes[path]} bytes) to stay within {self.max_bytes} bytes")
+        return evicted
@@ -0,0 +1,123 @@
+import sys
+import json
+import time
+from collections import Counter
+from typing import Optional, Dict, Any
+
+PROGRESS_MODES = ("bar", "quiet", "json")
+
+# Status reported for files that were kept; everything else is a skip reason
+PROCESSED = "processed"
+
+
+class ProgressReporter:
+    """
+    Rate-limited crawl progress with per-reason skip counts.
+
+    update() is cheap enough to call once per file: in "bar" mode the
+    progress line is redrawn at most every `interval` seconds (10 Hz by
+    default), in place when the stream is a terminal and as plain lines
+    otherwise. "quiet" prints nothing until finish(); "json" prints only the
+    final stats as a single JSON record.
+
+    Args:
+        label (str): Prefix for the progress line (e.g. "Crawling")
+        total (int, optional): Number of files expected, if known up front
+        mode (str): "bar", "quiet" or "json"
+        interval (float): Minimum seconds between two progress lines
+        stream: File object to write to (default: sys.stdout)
+    """
+
+    def __init__(
+        self,
+        label: str = "Progress",
+        total: Optional[int] = None,
+        mode: str = "bar",
+        interval: float = 0.1,
+        stream=None,
+    ):
+        if mode not in PROGRESS_MODES:
+            raise ValueError(f"Unknown progress mode: {mode} (expected one of {', '.join(PROGRESS_MODES)})")
+        self.label = label
+        self.total = total
+        self.mode = mode
+        self.interval = interval
+        self.stream = stream or sys.stdout
+        self.counts = Counter()
+        self.done = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self._last_draw = 0.0
+        self._tty = hasattr(self.stream, "isatty") and self.stream.isatty()
+        self._line_open = False
+
+    def update(self, path: str, status: str = PROCESSED, size: int = 0):
+        """Record one file; status is PROCESSED or a short skip reason."""
+        self.done += 1
+        self.counts[status] += 1
+        if status == PROCESSED:
+            self.bytes += size
+        if self.mode != "bar":
+            return
+        now = time.monotonic()
+        if now - self._last_draw >= self.interval:
+            self._last_draw = now
+            self._draw(path)
+
+    def _draw(self, path: str = ""):
+        if self.total:
+            position = f"{self.done}/{self.total} ({int(self.done / self.total * 100)}%)"
+        else:
+            position = f"{self.done}"
+        line = f"{self.label}: {position} {path}"
+        if self._tty:
+            width = 119
+            self.stream.write(f"\r\033[92m{line[:width]:<{width}}\033[0m")
+            self._line_open = True
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+
+    def summary(self) -> Dict[str, Any]:
+        """Counts so far: files seen, kept, bytes kept, throughput, elapsed seconds and skips by reason."""
+        elapsed = time.monotonic() - self.started
+        return {
+            "seen": self.done,
+            "processed": self.counts[PROCESSED],
+            "bytes": self.bytes,
+            "bytes_per_sec": int(self.bytes / elapsed) if elapsed > 0 else 0,
+            "elapsed": round(elapsed, 3),
+            "skip_reasons": {k: v for k, v in sorted(self.counts.items()) if k != PROCESSED},
+        }
+
+    def finish(self, stats: Optional[Dict[str, Any]] = None):
+        """
+        End the progress display. In "json" mode stats (the crawler's result
+        stats) are written as one JSON record; otherwise a one-line summary
+        with the skip reasons is printed.
+        """
+        if self._line_open:
+            self._draw()
+            self.stream.write("\n")
+            self._line_open = False
+
+        if self.mode == "json":
+            self.stream.write(json.dumps(stats if stats is not None else self.summary(), default=_json_default) + "\n")
+        else:
+            summary = self.summary()
+            skipped = ", ".join(f"{count} {reason}" for reason, count in summary["skip_reasons"].items())
+            self.stream.write(
+                f"{self.label}: {summary['processed']}/{summary['seen']} files kept "
+                f"({summary['bytes']} bytes) in {summary['elapsed']:.2f}s, "
+                f"{summary['bytes_per_sec'] / 1e6:.1f} MB/s"
+                + (f"; skipped {skipped}" if skipped else "")
+                + "\n"
+            )
+        self.stream.flush()
+
+
+def _json_default(value):
+    # Pattern sets in the crawler stats
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return str(value)
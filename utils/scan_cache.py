@@ -0,0 +1,175 @@
+import os
+import time
+import sqlite3
+from typing import Dict, Optional, Tuple, Iterable
+
+# Files modified this recently may still change within the same mtime tick
+# ("racily clean" in git terms), so they are read but not cached
+RACY_SECONDS = 2.0
+
+
+def stat_key(st: os.stat_result) -> Tuple[int, int, int]:
+    """(size, mtime_ns, inode): the part of a stat result that tells whether a file changed."""
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+class ScanCache:
+    """
+    On-disk index of previously read local files, stored in SQLite.
+
+    Rows are keyed by (root, path) and remember the file's size, mtime_ns and
+    inode together with the decoded text, or the reason the file was
+    rejected (binary, not utf-8). A file whose stat key still matches
+    is served from the index without being opened. Text is stored as plain
+    UTF-8: decompressing it costs more than re-reading a cached file.
+
+    Every crawl stamps the rows it stored or served with used_at. prune()
+    then drops rows unused for longer than max_age and least recently used
+    rows beyond max_bytes, which also clears out directories that are no
+    longer crawled and blobs of old git refs.
+
+    Args:
+        path (str): Path to the SQLite database file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " root TEXT NOT NULL,"
+            " path TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " inode INTEGER NOT NULL,"
+            " content BLOB,"
+            " reason TEXT,"
+            " scanned_at REAL NOT NULL,"
+            " used_at REAL,"
+            " PRIMARY KEY (root, path))"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(files)")}
+        if "used_at" not in columns:
+            # Indexes written before pruning existed
+            self._conn.execute("ALTER TABLE files ADD COLUMN used_at REAL")
+            self._conn.execute("UPDATE files SET used_at = scanned_at")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_used_at ON files (used_at)")
+
+    def keys(self, root: str) -> Dict[str, Tuple[int, int, int]]:
+        """Stat keys of every file indexed under root, loaded with one query."""
+        return {
+            path: (size, mtime_ns, inode)
+            for path, size, mtime_ns, inode in self._conn.execute(
+                "SELECT path, size, mtime_ns, inode FROM files WHERE root = ?", (root,)
+            )
+        }
+
+    def load(self, root: str, path: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Read an indexed file whose stat key matched keys().
+
+        Returns:
+            tuple: (content, reason) as read_text_file would return them
+        """
+        content, reason = self._conn.execute(
+            "SELECT content, reason FROM files WHERE root = ? AND path = ?", (root, path)
+        ).fetchone()
+        return (bytes(content).decode("utf-8") if content is not None else None), reason
+
+    def put_many(self, root: str, entries: Iterable[Tuple[str, Tuple[int, int, int], Optional[str], Optional[str]]]) -> int:
+        """
+        Store (path, stat key, content, reason) entries in one transaction.
+        Entries modified within RACY_SECONDS are skipped.
+
+        Returns:
+            int: Number of entries stored
+        """
+        now = time.time()
+        rows = []
+        for path, (size, mtime_ns, inode), content, reason in entries:
+            if now - mtime_ns / 1e9 < RACY_SECONDS:
+                continue
+            if content is not None:
+                data = content.encode("utf-8")
+                rows.append((root, path, size, mtime_ns, inode, data, None, now, now))
+            else:
+                rows.append((root, path, size, mtime_ns, inode, None, reason, now, now))
+        self._executemany(
+            "INSERT OR REPLACE INTO files"
+            " (root, path, size, mtime_ns, inode, content, reason, scanned_at, used_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        return len(rows)
+
+    def touch(self, root: str, paths: Iterable[str]) -> None:
+        """Mark rows served from the index as used now, in one transaction."""
+        now = time.time()
+        self._executemany("UPDATE files SET used_at = ? WHERE root = ? AND path = ?",
+                          [(now, root, path) for path in paths])
+
+    def prune(self, max_bytes: Optional[int] = None, max_age: Optional[float] = None) -> int:
+        """
+        Delete rows unused for more than max_age seconds, then least recently
+        used rows until the stored text is at most max_bytes.
+
+        Returns:
+            int: Number of rows removed
+        """
+        removed = 0
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            if max_age:
+                removed += self._conn.execute(
+                    "DELETE FROM files WHERE used_at < ?", (time.time() - max_age,)
+                ).rowcount
+
+            if max_bytes is not None:
+                total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(content)), 0) FROM files").fetchone()[0]
+                if total > max_bytes:
+                    victims = []
+                    for rowid, size in self._conn.execute(
+                        "SELECT rowid, COALESCE(LENGTH(content), 0) FROM files ORDER BY used_at ASC"
+                    ):
+                        if total <= max_bytes:
+                            break
+                        victims.append((rowid,))
+                        total -= size
+                    self._conn.executemany("DELETE FROM files WHERE rowid = ?", victims)
+                    removed += len(victims)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return removed
+
+    def forget_missing(self, root: str, present: Iterable[str]) -> int:
+        """Drop rows under root whose path is not in present (deleted or renamed files)."""
+        present = set(present)
+        stale = [
+            (root, path)
+            for (path,) in self._conn.execute("SELECT path FROM files WHERE root = ?", (root,))
+            if path not in present
+        ]
+        self._executemany("DELETE FROM files WHERE root = ? AND path = ?", stale)
+        return len(stale)
+
+    def _executemany(self, sql: str, rows: list) -> None:
+        # One explicit transaction; in autocommit mode every row would commit on its own
+        if not rows:
+            return
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany(sql, rows)
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,81 @@
+import re
+from typing import List
+
+# Rough average for English prose and source code; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of LLM tokens in text without a tokenizer."""
+    return tokens_for_length(len(text))
+
+
+def tokens_for_length(length: int) -> int:
+    """estimate_tokens() of a text of this many characters (an upper bound when given UTF-8 bytes)."""
+    return (length + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int, marker: str = "\n...") -> str:
+    """Cut text to about max_tokens, preferring a line boundary, and mark the cut."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind("\n", 0, max_chars - len(marker))
+    if cut <= 0:
+        cut = max(0, max_chars - len(marker))
+    return text[:cut] + marker
+
+
+_SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s")
+
+
+def markdown_digest(markdown: str, max_tokens: int) -> str:
+    """
+    Extractive digest of a Markdown chapter: every heading plus the first
+    sentence of the first paragraph below it. Code blocks, diagrams, lists and
+    tables are skipped. The result is cut to max_tokens.
+    """
+    digest = []
+    in_code = False
+    want_sentence = True
+    for line in markdown.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("```"):
+            in_code = not in_code
+            continue
+        if in_code or not stripped:
+            continue
+        if stripped.startswith("#"):
+            digest.append(stripped)
+            want_sentence = True
+        elif want_sentence and not stripped.startswith(("|", ">", "-", "*", "+", "<")):
+            digest.append(_SENTENCE_END.split(stripped, maxsplit=1)[0])
+            want_sentence = False
+    return truncate_to_tokens("\n".join(digest), max_tokens)
+
+
+def fit_recent(sections: List[str], token_budget: int, separator: str = "\n---\n") -> str:
+    """
+    Join sections (oldest first) within token_budget.
+
+    The most recent sections are kept whole. Older ones are reduced to their
+    first line (typically the chapter heading), and dropped once even that no
+    longer fits, so the result stays bounded however many sections there are.
+    """
+    kept = []
+    used = 0
+    full = True
+    for section in reversed(sections):
+        text = section if full else section.split("\n", 1)[0]
+        cost = estimate_tokens(text + separator)
+        if used + cost > token_budget:
+            if not full:
+                break
+            full = False
+            text = section.split("\n", 1)[0]
+            cost = estimate_tokens(text + separator)
+            if used + cost > token_budget:
+                break
+        kept.append(text)
+        used += cost
+    return separator.join(reversed(kept))
@@ -0,0 +1,346 @@
+import os
+import json
+import time
+import asyncio
+import functools
+import itertools
+import threading
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+TRACE_FORMATS = ("chrome", "otlp")
+
+# Node methods recorded as child spans of the node, when the node class has them
+TRACED_METHODS = (
+    "prep", "exec", "post", "build_prompt", "parse_response", "shard_prep_res",
+    "prep_async", "exec_async", "post_async",
+)
+
+# Enclosing span and node retry of the running code; both follow asyncio tasks
+_current_span = contextvars.ContextVar("trace_span", default=None)
+_current_retry = contextvars.ContextVar("trace_retry", default=None)
+
+_tracer = None
+
+
+class Tracer:
+    """
+    In-process span recorder.
+
+    A span is a named, timed section of the run with a category ("node",
+    "llm", "http", "git") and free-form attributes. Spans nest through a
+    context variable, so LLM calls show up under the node that made them,
+    including inside concurrently running asyncio tasks. Spans are kept in
+    memory and exported at the end of the run as Chrome trace JSON (open it
+    in chrome://tracing or https://ui.perfetto.dev) or as OTLP/JSON for
+    OpenTelemetry tooling.
+
+    With profile_memory, tracemalloc runs for the whole process and node
+    spans record the peak of traced allocations while the node ran. This
+    makes Python allocation markedly slower, so it is opt-in.
+
+    Args:
+        profile_memory (bool): Record tracemalloc peak memory per node
+    """
+
+    def __init__(self, profile_memory: bool = False):
+        self.profile_memory = profile_memory
+        self.spans: List[Dict[str, Any]] = []
+        self.started_ns = time.perf_counter_ns()
+        self.epoch_ns = time.time_ns()
+        self.pid = os.getpid()
+        self._ids = itertools.count(1)
+        self._lanes: Dict[Any, int] = {}
+        self._lane_names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        if profile_memory:
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def _lane(self) -> int:
+        """Display lane: one per asyncio task, else one per thread, so overlapping spans don't collide."""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = ("task", id(task)) if task is not None else ("thread", threading.get_ident())
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane is None:
+                lane = self._lanes[key] = len(self._lanes) + 1
+                name = task.get_name() if task is not None else threading.current_thread().name
+                self._lane_names[lane] = name
+            return lane
+
+    @contextmanager
+    def span(self, name: str, category: str, **attrs) -> Iterator[Dict[str, Any]]:
+        """Time the block as a span; the yielded dict holds its attributes and can be filled in."""
+        span_id = next(self._ids)
+        parent = _current_span.get()
+        token = _current_span.set(span_id)
+        lane = self._lane()
+        start = time.perf_counter_ns()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs["error"] = type(e).__name__
+            raise
+        finally:
+            end = time.perf_counter_ns()
+            _current_span.reset(token)
+            with self._lock:
+                self.spans.append({
+                    "id": span_id,
+                    "parent": parent,
+                    "name": name,
+                    "cat": category,
+                    "start": start - self.started_ns,
+                    "end": end - self.started_ns,
+                    "lane": lane,
+                    "attrs": attrs,
+                })
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Spans as Chrome trace "complete" events, timestamps in microseconds."""
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": lane, "args": {"name": name}}
+            for lane, name in sorted(self._lane_names.items())
+        ]
+        for span in sorted(self.spans, key=lambda s: s["start"]):
+            events.append({
+                "name": span["name"],
+                "cat": span["cat"],
+                "ph": "X",
+                "ts": span["start"] / 1000,
+                "dur": (span["end"] - span["start"]) / 1000,
+                "pid": self.pid,
+                "tid": span["lane"],
+                "args": span["attrs"],
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def otlp_trace(self) -> Dict[str, Any]:
+        """Spans as an OTLP/JSON ExportTraceServiceRequest (one trace for the run)."""
+        trace_id = os.urandom(16).hex()
+        span_ids = {}
+
+        def span_id(local_id):
+            if local_id not in span_ids:
+                span_ids[local_id] = os.urandom(8).hex()
+            return span_ids[local_id]
+
+        spans = []
+        for span in sorted(self.spans, key=lambda s: s["start"]):
+            attributes = [{"key": "category", "value": {"stringValue": span["cat"]}}]
+            attributes += [
+                {"key": key, "value": _otlp_value(value)} for key, value in span["attrs"].items() if value is not None
+            ]
+            spans.append({
+                "traceId": trace_id,
+                "spanId": span_id(span["id"]),
+                "parentSpanId": span_id(span["parent"]) if span["parent"] else "",
+                "name": span["name"],
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(self.epoch_ns + span["start"]),
+                "endTimeUnixNano": str(self.epoch_ns + span["end"]),
+                "attributes": attributes,
+                "status": {"code": 2} if "error" in span["attrs"] else {},
+            })
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "pocketflow-tutorial"}}]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+        }]}
+
+    def export(self, path: str, fmt: str = "chrome") -> None:
+        """Write the spans to path in one of TRACE_FORMATS."""
+        if fmt not in TRACE_FORMATS:
+            raise ValueError(f"Unknown trace format: {fmt} (expected one of {', '.join(TRACE_FORMATS)})")
+        trace = self.chrome_trace() if fmt == "chrome" else self.otlp_trace()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(trace, f, default=str)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Totals per (category, name): count, total and max seconds, plus peak memory for nodes."""
+        totals = defaultdict(lambda: {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+        for span in self.spans:
+            row = totals[(span["cat"], span["name"])]
+            seconds = (span["end"] - span["start"]) / 1e9
+            row["count"] += 1
+            row["seconds"] += seconds
+            row["max_seconds"] = max(row["max_seconds"], seconds)
+            if "peak_alloc_bytes" in span["attrs"]:
+                row["peak_alloc_bytes"] = max(row.get("peak_alloc_bytes", 0), span["attrs"]["peak_alloc_bytes"])
+            if span["attrs"].get("cache_hit"):
+                row["cache_hits"] = row.get("cache_hits", 0) + 1
+        return [
+            {"category": cat, "name": name, **row}
+            for (cat, name), row in sorted(totals.items(), key=lambda item: -item[1]["seconds"])
+        ]
+
+    def print_summary(self, limit: int = 25) -> None:
+        print("\nTrace summary (slowest first):")
+        print(f"  {'category':<8} {'name':<44} {'count':>6} {'total s':>9} {'max s':>8}  extra")
+        for row in self.summary()[:limit]:
+            extra = []
+            if "cache_hits" in row:
+                extra.append(f"{row['cache_hits']} cache hits")
+            if "peak_alloc_bytes" in row:
+                extra.append(f"peak {row['peak_alloc_bytes'] / (1024 * 1024):.1f} MB allocated")
+            print(f"  {row['category']:<8} {row['name'][:44]:<44} {row['count']:>6} "
+                  f"{row['seconds']:>9.3f} {row['max_seconds']:>8.3f}  {', '.join(extra)}")
+
+
+def _otlp_value(value) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def enable_tracing(profile_memory: bool = False) -> Tracer:
+    """Start recording spans for the rest of the process; returns the tracer."""
+    global _tracer
+    _tracer = Tracer(profile_memory=profile_memory)
+    return _tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+@contextmanager
+def span(name: str, category: str = "app", **attrs) -> Iterator[Dict[str, Any]]:
+    """
+    Record the block as a span when tracing is enabled; a no-op otherwise.
+
+    The yielded dict holds the span attributes, so results known only at the
+    end (status codes, sizes, cache hits) can be added inside the block.
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield attrs
+        return
+    with tracer.span(name, category, **attrs) as recorded:
+        yield recorded
+
+
+def current_retry() -> Optional[int]:
+    """Retry number of the node exec running in this context, if traced."""
+    return _current_retry.get()
+
+
+# --- Node instrumentation ---
+
+_traced_classes: Dict[type, type] = {}
+_traced_types = set()
+
+
+def _traced_method(cls_name: str, method_name: str, method):
+    label = f"{cls_name}.{method_name}"
+
+    def attrs_for(self, args):
+        if not method_name.startswith("exec"):
+            return {}
+        # Sync nodes expose the retry as self.cur_retry; AsyncLLMNode passes it to exec_async
+        retry = args[1] if method_name == "exec_async" and len(args) > 1 else getattr(self, "cur_retry", None)
+        return {"retry": retry} if retry is not None else {}
+
+    if asyncio.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def traced(self, *args, **kwargs):
+            attrs = attrs_for(self, args)
+            token = _current_retry.set(attrs.get("retry"))
+            try:
+                with span(label, "node", **attrs):
+                    return await method(self, *args, **kwargs)
+            finally:
+                _current_retry.reset(token)
+    else:
+        @functools.wraps(method)
+        def traced(self, *args, **kwargs):
+            attrs = attrs_for(self, args)
+            token = _current_retry.set(attrs.get("retry"))
+            try:
+                with span(label, "node", **attrs):
+                    return method(self, *args, **kwargs)
+            finally:
+                _current_retry.reset(token)
+    return traced
+
+
+@contextmanager
+def _node_span(name: str):
+    tracer = _tracer
+    if tracer is None or not tracer.profile_memory:
+        with span(name, "node") as attrs:
+            yield attrs
+        return
+    import tracemalloc
+
+    tracemalloc.reset_peak()
+    with span(name, "node") as attrs:
+        try:
+            yield attrs
+        finally:
+            attrs["peak_alloc_bytes"] = tracemalloc.get_traced_memory()[1]
+
+
+def _traced_class(cls: type) -> type:
+    """Subclass of a node class whose run and TRACED_METHODS record spans."""
+    if cls in _traced_classes:
+        return _traced_classes[cls]
+    methods = {
+        name: _traced_method(cls.__name__, name, getattr(cls, name))
+        for name in TRACED_METHODS
+        if hasattr(cls, name)
+    }
+
+    from pocketflow import AsyncNode
+
+    if issubclass(cls, AsyncNode):
+        async def _run_async(self, shared):
+            with _node_span(cls.__name__):
+                return await cls._run_async(self, shared)
+        methods["_run_async"] = _run_async
+    else:
+        def _run(self, shared):
+            with _node_span(cls.__name__):
+                return cls._run(self, shared)
+        methods["_run"] = _run
+
+    traced = type(cls.__name__, (cls,), {**methods, "__module__": cls.__module__, "__qualname__": cls.__qualname__})
+    _traced_classes[cls] = traced
+    _traced_types.add(traced)
+    return traced
+
+
+def instrument_flow(flow) -> int:
+    """
+    Trace every node reachable from the flow's start node.
+
+    Each node's class is swapped for a traced subclass, which survives the
+    copies the flow makes of its nodes; the node code itself is untouched.
+
+    Returns:
+        int: Number of nodes instrumented
+    """
+    seen = set()
+    pending = [flow.start_node]
+    while pending:
+        node = pending.pop()
+        if node is None or id(node) in seen:
+            continue
+        seen.add(id(node))
+        if type(node) not in _traced_types:
+            node.__class__ = _traced_class(type(node))
+        pending.extend(node.successors.values())
+    return len(seen)